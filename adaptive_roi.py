@@ -0,0 +1,187 @@
+"""Entrada adaptativa para Pose: recorte guiado por landmarks y presupuesto de latencia.
+
+AdaptiveInput recorta la zona del cuerpo del frame anterior (con margen) y la
+reduce a la resolución de inferencia; si se pierde el seguimiento vuelve al
+frame completo. LatencyBudgetController baja o sube model_complexity y la
+resolución de inferencia para mantener la latencia por frame bajo un
+presupuesto. AdaptivePoseEstimator junta ambas cosas alrededor de Pose.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from landmark_arrays import landmark_bbox, pose_to_array, remap_to_frame
+
+# Niveles de calidad de más pesado a más ligero: (model_complexity, lado máximo)
+DEFAULT_LEVELS = [(1, 640), (1, 480), (0, 480), (0, 320)]
+
+
+class AdaptiveInput:
+    """Calcula el recorte de inferencia a partir de los landmarks anteriores"""
+
+    def __init__(self, margin=0.25, max_side=640, lost_frames=3, min_size=64, reuse_fraction=0.1):
+        self.margin = margin
+        self.max_side = max_side
+        self.lost_frames = lost_frames
+        self.min_size = min_size
+        self.reuse_fraction = reuse_fraction
+        self.roi = None  # (x0, y0, x1, y1) en píxeles, None = frame completo
+        self.misses = 0
+
+    def _roi_from_box(self, box, w, h):
+        bw, bh = box[2] - box[0], box[3] - box[1]
+        # Recorte cuadrado alrededor del cuerpo para no deformar la entrada
+        side = max(bw, bh) * (1 + 2 * self.margin)
+        side = max(side, self.min_size)
+        cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        x0 = int(max(0, cx - side / 2))
+        y0 = int(max(0, cy - side / 2))
+        x1 = int(min(w, cx + side / 2))
+        y1 = int(min(h, cy + side / 2))
+        if x1 - x0 < self.min_size or y1 - y0 < self.min_size:
+            return None
+        return x0, y0, x1, y1
+
+    def _contains(self, roi, box):
+        """True si la caja sigue cómodamente dentro del recorte actual"""
+        x0, y0, x1, y1 = roi
+        pad_x = (x1 - x0) * self.reuse_fraction
+        pad_y = (y1 - y0) * self.reuse_fraction
+        return (box[0] >= x0 + pad_x and box[1] >= y0 + pad_y and
+                box[2] <= x1 - pad_x and box[3] <= y1 - pad_y)
+
+    def prepare(self, frame):
+        """Devuelve (imagen de inferencia, roi) con roi en píxeles del frame"""
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi if self.roi is not None else (0, 0, w, h)
+        crop = frame[y0:y1, x0:x1]
+
+        scale = min(1.0, self.max_side / float(max(x1 - x0, y1 - y0)))
+        if scale < 1.0:
+            size = (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale)))
+            crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        return crop, (x0, y0, x1, y1)
+
+    def update(self, landmarks, roi, frame_shape):
+        """Pasa landmarks del recorte al frame (in situ) y prepara el siguiente recorte"""
+        h, w = frame_shape[:2]
+        if landmarks is None:
+            self.misses += 1
+            if self.misses >= self.lost_frames:
+                self.roi = None  # Seguimiento perdido: volver al frame completo
+            return None
+
+        self.misses = 0
+        x0, y0, x1, y1 = roi
+        remap_to_frame(landmarks, x0, y0, x1 - x0, y1 - y0, w, h)
+        box = landmark_bbox(landmarks, w, h)
+        if box is None:
+            self.roi = None
+        elif self.roi is None or not self._contains(self.roi, box):
+            # Solo se mueve el recorte cuando el cuerpo se acerca al borde, así
+            # el seguimiento temporal de MediaPipe ve una entrada estable
+            self.roi = self._roi_from_box(box, w, h)
+        return landmarks
+
+
+class LatencyBudgetController:
+    """Elige el nivel de calidad que mantiene la latencia bajo el presupuesto"""
+
+    def __init__(self, budget_ms=33.0, levels=None, alpha=0.2, patience=5, headroom=0.6):
+        self.budget_ms = budget_ms
+        self.levels = levels or DEFAULT_LEVELS
+        self.alpha = alpha
+        self.patience = patience
+        self.headroom = headroom
+        self.level = 0
+        self.ema_ms = None
+        self._over = 0
+        self._under = 0
+
+    @property
+    def model_complexity(self):
+        return self.levels[self.level][0]
+
+    @property
+    def max_side(self):
+        return self.levels[self.level][1]
+
+    def observe(self, elapsed_ms):
+        """Registra la latencia de un frame; devuelve True si cambia el nivel"""
+        self.ema_ms = elapsed_ms if self.ema_ms is None else (
+            self.alpha * elapsed_ms + (1 - self.alpha) * self.ema_ms)
+
+        if self.ema_ms > self.budget_ms:
+            self._over += 1
+            self._under = 0
+        elif self.ema_ms < self.budget_ms * self.headroom:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if self._over >= self.patience and self.level < len(self.levels) - 1:
+            self.level += 1
+        elif self._under >= self.patience * 4 and self.level > 0:
+            # Subir de calidad con más cautela que bajar
+            self.level -= 1
+        else:
+            return False
+        self._over = self._under = 0
+        self.ema_ms = None
+        return True
+
+
+class AdaptivePoseEstimator:
+    """Pose con recorte adaptativo y, opcionalmente, presupuesto de latencia.
+
+    Mantiene una instancia de Pose por model_complexity (creadas bajo demanda)
+    para poder cambiar de nivel sin recargar modelos ya usados.
+    """
+
+    def __init__(self, pose_config=None, budget_ms=None, levels=None, margin=0.25, max_side=640):
+        self.pose_config = dict(pose_config or {})
+        self.controller = None
+        if budget_ms is not None:
+            self.controller = LatencyBudgetController(budget_ms, levels)
+            max_side = self.controller.max_side
+        self.input = AdaptiveInput(margin=margin, max_side=max_side)
+        self.poses = {}
+        self.last_ms = 0.0
+
+    def _pose(self, model_complexity):
+        if model_complexity not in self.poses:
+            import mediapipe as mp
+            config = dict(self.pose_config, model_complexity=model_complexity)
+            self.poses[model_complexity] = mp.solutions.pose.Pose(**config)
+        return self.poses[model_complexity]
+
+    @property
+    def model_complexity(self):
+        if self.controller is not None:
+            return self.controller.model_complexity
+        return self.pose_config.get("model_complexity", 1)
+
+    def process(self, frame_rgb, out=None):
+        """Devuelve landmarks (33, 4) en coordenadas del frame completo, o None"""
+        start = time.perf_counter()
+        image, roi = self.input.prepare(frame_rgb)
+        results = self._pose(self.model_complexity).process(image)
+
+        landmarks = None
+        if results.pose_landmarks:
+            landmarks = pose_to_array(results.pose_landmarks, out)
+        landmarks = self.input.update(landmarks, roi, frame_rgb.shape)
+
+        self.last_ms = (time.perf_counter() - start) * 1000.0
+        if self.controller is not None and self.controller.observe(self.last_ms):
+            self.input.max_side = self.controller.max_side
+        return landmarks
+
+    def close(self):
+        for pose in self.poses.values():
+            pose.close()
+        self.poses = {}
@@ -0,0 +1,258 @@
+"""Procesado offline de vídeos grabados a datasets de landmarks.
+
+Cada vídeo se divide en tramos de frames que se reparten en un pool de
+procesos; cada proceso carga Pose (y opcionalmente Hands) una sola vez y lo
+reutiliza para todos sus tramos. Los resultados se juntan en orden.
+
+    python batch_process.py video1.mp4 video2.mp4 --hands --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from landmark_arrays import LandmarkBuffers, max_hands_for
+from landmark_recording import RecordingWriter
+from landmark_protocol import (HAND_LANDMARKS, HANDEDNESS_CODES, HANDEDNESS_NAMES, POSE_LANDMARKS,
+                               UNKNOWN_HANDEDNESS)
+from preprocess import FramePreprocessor
+
+DEFAULT_CHUNK_FRAMES = 300
+
+# Modelos del proceso trabajador (uno por proceso, creados en _init_worker)
+_worker = {}
+
+
+def _init_worker(pose_config, hands_config):
+    import mediapipe as mp
+
+    _worker.clear()
+    if pose_config is not None:
+        _worker["pose"] = mp.solutions.pose.Pose(**pose_config)
+    if hands_config is not None:
+        _worker["hands"] = mp.solutions.hands.Hands(**hands_config)
+    _worker["buffers"] = LandmarkBuffers(max_people=1, max_hands=max_hands_for(hands_config))
+
+
+def _seek(cap, start):
+    """Posiciona la captura en el frame start (con grab() si el seek no es exacto)"""
+    if start == 0:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    pos = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if pos == start:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(start):
+        if not cap.grab():
+            return False
+    return True
+
+
+def _process_chunk(task):
+    """Procesa los frames [start, end) de un vídeo; end=None lee hasta el final"""
+    path, start, end = task
+    pose = _worker.get("pose")
+    hands = _worker.get("hands")
+    buffers = _worker["buffers"]
+    max_hands = buffers.hands.shape[0]
+
+    # Cada tramo empieza sin estado temporal del tramo anterior
+    for model in (pose, hands):
+        if model is not None:
+            model.reset()
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened() or not _seek(cap, start):
+        cap.release()
+        raise RuntimeError(f"No se pudo abrir {path} en el frame {start}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    indices, timestamps, poses, hand_arrays, hand_counts, handedness = [], [], [], [], [], []
+    frame_index = start
+    preprocess = FramePreprocessor()
+    frame = None
+    try:
+        while end is None or frame_index < end:
+            ret, frame = cap.read(frame)
+            if not ret:
+                break
+            frame_rgb = preprocess.rgb(frame)
+            buffers.begin_frame()
+
+            indices.append(frame_index)
+            timestamps.append(frame_index / fps)
+
+            if pose is not None:
+                found = buffers.load_pose(pose.process(frame_rgb))
+                poses.append(found[0].copy() if len(found) else
+                             np.full((POSE_LANDMARKS, 4), np.nan, np.float32))
+
+            if hands is not None:
+                found = buffers.load_hands(hands.process(frame_rgb))
+                padded = np.full((max_hands, HAND_LANDMARKS, 3), np.nan, np.float32)
+                padded[:len(found)] = found
+                codes = np.full(max_hands, UNKNOWN_HANDEDNESS, np.uint8)
+                codes[:len(found)] = [HANDEDNESS_CODES.get(h, UNKNOWN_HANDEDNESS)
+                                      for h in buffers.handedness]
+                hand_arrays.append(padded)
+                hand_counts.append(len(found))
+                handedness.append(codes)
+            frame_index += 1
+    finally:
+        cap.release()
+
+    chunk = {
+        "frame_index": np.asarray(indices, dtype=np.int64),
+        "timestamp": np.asarray(timestamps, dtype=np.float64),
+    }
+    if pose is not None:
+        chunk["poses"] = np.asarray(poses, dtype=np.float32).reshape(-1, POSE_LANDMARKS, 4)
+    if hands is not None:
+        chunk["hands"] = np.asarray(hand_arrays, dtype=np.float32).reshape(-1, max_hands, HAND_LANDMARKS, 3)
+        chunk["num_hands"] = np.asarray(hand_counts, dtype=np.uint8)
+        chunk["handedness"] = np.asarray(handedness, dtype=np.uint8).reshape(-1, max_hands)
+    return path, chunk
+
+
+def split_video(path, chunk_frames=DEFAULT_CHUNK_FRAMES):
+    """Divide un vídeo en tareas (path, inicio, fin); el último tramo lee hasta el final"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se pudo abrir {path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if total <= 0:
+        return [(path, 0, None)], 0
+    starts = list(range(0, total, chunk_frames))
+    tasks = [(path, s, s + chunk_frames) for s in starts[:-1]]
+    tasks.append((path, starts[-1], None))
+    return tasks, total
+
+
+def merge_chunks(chunks):
+    """Concatena en orden los tramos de un mismo vídeo"""
+    if not chunks:
+        return {}
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+
+def process_videos(paths, pose_config=None, hands_config=None, workers=None,
+                   chunk_frames=DEFAULT_CHUNK_FRAMES, report=True):
+    """Procesa varios vídeos en paralelo y devuelve {path: dataset}.
+
+    pose_config/hands_config son los argumentos de mp.solutions.pose.Pose y
+    mp.solutions.hands.Hands; None desactiva ese modelo.
+    """
+    if pose_config is None and hands_config is None:
+        raise ValueError("Hay que activar Pose, Hands o ambos")
+
+    tasks, total_frames = [], 0
+    for path in paths:
+        video_tasks, frames = split_video(path, chunk_frames)
+        tasks.extend(video_tasks)
+        total_frames += frames
+
+    workers = workers or os.cpu_count() or 1
+    chunks = {path: [] for path in paths}
+    done_frames = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pose_config, hands_config)) as executor:
+        # map() devuelve los tramos en el orden de envío
+        for path, chunk in executor.map(_process_chunk, tasks):
+            chunks[path].append(chunk)
+            done_frames += len(chunk["frame_index"])
+            if report:
+                elapsed = time.perf_counter() - start
+                total = f"/{total_frames}" if total_frames else ""
+                print(f"Procesados {done_frames}{total} frames "
+                      f"({done_frames / max(elapsed, 1e-9):.1f} fps, {workers} procesos)")
+
+    return {path: merge_chunks(chunks[path]) for path in paths}
+
+
+def to_body_data(dataset):
+    """Convierte un dataset a la estructura JSON de body_data.json"""
+    frames = []
+    for i, frame_index in enumerate(dataset["frame_index"].tolist()):
+        entry = {"frame": frame_index, "timestamp": float(dataset["timestamp"][i])}
+        if "poses" in dataset:
+            pose = dataset["poses"][i]
+            entry["pose"] = None if np.isnan(pose[0, 0]) else [
+                {"x": x, "y": y, "z": z, "visibility": v} for x, y, z, v in pose.tolist()
+            ]
+        if "hands" in dataset:
+            count = int(dataset["num_hands"][i])
+            entry["hands"] = [
+                {"handedness": HANDEDNESS_NAMES.get(code, "unknown"),
+                 "landmarks": [{"x": x, "y": y, "z": z} for x, y, z in points]}
+                for code, points in zip(dataset["handedness"][i][:count].tolist(),
+                                        dataset["hands"][i][:count].tolist())
+            ]
+        frames.append(entry)
+    return frames
+
+
+def save_recording(dataset, path):
+    """Vuelca un dataset a una grabación .lmrec/.lmidx (ver landmark_recording)"""
+    with RecordingWriter(path, flush_every=1000) as writer:
+        for i, frame_index in enumerate(dataset["frame_index"].tolist()):
+            poses = None
+            if "poses" in dataset and not np.isnan(dataset["poses"][i, 0, 0]):
+                poses = dataset["poses"][i:i + 1]
+            hands, handedness = None, ()
+            if "hands" in dataset:
+                count = int(dataset["num_hands"][i])
+                hands = dataset["hands"][i, :count]
+                handedness = [HANDEDNESS_NAMES.get(c, "unknown")
+                              for c in dataset["handedness"][i, :count].tolist()]
+            writer.write_frame(frame_index, dataset["timestamp"][i], poses=poses,
+                               hands=hands, handedness=handedness)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Procesado offline de vídeos a landmarks")
+    parser.add_argument("videos", nargs="+", help="Ficheros de vídeo")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, núcleos)")
+    parser.add_argument("--chunk-frames", type=int, default=DEFAULT_CHUNK_FRAMES)
+    parser.add_argument("--no-pose", action="store_true", help="No ejecutar Pose")
+    parser.add_argument("--hands", action="store_true", help="Ejecutar también Hands")
+    parser.add_argument("--max-hands", type=int, default=2)
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--output-dir", default=None, help="Carpeta de salida (por defecto, junto al vídeo)")
+    parser.add_argument("--format", choices=("npz", "rec"), default="npz",
+                        help="npz o grabación binaria con índice (landmark_recording)")
+    args = parser.parse_args()
+
+    pose_config = None if args.no_pose else dict(model_complexity=args.model_complexity)
+    hands_config = dict(max_num_hands=args.max_hands) if args.hands else None
+
+    start = time.perf_counter()
+    datasets = process_videos(args.videos, pose_config, hands_config,
+                              workers=args.workers, chunk_frames=args.chunk_frames)
+    elapsed = time.perf_counter() - start
+
+    total = 0
+    for path, dataset in datasets.items():
+        base = os.path.splitext(os.path.basename(path))[0] + ".landmarks"
+        out_dir = args.output_dir or os.path.dirname(os.path.abspath(path))
+        out_path = os.path.join(out_dir, base)
+        if args.format == "rec":
+            save_recording(dataset, out_path)
+            out_path += ".lmrec"
+        else:
+            out_path += ".npz"
+            np.savez(out_path, **dataset)
+        total += len(dataset.get("frame_index", ()))
+        print(f"{path}: {len(dataset.get('frame_index', ()))} frames -> {out_path}")
+    print(f"Total: {total} frames en {elapsed:.1f} s ({total / max(elapsed, 1e-9):.1f} fps)")
+
+
+if __name__ == "__main__":
+    main()
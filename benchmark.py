@@ -0,0 +1,326 @@
+"""Benchmark por etapas de los trackers, sin ventana y sin cámara.
+
+Mide por separado captura, conversión de color, inferencia, extracción de
+landmarks, suavizado, dibujo y salida (serialización + UDP) de cada tracker
+sobre vídeo sintético o grabado, y saca rendimiento y latencias p50/p95/p99
+en JSON. --smoothing compara el suavizado de MediaPipe, ninguno y los ajustes
+One-Euro de smoothing.PRESETS, con el temblor y el retardo de cada uno.
+
+    python benchmark.py --tracker pose hands --model-complexity 0 1 --resolution 640x360 1280x720
+    python benchmark.py --model-complexity 0 --smoothing mediapipe none light medium strong --video sesion.mp4
+    python benchmark.py --video sesion.mp4 --output actual.json --baseline base.json
+"""
+import argparse
+import itertools
+import json
+import socket
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from landmark_arrays import LandmarkBuffers
+from landmark_protocol import LandmarkSender
+from renderers import render_hands, render_normal, render_stylish
+from smoothing import PRESETS, hand_smoother, jitter_and_lag, pose_smoother
+
+STAGES = ["capture", "convert", "inference", "extract", "smooth", "draw", "output"]
+TRACKERS = ["pose", "dual", "stylish", "hands"]
+# "mediapipe": suavizado interno de Pose; "none": sin suavizar; resto: One-Euro
+SMOOTHING = ["mediapipe", "none"] + list(PRESETS)
+
+
+class StageTimer:
+    """Acumula duraciones por etapa y frame para calcular percentiles"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.totals = []
+        self._frame = {}
+        self._last = None
+
+    def start_frame(self):
+        self._frame = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self._frame[stage] = self._frame.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def end_frame(self):
+        for stage, elapsed in self._frame.items():
+            self.samples[stage].append(elapsed)
+        self.totals.append(sum(self._frame.values()))
+
+    @staticmethod
+    def describe(samples):
+        if not samples:
+            return None
+        ms = np.asarray(samples) * 1000.0
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {
+            "count": len(ms),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+        }
+
+    def report(self, wall_time):
+        stages = {stage: self.describe(s) for stage, s in self.samples.items() if s}
+        return {
+            "frames": len(self.totals),
+            "fps": len(self.totals) / wall_time if wall_time > 0 else 0.0,
+            "total": self.describe(self.totals),
+            "stages": stages,
+        }
+
+
+class SyntheticVideo:
+    """Fuente de vídeo en memoria con figuras en movimiento (se precalcula un ciclo corto)"""
+
+    def __init__(self, width, height, frames=300, cycle=16, seed=0, fps=30.0):
+        rng = np.random.default_rng(seed)
+        self.frames = frames
+        self.fps = fps
+        self.cycle = []
+        base = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+        for i in range(cycle):
+            frame = base.copy()
+            cx = int(width * (0.2 + 0.6 * i / cycle))
+            cv2.ellipse(frame, (cx, height // 2), (width // 12, height // 3), 0, 0, 360,
+                        (200, 180, 160), -1)
+            cv2.circle(frame, (cx, height // 6), height // 12, (180, 160, 150), -1)
+            self.cycle.append(frame)
+        self.buffer = np.empty_like(base)
+        self.index = 0
+
+    def read(self):
+        if self.index >= self.frames:
+            return False, None
+        np.copyto(self.buffer, self.cycle[self.index % len(self.cycle)])
+        self.index += 1
+        return True, self.buffer
+
+    def release(self):
+        pass
+
+
+class VideoFileSource:
+    """Vídeo grabado, opcionalmente redimensionado a la resolución de prueba"""
+
+    def __init__(self, path, size=None, frames=None):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"No se pudo abrir {path}")
+        self.size = size
+        self.frames = frames
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.index = 0
+
+    def read(self):
+        if self.frames is not None and self.index >= self.frames:
+            return False, None
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self.index += 1
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def _make_tracker(name, model_complexity, smooth_landmarks=True):
+    """Devuelve (modelo, función de dibujo) para un tracker"""
+    import mediapipe as mp
+
+    if name == "hands":
+        model = mp.solutions.hands.Hands(max_num_hands=8, min_detection_confidence=0.7,
+                                         min_tracking_confidence=0.5,
+                                         model_complexity=min(model_complexity, 1))
+        return model, render_hands
+    if name == "dual":
+        from multi_person import MultiPersonPoseTracker
+        model = MultiPersonPoseTracker(max_people=2, pose_config=dict(model_complexity=model_complexity,
+                                                                      smooth_landmarks=smooth_landmarks))
+        return model, render_normal
+
+    model = mp.solutions.pose.Pose(min_detection_confidence=0.7, min_tracking_confidence=0.7,
+                                   model_complexity=model_complexity, smooth_landmarks=smooth_landmarks)
+    return model, render_stylish if name == "stylish" else render_normal
+
+
+def run_case(source, tracker, model_complexity, warmup=10, smoothing="mediapipe"):
+    """Ejecuta un tracker sobre una fuente y devuelve el informe por etapas.
+
+    El informe incluye el temblor y el retardo de la primera persona o mano
+    (smoothing.jitter_and_lag), con o sin suavizado.
+    """
+    model, draw = _make_tracker(tracker, model_complexity, smooth_landmarks=smoothing == "mediapipe")
+    smoother = None
+    if smoothing in PRESETS:
+        smoother = (hand_smoother(preset=smoothing) if tracker == "hands"
+                    else pose_smoother(max_people=4, preset=smoothing))
+    buffers = LandmarkBuffers(max_people=2, max_hands=8)
+    num_points = buffers.hands.shape[1] if tracker == "hands" else buffers.poses.shape[1]
+    raw_series, smoothed_series = [], []
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender = LandmarkSender(("127.0.0.1", 9), sock=sink)
+    timer = StageTimer()
+
+    frame_count = 0
+    # Sin calentamiento se mide desde el primer frame
+    wall_start = time.perf_counter() if warmup == 0 else None
+    try:
+        while True:
+            timer.start_frame()
+            ret, frame = source.read()
+            if not ret:
+                break
+            timer.mark("capture")
+
+            buffers.begin_frame()
+            if tracker == "dual":
+                # El tracker multipersona convierte e infiere por recorte
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                timer.mark("convert")
+                tracks = model.update(frame, frame_rgb)
+                timer.mark("inference")
+                for i, track in enumerate(tracks[:len(buffers.poses)]):
+                    buffers.poses[i] = track.landmarks
+                buffers.num_poses = min(len(tracks), len(buffers.poses))
+                ids = [track.track_id for track in tracks[:buffers.num_poses]]
+                timer.mark("extract")
+            else:
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                frame_rgb.flags.writeable = False
+                timer.mark("convert")
+                results = model.process(frame_rgb)
+                timer.mark("inference")
+                if tracker == "hands":
+                    buffers.load_hands(results)
+                else:
+                    buffers.load_pose(results)
+                ids = range(buffers.num_hands if tracker == "hands" else buffers.num_poses)
+                timer.mark("extract")
+
+            points = buffers.active_hands() if tracker == "hands" else buffers.active_poses()
+            raw = points[0, :, :3].copy() if len(points) else np.full((num_points, 3), np.nan)
+            if smoother is not None and len(points):
+                # Tiempo del vídeo, no del benchmark: el filtro ve la cadencia real de la fuente
+                smoother.filter(ids, points, frame_count / source.fps, out=points)
+            timer.mark("smooth")
+            if frame_count >= warmup:
+                raw_series.append(raw)
+                smoothed_series.append(points[0, :, :3].copy() if len(points) else raw)
+
+            draw(frame, points)
+            timer.mark("draw")
+
+            try:
+                sender.send(time.time(), buffers.active_hands(), buffers.handedness,
+                            buffers.active_poses(), range(buffers.num_poses))
+            except OSError:
+                pass
+            timer.mark("output")
+
+            frame_count += 1
+            if frame_count == warmup:
+                # Los primeros frames incluyen la carga del grafo: se descartan
+                timer = StageTimer()
+                wall_start = time.perf_counter()
+            elif frame_count > warmup:
+                timer.end_frame()
+    finally:
+        source.release()
+        sender.close()
+        model.close()
+
+    wall = time.perf_counter() - wall_start if wall_start is not None else 0.0
+    report = timer.report(wall)
+    jitter, lag_ms = jitter_and_lag(raw_series, smoothed_series, 1.0 / source.fps)
+    report["smoothing"] = {"method": smoothing, "jitter": jitter, "lag_ms": lag_ms}
+    return report
+
+
+def compare(results, baseline):
+    """Cociente actual/base de p50 y p95 por caso y etapa"""
+    base_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    comparison = {}
+    for case in results["cases"]:
+        base = base_cases.get(case["name"])
+        if base is None:
+            continue
+        entry = {"fps_ratio": case["fps"] / base["fps"] if base["fps"] else None}
+        for stage, stats in case["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if stats and base_stats and base_stats["p50_ms"] > 0:
+                entry[stage] = {
+                    "p50_ratio": stats["p50_ms"] / base_stats["p50_ms"],
+                    "p95_ratio": stats["p95_ms"] / max(base_stats["p95_ms"], 1e-9),
+                }
+        comparison[case["name"]] = entry
+    return comparison
+
+
+def parse_size(text):
+    width, height = (int(v) for v in text.lower().split("x"))
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapas de los trackers")
+    parser.add_argument("--tracker", nargs="+", choices=TRACKERS, default=["pose"])
+    parser.add_argument("--model-complexity", nargs="+", type=int, default=[1])
+    parser.add_argument("--resolution", nargs="+", default=["1280x720"])
+    parser.add_argument("--smoothing", nargs="+", choices=SMOOTHING, default=["mediapipe"])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--video", default=None, help="Vídeo grabado (por defecto, sintético)")
+    parser.add_argument("--output", default=None, help="Fichero JSON de salida (por defecto, stdout)")
+    parser.add_argument("--baseline", default=None, help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    results = {"created": time.time(), "video": args.video or "synthetic", "cases": []}
+    for tracker, complexity, resolution, smoothing in itertools.product(
+            args.tracker, args.model_complexity, args.resolution, args.smoothing):
+        size = parse_size(resolution)
+        frames = args.frames + args.warmup
+        if args.video:
+            source = VideoFileSource(args.video, size, frames)
+        else:
+            source = SyntheticVideo(size[0], size[1], frames)
+
+        # Sin sufijo con el suavizado de MediaPipe, para comparar con ejecuciones anteriores
+        name = f"{tracker}/mc{complexity}/{resolution}"
+        if smoothing != "mediapipe":
+            name = f"{name}/{smoothing}"
+        print(f"Midiendo {name}...", file=sys.stderr)
+        report = run_case(source, tracker, complexity, warmup=args.warmup, smoothing=smoothing)
+        report.update(name=name, tracker=tracker, model_complexity=complexity, resolution=resolution)
+        results["cases"].append(report)
+        print(f"  {report['fps']:.1f} fps, p95 {report['total']['p95_ms']:.1f} ms"
+              if report["total"] else "  sin frames", file=sys.stderr)
+        if report["smoothing"]["jitter"] is not None:
+            print(f"  temblor {report['smoothing']['jitter']:.5f}, "
+                  f"retardo {report['smoothing']['lag_ms']:.0f} ms", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(results, json.load(f))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""Cuerpo y manos en una sola pasada guiada por Pose.
+
+Pose se ejecuta una vez por frame (con el recorte adaptativo de
+adaptive_roi). La muñeca, el índice y el meñique de cada brazo dan un recorte
+cuadrado ajustado a la mano; los recortes se colocan en un mosaico pequeño
+con un tile fijo por lado, que pasa por Hands en una sola llamada, en lugar
+de buscar hasta 8 palmas en el frame completo. La detección de palmas sobre
+el frame completo queda como respaldo para cuando Pose no ve el cuerpo.
+
+El resultado es un único paquete cuerpo+manos por frame:
+
+    python body_hands.py [fuente] [--udp localhost:9999]
+    python body_hands.py video.mp4 --compare   # frente a Pose + Hands por separado
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from adaptive_roi import AdaptivePoseEstimator
+from landmark_arrays import VISIBILITY_THRESHOLD, LandmarkBuffers, hands_to_array
+from preprocess import FramePreprocessor
+
+# Landmarks de Pose de cada mano: (lateralidad, muñeca, meñique, índice)
+POSE_HANDS = (("left", 15, 17, 19), ("right", 16, 18, 20))
+
+SWAP_HANDEDNESS = {"left": "right", "right": "left"}
+
+DEFAULT_POSE_CONFIG = dict(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+DEFAULT_HANDS_CONFIG = dict(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+
+def hand_rois(pose, width, height, scale=3.0, shift=0.7, min_side=48,
+              threshold=VISIBILITY_THRESHOLD):
+    """Recortes cuadrados (lateralidad, x0, y0, lado) en píxeles de cada mano visible.
+
+    El centro se desplaza desde la muñeca hacia los nudillos (shift) y el lado
+    es scale veces la distancia muñeca-nudillos o la anchura de la palma.
+    """
+    rois = []
+    for handedness, wrist, pinky, index in POSE_HANDS:
+        if pose[wrist, 3] < threshold:
+            continue
+        points = pose[[wrist, pinky, index], :2] * (width, height)
+        knuckles = (points[1] + points[2]) / 2
+        length = max(np.linalg.norm(knuckles - points[0]), np.linalg.norm(points[1] - points[2]))
+        side = max(int(scale * length), min_side)
+        cx, cy = points[0] + shift * (knuckles - points[0])
+        x0, y0 = int(cx - side / 2), int(cy - side / 2)
+        # Mano fuera de la imagen: no merece la pena recortar
+        if x0 >= width or y0 >= height or x0 + side <= 0 or y0 + side <= 0:
+            continue
+        rois.append((handedness, x0, y0, side))
+    return rois
+
+
+def fill_tile(tile, frame, x0, y0, side):
+    """Copia el recorte (x0, y0, lado) del frame escalado al tile, con negro fuera del frame"""
+    h, w = frame.shape[:2]
+    size = tile.shape[0]
+    fx0, fy0 = max(x0, 0), max(y0, 0)
+    fx1, fy1 = min(x0 + side, w), min(y0 + side, h)
+    scale = size / float(side)
+    tx0, ty0 = int(round((fx0 - x0) * scale)), int(round((fy0 - y0) * scale))
+    tx1, ty1 = int(round((fx1 - x0) * scale)), int(round((fy1 - y0) * scale))
+    if tx1 - tx0 < size or ty1 - ty0 < size:
+        tile[...] = 0
+    if tx1 > tx0 and ty1 > ty0:
+        tile[ty0:ty1, tx0:tx1] = cv2.resize(frame[fy0:fy1, fx0:fx1], (tx1 - tx0, ty1 - ty0),
+                                            interpolation=cv2.INTER_AREA)
+    return tile
+
+
+def side_ids(handedness):
+    """Id de pista por lado (el índice en POSE_HANDS) de cada mano; los repetidos, -1.
+
+    El respaldo a frame completo puede etiquetar dos manos con el mismo lado;
+    con el mismo id compartirían filtro y analíticas, así que solo la primera
+    conserva el suyo y las demás quedan sin seguimiento.
+    """
+    ids = {label: index for index, (label, *_) in enumerate(POSE_HANDS)}
+    seen = set()
+    result = []
+    for label in handedness:
+        track_id = ids.get(label, -1)
+        result.append(-1 if track_id in seen else track_id)
+        seen.add(track_id)
+    return result
+
+
+class BodyHandsTracker:
+    """Pose una vez por frame y Hands sobre un mosaico de recortes de las manos.
+
+    process() vuelca el cuerpo en buffers.poses[0] y las manos en
+    buffers.hands, con coordenadas normalizadas del frame completo.
+    """
+
+    def __init__(self, pose_config=None, hands_config=None, budget_ms=None, tile_size=192,
+                 roi_scale=3.0, fallback=True, fallback_hands=2, mirrored=False):
+        self.pose = AdaptivePoseEstimator(dict(DEFAULT_POSE_CONFIG, **(pose_config or {})), budget_ms)
+        self.hands_config = dict(DEFAULT_HANDS_CONFIG, **(hands_config or {}))
+        self.tile_size = tile_size
+        self.roi_scale = roi_scale
+        self.fallback = fallback
+        self.fallback_hands = fallback_hands
+        self.mirrored = mirrored
+        # Mosaico fijo con un tile por lado: Hands en modo seguimiento ve cada
+        # mano siempre en el mismo sitio de una imagen del mismo tamaño; el
+        # tile de una mano no visible queda en negro
+        self.mosaic = np.zeros((tile_size, tile_size * len(POSE_HANDS), 3), np.uint8)
+        self.tiles = {label: index for index, (label, *_) in enumerate(POSE_HANDS)}
+        self._crop_hands = None
+        self._full_hands = None
+        self.crop_frames = 0
+        self.fallback_frames = 0
+
+    def _hands_model(self, fallback):
+        import mediapipe as mp
+        if fallback:
+            if self._full_hands is None:
+                self._full_hands = mp.solutions.hands.Hands(max_num_hands=self.fallback_hands,
+                                                            **self.hands_config)
+            return self._full_hands
+        if self._crop_hands is None:
+            # Una mano por tile: como mucho tantas como brazos
+            self._crop_hands = mp.solutions.hands.Hands(max_num_hands=len(POSE_HANDS), **self.hands_config)
+        return self._crop_hands
+
+    def _process_crops(self, frame_rgb, rois, buffers):
+        """Hands en una llamada sobre el mosaico; cada mano se asigna a su tile"""
+        h, w = frame_rgb.shape[:2]
+        size = self.tile_size
+        mosaic = self.mosaic
+        tiles = len(POSE_HANDS)
+        by_tile = {self.tiles[roi[0]]: roi for roi in rois}
+        for tile in range(tiles):
+            view = mosaic[:, tile * size:(tile + 1) * size]
+            if tile in by_tile:
+                _, x0, y0, side = by_tile[tile]
+                fill_tile(view, frame_rgb, x0, y0, side)
+            else:
+                view[...] = 0
+
+        results = self._hands_model(False).process(mosaic)
+        if not results.multi_hand_landmarks:
+            return 0
+
+        # Con varias detecciones en un mismo tile gana la de mayor puntuación
+        best = {}
+        for hand_landmarks, hand_info in zip(results.multi_hand_landmarks, results.multi_handedness):
+            points = np.array([(l.x, l.y, l.z) for l in hand_landmarks.landmark], np.float32)
+            tile = min(max(int(points[:, 0].mean() * tiles), 0), tiles - 1)
+            if tile not in by_tile:
+                continue
+            score = hand_info.classification[0].score
+            if tile not in best or score > best[tile][0]:
+                best[tile] = (score, points)
+
+        count = 0
+        mosaic_w = mosaic.shape[1]
+        for tile in sorted(best):
+            if count >= len(buffers.hands):
+                break
+            handedness, x0, y0, side = by_tile[tile]
+            points = buffers.hands[count]
+            points[:] = best[tile][1]
+            # Mosaico normalizado -> píxeles del tile -> frame normalizado
+            ratio = side / float(size)
+            points[:, 0] = (x0 + (points[:, 0] * mosaic_w - tile * size) * ratio) / w
+            points[:, 1] = (y0 + points[:, 1] * size * ratio) / h
+            points[:, 2] *= mosaic_w * ratio / w
+            buffers.handedness.append(handedness)
+            count += 1
+        return count
+
+    def process(self, frame_rgb, buffers):
+        """Devuelve (cuerpos, manos) del frame, escritos en buffers"""
+        h, w = frame_rgb.shape[:2]
+        pose = self.pose.process(frame_rgb, out=buffers.poses[0])
+        buffers.handedness = []
+        if pose is not None:
+            buffers.num_poses = 1
+            rois = hand_rois(pose, w, h, scale=self.roi_scale)
+            buffers.num_hands = self._process_crops(frame_rgb, rois, buffers) if rois else 0
+            self.crop_frames += 1
+        else:
+            buffers.num_poses = 0
+            buffers.num_hands = 0
+            if self.fallback:
+                # Sin cuerpo no hay recortes: palmas en el frame completo
+                results = self._hands_model(True).process(frame_rgb)
+                buffers.num_hands, handedness = hands_to_array(results, buffers.hands)
+                # Hands supone imagen en espejo; Pose da el lado real de la persona
+                if not self.mirrored:
+                    handedness = [SWAP_HANDEDNESS[label] for label in handedness]
+                buffers.handedness = handedness
+                self.fallback_frames += 1
+        return buffers.active_poses(), buffers.active_hands()
+
+    def close(self):
+        self.pose.close()
+        for hands in (self._crop_hands, self._full_hands):
+            if hands is not None:
+                hands.close()
+        self._crop_hands = self._full_hands = None
+
+
+def compare(source, frames=300):
+    """ms/frame del modo combinado frente a Pose + Hands(8) a frame completo"""
+    import mediapipe as mp
+    results = {}
+
+    cap = cv2.VideoCapture(source)
+    preprocess = FramePreprocessor()
+    frame = None
+    tracker = BodyHandsTracker()
+    buffers = LandmarkBuffers(max_hands=len(POSE_HANDS))
+    elapsed, count, hands_found = 0.0, 0, 0
+    while count < frames:
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        start = time.perf_counter()
+        frame_rgb = preprocess.rgb(frame)
+        _, hands = tracker.process(frame_rgb, buffers)
+        elapsed += time.perf_counter() - start
+        hands_found += len(hands)
+        count += 1
+    cap.release()
+    tracker.close()
+    results["combined_ms"] = 1000.0 * elapsed / max(count, 1)
+    results["combined_hands"] = hands_found
+    results["fallback_frames"] = tracker.fallback_frames
+
+    # Lo que hacían los dos scripts: Pose y Hands(max_num_hands=8) sobre el frame entero
+    cap = cv2.VideoCapture(source)
+    preprocess = FramePreprocessor()
+    frame = None
+    pose = mp.solutions.pose.Pose(**DEFAULT_POSE_CONFIG)
+    hands = mp.solutions.hands.Hands(max_num_hands=8, **DEFAULT_HANDS_CONFIG)
+    elapsed, count, hands_found = 0.0, 0, 0
+    while count < frames:
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        start = time.perf_counter()
+        frame_rgb = preprocess.rgb(frame)
+        pose.process(frame_rgb)
+        hand_results = hands.process(frame_rgb)
+        elapsed += time.perf_counter() - start
+        hands_found += len(hand_results.multi_hand_landmarks or [])
+        count += 1
+    cap.release()
+    pose.close()
+    hands.close()
+    results["separate_ms"] = 1000.0 * elapsed / max(count, 1)
+    results["separate_hands"] = hands_found
+    results["frames"] = count
+    return results
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cuerpo y manos guiados por Pose en un solo paquete")
+    parser.add_argument("source", nargs="?", default="0", help="Índice de cámara, fichero o URL")
+    parser.add_argument("--udp", type=parse_address, default=None, metavar="HOST:PUERTO",
+                        help="Enviar el paquete cuerpo+manos por UDP")
+    parser.add_argument("--quantized", action="store_true", help="Landmarks int16")
+    parser.add_argument("--no-fallback", action="store_true", help="Sin palmas a frame completo")
+    parser.add_argument("--compare", action="store_true", help="Comparar con Pose + Hands por separado")
+    parser.add_argument("--frames", type=int, default=300, help="Frames para --compare")
+    parser.add_argument("--smoothing", choices=["none", "light", "medium", "strong"], default="medium",
+                        help="Suavizado One-Euro de cuerpo y manos")
+    args = parser.parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    if args.compare:
+        results = compare(source, args.frames)
+        print(f"{results['frames']} frames")
+        print(f"  Pose + Hands(8) a frame completo: {results['separate_ms']:7.2f} ms/frame "
+              f"({results['separate_hands']} manos)")
+        print(f"  Pose + recortes de manos:         {results['combined_ms']:7.2f} ms/frame "
+              f"({results['combined_hands']} manos, {results['fallback_frames']} frames de respaldo)")
+        return
+
+    from landmark_protocol import LandmarkSender
+    from motion_analytics import hand_analyzer, pose_analyzer
+    from renderers import render_hands, render_normal
+    from smoothing import hand_smoother, pose_smoother
+
+    sender = LandmarkSender(args.udp, quantized=args.quantized) if args.udp else None
+    tracker = BodyHandsTracker(fallback=not args.no_fallback)
+    buffers = LandmarkBuffers(max_hands=len(POSE_HANDS))
+    # Analíticas de movimiento del cuerpo y de cada mano (id = lado)
+    body_motion = pose_analyzer(max_people=1)
+    hands_motion = hand_analyzer(max_hands=len(POSE_HANDS))
+    smoothers = None
+    if args.smoothing != "none":
+        smoothers = (pose_smoother(max_people=1, preset=args.smoothing),
+                     hand_smoother(max_hands=len(POSE_HANDS), preset=args.smoothing))
+    cap = cv2.VideoCapture(source)
+    preprocess = FramePreprocessor()
+    frame = None
+    try:
+        while cap.isOpened():
+            ret, frame = cap.read(frame)
+            if not ret:
+                break
+            capture_time = time.time()
+            poses, hands = tracker.process(preprocess.rgb(frame), buffers)
+            sides = side_ids(buffers.handedness)
+            if smoothers is not None:
+                smoothers[0].filter(range(len(poses)), poses, capture_time, out=poses)
+                smoothers[1].filter(sides, hands, capture_time, out=hands)
+            aspect = frame.shape[1] / frame.shape[0]
+            pose_state = body_motion.update(range(len(poses)), poses, capture_time, aspect)
+            hand_state = hands_motion.update(sides, hands, capture_time, aspect)
+            if sender is not None:
+                sender.send(capture_time, hands, buffers.handedness, poses, list(range(len(poses))),
+                            hand_analytics=hands_motion.features(hand_state),
+                            pose_analytics=body_motion.features(pose_state))
+
+            render_normal(frame, poses)
+            render_hands(frame, hands)
+            cv2.imshow("Cuerpo y manos", frame)
+            if cv2.waitKey(1) & 0xFF in (27, ord('q')):
+                break
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+        tracker.close()
+        if sender is not None:
+            sender.close()
+
+
+if __name__ == "__main__":
+    main()
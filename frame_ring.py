@@ -0,0 +1,424 @@
+"""Anillo de frames en memoria compartida entre el proceso de captura y la inferencia.
+
+FrameRing reserva en multiprocessing.shared_memory un número fijo de huecos
+de frame con número de secuencia e instante de captura. El proceso de captura
+escribe directamente en un hueco con cap.read(image=...) y los lectores
+obtienen el hueco como vista NumPy, sin copias ni serialización
+(RingReader.read), o lo copian una vez a un buffer propio que reutilizan
+(RingReader.read_into, lo que hace RingCapture).
+
+Cada hueco se marca como "escribiendo" (-1) antes de rellenarlo y con su
+secuencia al terminar, así un lector puede comprobar si el frame que está
+usando se ha sobrescrito (lector rezagado). RingCapture se comporta como un
+cv2.VideoCapture y se puede pasar tal cual a TrackingPipeline.
+
+    python frame_ring.py --resolution 1280x720 --frames 300   # benchmark de transporte
+"""
+import argparse
+import multiprocessing
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+from pipeline import FramePacket, is_video_file, open_capture
+
+# Cabecera int64: huecos, alto, ancho, canales, última secuencia, fin de flujo
+_HEADER_FIELDS = 6
+_HEAD, _CLOSED = 4, 5
+_ALIGN = 64
+WRITING = -1
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _layout(slots, shape):
+    """Desplazamientos de secuencias, timestamps y frames y tamaño total"""
+    seq_offset = _align(_HEADER_FIELDS * 8)
+    time_offset = _align(seq_offset + slots * 8)
+    frame_offset = _align(time_offset + slots * 8)
+    frame_size = int(np.prod(shape))
+    return seq_offset, time_offset, frame_offset, frame_offset + slots * _align(frame_size)
+
+
+class FrameRing:
+    """Huecos de frame preasignados en memoria compartida.
+
+    Con create() el anillo es propietario del segmento y lo libera en
+    close(); attach() se conecta a un anillo existente por nombre.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((_HEADER_FIELDS,), np.int64, shm.buf)
+        slots, height, width, channels = (int(v) for v in self.header[:4])
+        shape = (height, width, channels)
+        seq_offset, time_offset, frame_offset, _ = _layout(slots, shape)
+        frame_stride = _align(int(np.prod(shape)))
+
+        self.slots = slots
+        self.shape = shape
+        self.seqs = np.ndarray((slots,), np.int64, shm.buf, seq_offset)
+        self.timestamps = np.ndarray((slots,), np.float64, shm.buf, time_offset)
+        self.frames = [
+            np.ndarray(shape, np.uint8, shm.buf, frame_offset + i * frame_stride)
+            for i in range(slots)
+        ]
+
+    @classmethod
+    def create(cls, shape, slots=8, name=None):
+        shape = tuple(int(v) for v in shape)
+        if len(shape) == 2:
+            shape += (1,)
+        size = _layout(slots, shape)[3]
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_FIELDS,), np.int64, shm.buf)
+        header[:] = (slots,) + shape + (-1, 0)
+        np.ndarray((slots,), np.int64, shm.buf, _layout(slots, shape)[0])[:] = WRITING
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, shared_tracker=False):
+        """Se conecta a un anillo existente.
+
+        Solo el creador libera el segmento: un proceso independiente tiene su
+        propio resource_tracker, que lo daría por perdido y lo borraría al
+        salir, así que se desregistra. Un hijo del creador (shared_tracker)
+        comparte su tracker y desregistrar borraría el registro del dueño.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        if not shared_tracker:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def head(self):
+        """Última secuencia publicada (-1 si aún no hay ninguna)"""
+        return int(self.header[_HEAD])
+
+    @property
+    def closed(self):
+        return bool(self.header[_CLOSED])
+
+    # --- Escritura (un único escritor) ---
+
+    def begin_write(self):
+        """Devuelve (secuencia, vista del hueco) para rellenar in situ"""
+        seq = self.head + 1
+        slot = seq % self.slots
+        self.seqs[slot] = WRITING
+        return seq, self.frames[slot]
+
+    def commit(self, seq, timestamp=None):
+        """Publica el hueco escrito con begin_write()"""
+        slot = seq % self.slots
+        self.timestamps[slot] = time.time() if timestamp is None else timestamp
+        self.seqs[slot] = seq
+        self.header[_HEAD] = seq
+
+    def write(self, frame, timestamp=None):
+        """Copia un frame ya existente en el siguiente hueco"""
+        seq, view = self.begin_write()
+        np.copyto(view, frame.reshape(self.shape))
+        self.commit(seq, timestamp)
+        return seq
+
+    def write_capture(self, cap, timestamp=None):
+        """Lee de la captura directamente sobre el siguiente hueco; None si no hay frame"""
+        seq, view = self.begin_write()
+        ret, image = cap.read(image=view)
+        if not ret:
+            return None
+        if image is not view:
+            # La captura no respetó el buffer (p. ej. cambio de tamaño)
+            np.copyto(view, image.reshape(self.shape))
+        self.commit(seq, timestamp)
+        return seq
+
+    def close_stream(self):
+        """Marca el fin del flujo para los lectores"""
+        self.header[_CLOSED] = 1
+
+    # --- Lectura ---
+
+    def get(self, seq):
+        """FramePacket del hueco con esa secuencia, o None si ya no está"""
+        slot = seq % self.slots
+        if self.seqs[slot] != seq:
+            return None
+        return FramePacket(seq, float(self.timestamps[slot]), self.frames[slot])
+
+    def valid(self, seq):
+        """True si el hueco sigue conteniendo esa secuencia (no se ha sobrescrito)"""
+        return seq >= 0 and self.seqs[seq % self.slots] == seq
+
+    def close(self):
+        self.header = self.seqs = self.timestamps = None
+        self.frames = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    """Lector de un FrameRing con detección de retrasos.
+
+    Con latest_only=True cada read() devuelve el frame más reciente que no se
+    haya leído aún; los intermedios cuentan como saltados. Con
+    latest_only=False se leen en orden y, si el escritor ha dado la vuelta al
+    anillo, los frames perdidos cuentan como lagged.
+    """
+
+    def __init__(self, ring, latest_only=True, poll_interval=0.0005):
+        self.ring = ring
+        self.latest_only = latest_only
+        self.poll_interval = poll_interval
+        self.last_seq = -1
+        self.skipped = 0
+        self.lagged = 0
+
+    def read(self, timeout=None):
+        """Siguiente FramePacket (vista sin copia); None al vencer el timeout o al fin del flujo"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            head = self.ring.head
+            if head > self.last_seq:
+                if self.latest_only:
+                    seq = head
+                    self.skipped += seq - self.last_seq - 1 if self.last_seq >= 0 else 0
+                else:
+                    seq = self.last_seq + 1
+                    oldest = head - self.ring.slots + 2  # el hueco siguiente puede estar escribiéndose
+                    if seq < oldest:
+                        self.lagged += oldest - seq
+                        seq = oldest
+                packet = self.ring.get(seq)
+                if packet is not None:
+                    self.last_seq = seq
+                    return packet
+                # Sobrescrito entre la lectura de head y la del hueco
+                self.lagged += 1
+                self.last_seq = seq
+                continue
+            if self.ring.closed:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def read_into(self, image=None, timeout=None):
+        """Como read(), pero copia el frame en image (reutilizado si encaja).
+
+        Si el escritor pisa el hueco durante la copia se lee el siguiente.
+        Devuelve un FramePacket con la copia, o None como read().
+        """
+        while True:
+            packet = self.read(timeout)
+            if packet is None:
+                return None
+            if image is None or image.shape != packet.frame.shape:
+                image = np.empty_like(packet.frame)
+            np.copyto(image, packet.frame)
+            if self.still_valid(packet):
+                return packet._replace(frame=image)
+
+    def still_valid(self, packet):
+        """Comprueba tras usar una vista que el escritor no la ha pisado"""
+        if self.ring.valid(packet.index):
+            return True
+        self.lagged += 1
+        return False
+
+
+def _capture_main(source, slots, width, height, realtime, conn, stop_event):
+    """Proceso de captura: abre la fuente y escribe en el anillo que crea el padre"""
+    try:
+        cap = open_capture(source, width=width, height=height)
+    except RuntimeError as e:
+        conn.send(("error", str(e)))
+        return
+    ret, first = cap.read()
+    if not ret:
+        conn.send(("error", "La fuente no devolvió ningún frame"))
+        cap.release()
+        return
+
+    conn.send(("shape", first.shape))
+    kind, name = conn.recv()
+    ring = FrameRing.attach(name, shared_tracker=True)
+    fps = cap.get(cv2.CAP_PROP_FPS) if realtime else 0
+    interval = 1.0 / fps if fps and fps > 0 else 0.0
+    try:
+        ring.write(first)
+        next_time = time.perf_counter()
+        while not stop_event.is_set():
+            if ring.write_capture(cap) is None:
+                break
+            if interval:
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        ring.close_stream()
+        ring.close()
+        cap.release()
+
+
+class RingCapture:
+    """Captura en otro proceso servida por un FrameRing, con la interfaz de cv2.VideoCapture.
+
+    read(image) copia el frame más reciente del anillo en image (o en un
+    frame nuevo), igual que cv2.VideoCapture.read: las etapas siguientes
+    pueden dibujar en él y tardar lo que necesiten sin que el escritor lo
+    pise. Si el escritor sobrescribe el hueco durante la copia se lee el
+    siguiente. La única copia sustituye a la decodificación en este proceso.
+    """
+
+    def __init__(self, source=0, slots=8, width=None, height=None, realtime=False, timeout=10.0):
+        # El hijo hereda el resource_tracker en marcha y se conecta al anillo
+        # sin desregistrarlo (FrameRing.attach con shared_tracker)
+        resource_tracker.ensure_running()
+        self.stop_event = multiprocessing.Event()
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_capture_main,
+            args=(source, slots, width, height, realtime, child_conn, self.stop_event),
+            daemon=True,
+        )
+        self.process.start()
+        self.ring = None
+        if not parent_conn.poll(timeout):
+            self.release()
+            raise RuntimeError("No se pudo abrir ningún dispositivo")
+        kind, value = parent_conn.recv()
+        if kind == "error":
+            self.release()
+            raise RuntimeError(value)
+        self.ring = FrameRing.create(value, slots)
+        parent_conn.send(("name", self.ring.name))
+        self.reader = RingReader(self.ring, latest_only=True)
+
+    def isOpened(self):
+        return self.ring is not None and not self.ring.closed
+
+    def read(self, image=None):
+        while self.ring is not None:
+            packet = self.reader.read_into(image, timeout=0.5)
+            if packet is not None:
+                return True, packet.frame
+            if self.ring.closed or not self.process.is_alive():
+                break
+        return False, None
+
+    def get(self, prop):
+        if self.ring is not None and prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.ring.shape[1])
+        if self.ring is not None and prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.ring.shape[0])
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+def open_shared_capture(source=0, slots=8, width=None, height=None, realtime=None):
+    """Como open_capture, pero con la captura en un proceso aparte vía memoria compartida.
+
+    Con realtime=None los ficheros de vídeo se leen a su cadencia original.
+    """
+    if realtime is None:
+        realtime = is_video_file(source)
+    return RingCapture(source, slots=slots, width=width, height=height, realtime=realtime)
+
+
+def benchmark(shape, frames=300, slots=8):
+    """Coste por frame de transportar frames: cola entre procesos frente al anillo.
+
+    Del anillo se mide la vista sin copia (RingReader.read) y la lectura que
+    hacen los scripts con RingCapture.read, que copia el frame a un buffer
+    reutilizado (RingReader.read_into).
+    """
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, shape, dtype=np.uint8)
+    results = {}
+
+    # multiprocessing.Queue serializa el frame, lo pasa por una tubería y lo deserializa
+    q = multiprocessing.Queue(maxsize=2)
+    start = time.perf_counter()
+    for _ in range(frames):
+        q.put(frame)
+        q.get()
+    results["queue_ms"] = (time.perf_counter() - start) * 1000.0 / frames
+    q.close()
+
+    # Una copia completa del frame, como referencia
+    dst = np.empty_like(frame)
+    start = time.perf_counter()
+    for _ in range(frames):
+        np.copyto(dst, frame)
+    results["copy_ms"] = (time.perf_counter() - start) * 1000.0 / frames
+
+    # Anillo: la captura escribe en el hueco (aquí ya escrito) y el lector toma la vista
+    ring = FrameRing.create(shape, slots)
+    try:
+        for view in ring.frames:
+            np.copyto(view, frame)
+        reader = RingReader(ring, latest_only=False)
+        start = time.perf_counter()
+        for _ in range(frames):
+            seq, view = ring.begin_write()
+            ring.commit(seq)
+            packet = reader.read()
+            reader.still_valid(packet)
+        results["ring_view_ms"] = (time.perf_counter() - start) * 1000.0 / frames
+
+        image = np.empty_like(frame)
+        start = time.perf_counter()
+        for _ in range(frames):
+            seq, view = ring.begin_write()
+            ring.commit(seq)
+            reader.read_into(image)
+        results["ring_copy_ms"] = (time.perf_counter() - start) * 1000.0 / frames
+        results["lagged"] = reader.lagged
+    finally:
+        ring.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de transporte de frames entre procesos")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--slots", type=int, default=8)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    results = benchmark((height, width, 3), args.frames, args.slots)
+    print(f"Frame {width}x{height}, {args.frames} frames")
+    print(f"  Cola entre procesos: {results['queue_ms']:8.3f} ms/frame")
+    print(f"  Copia de referencia: {results['copy_ms']:8.3f} ms/frame")
+    print(f"  Anillo, vista:       {results['ring_view_ms']:8.3f} ms/frame")
+    print(f"  Anillo, RingCapture: {results['ring_copy_ms']:8.3f} ms/frame "
+          f"(copia a buffer reutilizado, {results['lagged']} rezagados)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Inferencia a saltos con predicción de landmarks en los frames intermedios.
+
+FrameSkipper ejecuta el modelo solo cada N frames o cuando el movimiento
+entre frames supera un umbral; en el resto predice los landmarks con un
+modelo de velocidad constante (o un Kalman por coordenada), todo vectorizado
+sobre los arrays de landmark_arrays. Cada salida indica si fue inferida o
+predicha y se llevan estadísticas del error de predicción.
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+class ConstantVelocityPredictor:
+    """Predicción por articulación con velocidad suavizada"""
+
+    def __init__(self, alpha=0.6):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.timestamp = None
+
+    def update(self, points, timestamp):
+        if self.position is None or self.position.shape != points.shape:
+            self.position = points.astype(np.float32, copy=True)
+            self.velocity = np.zeros_like(self.position)
+        else:
+            dt = max(timestamp - self.timestamp, 1e-3)
+            velocity = (points - self.position) / dt
+            self.velocity *= 1 - self.alpha
+            self.velocity += self.alpha * velocity
+            self.position[...] = points
+        self.timestamp = timestamp
+
+    def predict(self, timestamp, out=None):
+        if self.position is None:
+            return None
+        dt = timestamp - self.timestamp
+        if out is None or out.shape != self.position.shape:
+            out = np.empty_like(self.position)
+        np.multiply(self.velocity, dt, out=out)
+        out += self.position
+        return out
+
+
+class KalmanPredictor:
+    """Kalman de velocidad constante independiente por coordenada, vectorizado.
+
+    El estado (posición, velocidad) y la covarianza 2x2 se guardan como arrays
+    con la forma de los landmarks, así todas las articulaciones se actualizan
+    en unas pocas operaciones NumPy.
+    """
+
+    def __init__(self, process_noise=1.0, measurement_noise=1e-4):
+        self.q = process_noise
+        self.r = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.timestamp = None
+
+    def _propagate(self, dt):
+        # x = F x ; P = F P F' + Q con F = [[1, dt], [0, 1]]
+        self.position += self.velocity * dt
+        p00, p01, p11 = self.p00, self.p01, self.p11
+        self.p00 = p00 + 2 * dt * p01 + dt * dt * p11 + self.q * dt ** 4 / 4
+        self.p01 = p01 + dt * p11 + self.q * dt ** 3 / 2
+        self.p11 = p11 + self.q * dt * dt
+
+    def update(self, points, timestamp):
+        if self.position is None or self.position.shape != points.shape:
+            self.position = points.astype(np.float32, copy=True)
+            self.velocity = np.zeros_like(self.position)
+            self.p00 = np.full_like(self.position, self.r)
+            self.p01 = np.zeros_like(self.position)
+            self.p11 = np.ones_like(self.position)
+            self.timestamp = timestamp
+            return
+
+        self._propagate(max(timestamp - self.timestamp, 1e-3))
+        # Corrección con la medida de posición (H = [1, 0])
+        s = self.p00 + self.r
+        k0 = self.p00 / s
+        k1 = self.p01 / s
+        innovation = points - self.position
+        self.position += k0 * innovation
+        self.velocity += k1 * innovation
+        self.p11 = self.p11 - k1 * self.p01
+        self.p01 = self.p01 * (1 - k0)
+        self.p00 = self.p00 * (1 - k0)
+        self.timestamp = timestamp
+
+    def predict(self, timestamp, out=None):
+        if self.position is None:
+            return None
+        dt = timestamp - self.timestamp
+        if out is None or out.shape != self.position.shape:
+            out = np.empty_like(self.position)
+        np.multiply(self.velocity, dt, out=out)
+        out += self.position
+        return out
+
+
+class MotionDetector:
+    """Movimiento medio entre frames sobre una miniatura en gris preasignada"""
+
+    def __init__(self, size=(64, 36)):
+        self.size = size
+        self.small = None
+        self.gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        self.reference = None
+        self.diff = np.empty_like(self.gray)
+
+    def measure(self, frame):
+        """Diferencia media (0-255) respecto a la última referencia"""
+        self.small = cv2.resize(frame, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_RGB2GRAY, dst=self.gray)
+        if self.reference is None:
+            return float("inf")
+        cv2.absdiff(self.gray, self.reference, dst=self.diff)
+        return float(self.diff.mean())
+
+    def set_reference(self):
+        if self.reference is None:
+            self.reference = self.gray.copy()
+        else:
+            np.copyto(self.reference, self.gray)
+
+
+class SkipStats:
+    """Frames inferidos/predichos y error de predicción medido al inferir"""
+
+    def __init__(self):
+        self.inferred = 0
+        self.predicted = 0
+        self.error_count = 0
+        self.error_sum = 0.0
+        self.error_max = 0.0
+
+    def add_error(self, error):
+        self.error_count += 1
+        self.error_sum += error
+        self.error_max = max(self.error_max, error)
+
+    def summary(self):
+        total = self.inferred + self.predicted
+        mean = self.error_sum / self.error_count if self.error_count else 0.0
+        return {
+            "frames": total,
+            "inferred": self.inferred,
+            "predicted": self.predicted,
+            "inference_ratio": self.inferred / total if total else 0.0,
+            "mean_error": mean,
+            "max_error": self.error_max,
+        }
+
+
+class FrameSkipper:
+    """Decide por frame si inferir o predecir.
+
+    process(frame_rgb, out) debe devolver un array de landmarks (escrito en
+    out si se indica) o None. Se infiere cada every_n frames; con umbral de
+    movimiento además se infiere en cuanto la escena cambia, y every_n pasa a
+    ser el máximo de frames seguidos sin inferir. El error de predicción se
+    mide en coordenadas normalizadas (x, y) cada vez que se infiere sobre un
+    estado existente.
+
+    La predicción va por filas. identity() (opcional) identifica las filas del
+    último resultado, por ejemplo la lateralidad de cada mano; si cambia entre
+    inferencias (manos reordenadas, una que sale y otra que entra) se
+    reinicia el predictor en lugar de calcular velocidades entre objetos
+    distintos.
+    """
+
+    def __init__(self, process, every_n=3, motion_threshold=None, predictor=None, identity=None):
+        self.process = process
+        self.identity = identity
+        self.last_identity = None
+        self.every_n = max(1, every_n)
+        self.motion_threshold = motion_threshold
+        self.predictor = predictor if predictor is not None else ConstantVelocityPredictor()
+        self.motion = MotionDetector() if motion_threshold is not None else None
+        self.stats = SkipStats()
+        self.since_inference = 0
+        self.visibility = None
+        self._prediction = None
+
+    def _should_infer(self, frame_rgb):
+        moved = False
+        if self.motion is not None:
+            # Se mide siempre para tener la miniatura lista como referencia
+            moved = self.motion.measure(frame_rgb) > self.motion_threshold
+        if self.predictor.position is None:
+            return True
+        return moved or self.since_inference + 1 >= self.every_n
+
+    def step(self, frame_rgb, timestamp=None, out=None):
+        """Devuelve (landmarks, inferido) para el frame.
+
+        Los landmarks van en out o, sin out, en un array propio del llamante
+        que los pasos siguientes no modifican.
+        """
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+
+        if not self._should_infer(frame_rgb):
+            self.since_inference += 1
+            self.stats.predicted += 1
+            if out is None:
+                # _prediction es un buffer de trabajo que se reescribe en cada paso
+                self._prediction = self.predictor.predict(timestamp, self._prediction)
+                out = self._prediction.copy()
+            else:
+                out = self.predictor.predict(timestamp, out)
+            if self.visibility is not None:
+                # La visibilidad no se predice: se mantiene la última medida
+                out[..., 3] = self.visibility
+            return out, False
+
+        landmarks = self.process(frame_rgb, out)
+        self.since_inference = 0
+        self.stats.inferred += 1
+        if self.motion is not None:
+            self.motion.set_reference()
+
+        if landmarks is None or len(landmarks) == 0:
+            self.predictor.reset()
+            self.visibility = None
+            self.last_identity = None
+            return landmarks, True
+
+        identity = self.identity() if self.identity is not None else None
+        if identity != self.last_identity:
+            self.predictor.reset()
+            self.last_identity = identity
+
+        expected = self.predictor.predict(timestamp, self._prediction)
+        if expected is not None and expected.shape == landmarks.shape:
+            self._prediction = expected
+            error = np.abs(expected[..., :2] - landmarks[..., :2]).mean()
+            self.stats.add_error(float(error))
+
+        self.predictor.update(landmarks, timestamp)
+        self.visibility = landmarks[..., 3].copy() if landmarks.shape[-1] > 3 else None
+        return landmarks, True
+
+    def summary(self):
+        stats = self.stats.summary()
+        return (f"Inferidos {stats['inferred']}/{stats['frames']} frames "
+                f"({stats['inference_ratio'] * 100:.0f}%), error de predicción "
+                f"medio {stats['mean_error']:.4f} máx {stats['max_error']:.4f}")
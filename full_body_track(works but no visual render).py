@@ -1,6 +1,12 @@
 import cv2
 import mediapipe as mp
 
+from metrics import RateLimitedLog, configure_logging
+
+# Mensajes del bucle como mucho una vez cada 5 s
+configure_logging()
+log = RateLimitedLog()
+
 print("Iniciando...")
 mp_pose = mp.solutions.pose
 pose = mp_pose.Pose()
@@ -24,10 +30,10 @@ while cap.isOpened():
     try:
         results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         if results.pose_landmarks:
-            print("¡Cuerpo detectado!")
+            log.info("cuerpo", "¡Cuerpo detectado!")
         cv2.imshow('Debug', frame)
     except Exception as e:
-        print(f"Error en frame: {e}")
+        log.warning("frame", f"Error en frame: {e}")
 
     if cv2.waitKey(1) == ord('q'):
         break
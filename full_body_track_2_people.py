@@ -1,118 +1,129 @@
+import time
+
 import cv2
-import mediapipe as mp
 import numpy as np
 
+from frame_ring import open_shared_capture
+from hud import draw_text
+from landmark_arrays import NOSE, POSE_CONNECTIONS, draw_skeleton, to_pixels
+from metrics import RateLimitedLog, configure_logging
+from multi_person import MultiPersonPoseTracker
+from pipeline import TrackingPipeline, open_capture
+from preprocess import FramePreprocessor
+from smoothing import pose_smoother
+
 class DualPersonPoseTracker:
-    def __init__(self):
+    def __init__(self, source=0, max_people=2, shared_memory=False, smoothing="medium"):
         """Inicialización con manejo de errores incorporado"""
-        self.mp_pose = mp.solutions.pose
-        self.mp_drawing = mp.solutions.drawing_utils
-        
-        # Configuración robusta del modelo
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7,
-            smooth_landmarks=True
+        # Configuración robusta del modelo: una instancia de Pose por
+        # persona seguida, cada una sobre su propio recorte. El suavizado de
+        # MediaPipe trabaja en coordenadas del recorte, que se mueve con la
+        # persona; con smoothing se suaviza en coordenadas del frame con un
+        # banco One-Euro indexado por id de persona
+        self.pose = MultiPersonPoseTracker(
+            max_people=max_people,
+            pose_config=dict(
+                static_image_mode=False,
+                model_complexity=1,
+                min_detection_confidence=0.7,
+                min_tracking_confidence=0.7,
+                smooth_landmarks=smoothing is None
+            )
         )
+        self.smoother = pose_smoother(max_people=max_people * 2, preset=smoothing) if smoothing else None
+        
+        # Errores del bucle como mucho una vez cada 5 s
+        configure_logging()
+        self.log = RateLimitedLog()
         
         # Colores para cada persona
-        self.colors = [(0, 255, 0), (0, 0, 255)]  # Verde y Rojo
+        self.colors = [(0, 255, 0), (0, 0, 255), (255, 0, 0), (0, 255, 255)]  # Verde, Rojo, Azul y Amarillo
         
-        # Inicializar cámara con configuración segura
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
+        # Inicializar cámara (o vídeo) con configuración segura y
+        # resolución estándar para mayor estabilidad; con shared_memory la
+        # captura va en otro proceso y los frames llegan por memoria compartida
+        try:
+            if shared_memory:
+                self.cap = open_shared_capture(source, width=1280, height=720)
+            else:
+                self.cap = open_capture(source, width=1280, height=720)
+        except RuntimeError:
             raise RuntimeError("No se pudo abrir la cámara")
         
-        # Establecer resolución estándar para mayor estabilidad
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        # Espejo y RGB en buffers reutilizados: tres juegos, uno en
+        # inferencia, uno en cola y uno en render; cada juego vuelve a la
+        # lista de libres (release_results) cuando se ha dibujado
+        self.preprocess = FramePreprocessor(mirror=True, slots=3)
         
         # Variables para tracking básico
         self.last_valid_frame = None
+        self.pipeline = None
 
-    def process_region(self, frame, x_start, x_end, person_id):
-        """Procesa una región de la imagen con manejo de errores"""
-        try:
-            if frame is None or frame.size == 0:
-                return frame
-            
-            h, w = frame.shape[:2]
-            x_start_px = int(x_start * w)
-            x_end_px = int(x_end * w)
-            
-            # Extraer región de interés con verificación de límites
-            roi = frame[:, max(0, x_start_px):min(w, x_end_px)]
-            if roi.size == 0:
-                return frame
-            
-            # Convertir a RGB
-            roi_rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
-            
-            # Detectar pose
-            results = self.pose.process(roi_rgb)
-            
-            if results.pose_landmarks:
-                # Ajustar coordenadas al frame completo
-                for landmark in results.pose_landmarks.landmark:
-                    landmark.x = landmark.x * (x_end - x_start) + x_start
-                
-                # Dibujar landmarks
-                self.mp_drawing.draw_landmarks(
-                    frame,
-                    results.pose_landmarks,
-                    self.mp_pose.POSE_CONNECTIONS,
-                    self.mp_drawing.DrawingSpec(color=self.colors[person_id], thickness=2, circle_radius=2),
-                    self.mp_drawing.DrawingSpec(color=self.colors[person_id], thickness=2)
-                )
-                
-                # Mostrar ID de persona
-                if results.pose_landmarks.landmark:
-                    nose = results.pose_landmarks.landmark[self.mp_pose.PoseLandmark.NOSE]
-                    x, y = int(nose.x * w), int(nose.y * h)
-                    cv2.putText(frame, f'Persona {person_id+1}', (x, y-20), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, self.colors[person_id], 2)
-            
+    def draw_person(self, frame, landmarks, person_id):
+        """Dibuja el esqueleto (33, 4) y la etiqueta de una persona"""
+        if landmarks is None:
             return frame
-            
+        
+        h, w = frame.shape[:2]
+        color = self.colors[person_id % len(self.colors)]
+        
+        # Dibujar landmarks
+        draw_skeleton(frame, landmarks, POSE_CONNECTIONS, joint_color=color, bone_color=color)
+        
+        # Mostrar ID de persona
+        if len(landmarks):
+            x, y = to_pixels(landmarks[NOSE], w, h).tolist()
+            draw_text(frame, f'Persona {person_id+1}', (x, y-20), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        return frame
+
+    def infer(self, frame):
+        """Etapa de inferencia: espejo y pose de cada persona seguida"""
+        # Voltear horizontalmente para efecto espejo (y RGB para MediaPipe)
+        frame, frame_rgb = self.preprocess.process(frame)
+        slot = self.preprocess.slot
+        
+        try:
+            people = [(t.track_id, t.landmarks) for t in self.pose.update(frame, frame_rgb)]
+            if people and self.smoother is not None:
+                # Todas las personas en una sola pasada del filtro
+                ids = [person_id for person_id, _ in people]
+                poses = self.smoother.filter(ids, np.stack([l for _, l in people]), time.perf_counter())
+                people = list(zip(ids, poses))
         except Exception as e:
-            print(f"Error al procesar región: {e}")
-            return frame
+            self.log.warning("inferencia", f"Error al procesar personas: {e}")
+            people = []
+        return slot, frame, people
+
+    def release_results(self, results):
+        """Devuelve el juego de buffers del frame ya dibujado (o descartado)"""
+        self.preprocess.release(results[0])
+
+    def render(self, frame, results):
+        """Etapa de render: dibuja sobre el frame ya volteado"""
+        _, frame, people = results
+        try:
+            for person_id, landmarks in people:
+                frame = self.draw_person(frame, landmarks, person_id)
+            self.last_valid_frame = frame
+        except Exception as e:
+            self.log.warning("render", f"Error en procesamiento: {e}")
+            if self.last_valid_frame is not None:
+                return self.last_valid_frame
+        return frame
 
     def run(self):
         """Bucle principal con recuperación de errores"""
         try:
-            while True:
-                # Leer frame con verificación
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Error de frame, reintentando...")
-                    time.sleep(0.1)
-                    continue
-                
-                # Voltear horizontalmente para efecto espejo
-                frame = cv2.flip(frame, 1)
-                self.last_valid_frame = frame.copy()
-                
-                try:
-                    # Procesar región izquierda (Persona 0)
-                    frame = self.process_region(frame, 0.0, 0.5, 0)
-                    
-                    # Procesar región derecha (Persona 1)
-                    frame = self.process_region(frame, 0.5, 1.0, 1)
-                    
-                    # Mostrar frame
-                    cv2.imshow('Detección Simultánea de 2 Personas', frame)
-                    
-                except Exception as e:
-                    print(f"Error en procesamiento: {e}")
-                    if self.last_valid_frame is not None:
-                        cv2.imshow('Detección Simultánea de 2 Personas', self.last_valid_frame)
-                
-                # Salir con 'q'
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            # Captura, inferencia y render en hilos separados; siempre se
+            # procesa el frame más reciente
+            self.pipeline = TrackingPipeline(
+                self.cap, self.infer, self.render,
+                window='Detección Simultánea de 2 Personas',
+                reuse_frames=True,
+                release=self.release_results
+            )
+            self.pipeline.run()
                     
         finally:
             # Liberar recursos de forma segura
@@ -120,7 +131,10 @@ class DualPersonPoseTracker:
             cv2.destroyAllWindows()
             if hasattr(self, 'pose'):
                 self.pose.close()
+            if self.pipeline is not None:
+                self.pipeline.print_stats()
 
 if __name__ == "__main__":
-    tracker = DualPersonPoseTracker()
+    import sys
+    tracker = DualPersonPoseTracker(sys.argv[1] if len(sys.argv) > 1 else 0)
     tracker.run()
\ No newline at end of file
@@ -1,55 +1,108 @@
-import cv2
-import mediapipe as mp
+import sys
 import time
 
-# Inicializar MediaPipe Pose
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose(
-    min_detection_confidence=0.5,  # Corregido: "detection" (no "detection")
-    min_tracking_confidence=0.5
+import cv2
+
+from adaptive_roi import AdaptivePoseEstimator
+from frame_ring import open_shared_capture
+from frame_skip import FrameSkipper
+from landmark_arrays import LandmarkBuffers
+from metrics import MetricsRegistry, configure_logging, start_metrics
+from pipeline import TrackingPipeline, open_capture
+from preprocess import FramePreprocessor
+from renderers import render_normal
+from smoothing import pose_smoother
+
+# Presupuesto de inferencia por frame (ms); None para calidad fija
+INFERENCE_BUDGET_MS = 33.0
+
+# Inferir cada N frames y predecir los intermedios (1 = inferir siempre);
+# con MOTION_THRESHOLD también se infiere cuando la escena cambia
+INFER_EVERY = 1
+MOTION_THRESHOLD = None
+
+# Suavizado One-Euro propio ("light", "medium", "strong"); None para usar el de MediaPipe
+SMOOTHING = "medium"
+
+# Inicializar MediaPipe Pose con recorte adaptativo alrededor del cuerpo
+pose = AdaptivePoseEstimator(
+    pose_config=dict(
+        min_detection_confidence=0.5,  # Corregido: "detection" (no "detection")
+        min_tracking_confidence=0.5,
+        smooth_landmarks=SMOOTHING is None
+    ),
+    budget_ms=INFERENCE_BUDGET_MS
 )
+skipper = FrameSkipper(pose.process, every_n=INFER_EVERY, motion_threshold=MOTION_THRESHOLD)
+smoother = pose_smoother(max_people=1, preset=SMOOTHING) if SMOOTHING else None
+# Métricas por HTTP (curl localhost:9100/metrics) y/o en fichero; None para desactivar
+METRICS_PORT = 9100
+STATS_FILE = None
+metrics = MetricsRegistry()
+metrics.add_skipper(skipper)
 
-# Iniciar cámara (con verificación de error)
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("Error: No se pudo abrir la cámara.")
-    exit()
+# Tres juegos de buffers: uno en inferencia, uno en cola y uno en render;
+# cada juego vuelve a la lista de libres cuando se ha dibujado (release)
+buffers = LandmarkBuffers(max_people=1, slots=3)
+# Buffer RGB reutilizado: la conversión no reserva memoria por frame
+preprocess = FramePreprocessor()
 
-# Bucle principal
-while True:
-    # Leer frame
-    success, frame = cap.read()
-    if not success:
-        print("Error: No se pudo leer el frame.")
-        break
 
-    # Convertir BGR a RGB (MediaPipe requiere RGB)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    
-    # Procesar el frame
-    results = pose.process(frame_rgb)
+def infer(frame):
+    # Convertir BGR a RGB (MediaPipe requiere RGB) en el buffer reutilizable
+    frame_rgb = preprocess.rgb(frame)
 
+    # Landmarks como array (personas, 33, 4) en un buffer reutilizable
+    slot = buffers.begin_frame()
+    try:
+        timestamp = time.perf_counter()
+        landmarks, inferred = skipper.step(frame_rgb, timestamp, out=buffers.poses[0])
+        buffers.num_poses = 0 if landmarks is None else 1
+        poses = buffers.active_poses()
+        if buffers.num_poses:
+            detections.inc()
+            if smoother is not None:
+                # Los frames predichos no actualizan la velocidad del filtro
+                smoother.filter([0], poses, timestamp, predicted=not inferred, out=poses)
+    except Exception:
+        # Sin resultado no habrá release: el juego se devuelve aquí
+        buffers.release(slot)
+        raise
+    return slot, poses
+
+
+def render(frame, results):
+    _, poses = results
     # Dibujar landmarks si se detecta un cuerpo
-    if results.pose_landmarks:
-        mp_drawing.draw_landmarks(
-            frame,
-            results.pose_landmarks,
-            mp_pose.POSE_CONNECTIONS,
-            landmark_drawing_spec=mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
-        )
-
-    # Mostrar el frame
-    cv2.imshow("Full Body Tracking", frame)
-
-    # Salir con 'ESC' o 'q'
-    key = cv2.waitKey(1)
-    if key == 27 or key == ord('q'):
-        break
-
-    # Pequeña pausa para reducir carga de CPU
-    time.sleep(0.01)
-
-# Liberar recursos
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+    return render_normal(frame, poses)
+
+
+# Captura en un proceso aparte con los frames en memoria compartida
+USE_SHARED_MEMORY = False
+
+# Iniciar cámara o vídeo pasado por argumento (con verificación de error)
+source = sys.argv[1] if len(sys.argv) > 1 else 0
+try:
+    cap = open_shared_capture(source) if USE_SHARED_MEMORY else open_capture(source)
+except RuntimeError:
+    print("Error: No se pudo abrir la cámara.")
+    exit()
+
+# Captura, inferencia y render en etapas separadas (sin pausas artificiales)
+pipeline = TrackingPipeline(cap, infer, render, window="Full Body Tracking", reuse_frames=True,
+                            release=lambda results: buffers.release(results[0]))
+metrics.add_pipeline(pipeline)
+detections = metrics.detection_counter(lambda: pipeline.inference_stats.count)
+configure_logging()
+stop_metrics = start_metrics(metrics, METRICS_PORT, STATS_FILE)
+try:
+    pipeline.run()
+finally:
+    # Liberar recursos
+    cap.release()
+    cv2.destroyAllWindows()
+    pose.close()
+    stop_metrics()
+    pipeline.print_stats()
+    if INFER_EVERY > 1 or MOTION_THRESHOLD is not None:
+        print(skipper.summary())
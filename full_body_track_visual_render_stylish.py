@@ -1,90 +1,113 @@
+import sys
+import time
+
 import cv2
-import mediapipe as mp
 import numpy as np
 
-# Configuración de MediaPipe
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
+from adaptive_roi import AdaptivePoseEstimator
+from frame_ring import open_shared_capture
+from landmark_arrays import LandmarkBuffers
+from metrics import MetricsRegistry, RateLimitedLog, configure_logging, start_metrics
+from pipeline import TrackingPipeline, open_capture
+from preprocess import FramePreprocessor
+from renderers import render_stylish
+from smoothing import pose_smoother
+
+# Presupuesto de inferencia por frame (ms); None para calidad fija
+INFERENCE_BUDGET_MS = 33.0
 
-# Paleta de colores estilo videojuego
-HUESO_COLOR = (0, 255, 255)  # Amarillo neón para huesos
-ARTICULACION_COLOR = (255, 0, 255)  # Magenta neón para articulaciones
-GROSOR_HUESOS = 5  # Grosor de las líneas de conexión
-TAMANO_ARTICULACIONES = 8  # Tamaño de los círculos de las articulaciones
+# Estilo de dibujo: "neon", "skeleton" o "minimal" (ver renderers.STYLES)
+STYLE = "neon"
+
+# Suavizado One-Euro propio ("light", "medium", "strong"); None para usar el de MediaPipe
+SMOOTHING = "medium"
 
 print("Iniciando seguimiento corporal estilo videojuego...")
 
-# Inicializar modelo de pose
-pose = mp_pose.Pose(
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.7,
-    model_complexity=1
+# Inicializar modelo de pose (recorte adaptativo alrededor del cuerpo)
+pose = AdaptivePoseEstimator(
+    pose_config=dict(
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.7,
+        model_complexity=1,
+        smooth_landmarks=SMOOTHING is None
+    ),
+    budget_ms=INFERENCE_BUDGET_MS
 )
+smoother = pose_smoother(max_people=1, preset=SMOOTHING) if SMOOTHING else None
 
-# Inicializar cámara
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("Fallo al abrir cámara. Probando con vídeo...")
-    cap = cv2.VideoCapture("test_video.mp4")
-    if not cap.isOpened():
-        print("Error crítico: No se pudo abrir ningún dispositivo")
-        exit()
+# Métricas por HTTP (curl localhost:9101/metrics) y/o en fichero; None para desactivar
+METRICS_PORT = 9101
+STATS_FILE = None
+metrics = MetricsRegistry()
 
-print("Comenzando bucle principal...")
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        print("Fin del vídeo o error de captura")
-        break
-    
+# Mensajes del bucle como mucho una vez cada 5 s
+configure_logging()
+log = RateLimitedLog()
+
+# Landmarks (personas, 33, 4) en buffers rotatorios para inferencia y render;
+# cada juego vuelve a la lista de libres cuando se ha dibujado (release)
+buffers = LandmarkBuffers(max_people=1, slots=3)
+# Buffer RGB reutilizado: la conversión no reserva memoria por frame
+preprocess = FramePreprocessor()
+
+
+def infer(frame):
+    # Convertir a RGB (MediaPipe requiere este formato) en el buffer reutilizable
+    frame_rgb = preprocess.rgb(frame)
+
+    # Detección de pose
+    slot = buffers.begin_frame()
     try:
-        # Convertir a RGB (MediaPipe requiere este formato)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Detección de pose
-        results = pose.process(frame_rgb)
-        
-        if results.pose_landmarks:
-            print("¡Cuerpo detectado! Renderizando huesos...")
-            
-            # Dibujar conexiones óseas (huesos)
-            mp_drawing.draw_landmarks(
-                frame,
-                results.pose_landmarks,
-                mp_pose.POSE_CONNECTIONS,
-                mp_drawing.DrawingSpec(
-                    color=ARTICULACION_COLOR,
-                    thickness=TAMANO_ARTICULACIONES,
-                    circle_radius=TAMANO_ARTICULACIONES
-                ),
-                mp_drawing.DrawingSpec(
-                    color=HUESO_COLOR,
-                    thickness=GROSOR_HUESOS,
-                    circle_radius=0  # No dibujar círculos en las conexiones
-                )
-            )
-            
-            # Efecto adicional: brillo en articulaciones
-            h, w = frame.shape[:2]
-            overlay = frame.copy()
-            for landmark in results.pose_landmarks.landmark:
-                x = int(landmark.x * w)
-                y = int(landmark.y * h)
-                cv2.circle(overlay, (x, y), TAMANO_ARTICULACIONES+5, (255, 255, 255), -1)
-            frame = cv2.addWeighted(overlay, 0.3, frame, 0.7, 0)
-        
-        # Mostrar FPS (opcional)
-        cv2.putText(frame, "Modo: VIDEOJUEGO | Q: Salir", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        cv2.imshow('Body Tracking - Estilo Videojuego', frame)
-        
-    except Exception as e:
-        print(f"Error en frame: {e}")
-
-    if cv2.waitKey(1) == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
-print("Ejecución completada")
\ No newline at end of file
+        landmarks = pose.process(frame_rgb, out=buffers.poses[0])
+        buffers.num_poses = 0 if landmarks is None else 1
+        poses = buffers.active_poses()
+        if buffers.num_poses:
+            detections.inc()
+            if smoother is not None:
+                smoother.filter([0], poses, time.perf_counter(), out=poses)
+    except Exception:
+        # Sin resultado no habrá release: el juego se devuelve aquí
+        buffers.release(slot)
+        raise
+    return slot, poses
+
+
+def render(frame, results):
+    _, poses = results
+    if len(poses):
+        log.info("cuerpo", "¡Cuerpo detectado! Renderizando huesos...")
+
+    # Huesos, brillo en articulaciones y rótulo (ver renderers.render_stylish)
+    return render_stylish(frame, poses, style=STYLE)
+
+
+# Captura en un proceso aparte con los frames en memoria compartida
+USE_SHARED_MEMORY = False
+
+# Inicializar cámara (o el vídeo pasado por argumento)
+source = sys.argv[1] if len(sys.argv) > 1 else 0
+try:
+    if USE_SHARED_MEMORY:
+        cap = open_shared_capture(source)
+    else:
+        cap = open_capture(source, fallback="test_video.mp4")
+except RuntimeError as e:
+    print(f"Error crítico: {e}")
+    exit()
+
+print("Comenzando bucle principal...")
+pipeline = TrackingPipeline(cap, infer, render, window='Body Tracking - Estilo Videojuego', reuse_frames=True,
+                            release=lambda results: buffers.release(results[0]))
+metrics.add_pipeline(pipeline)
+detections = metrics.detection_counter(lambda: pipeline.inference_stats.count)
+stop_metrics = start_metrics(metrics, METRICS_PORT, STATS_FILE)
+try:
+    pipeline.run()
+finally:
+    cap.release()
+    cv2.destroyAllWindows()
+    pose.close()
+    stop_metrics()
+    pipeline.print_stats()
+    print("Ejecución completada")
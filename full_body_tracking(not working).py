@@ -1,3 +1,11 @@
 import json
-with open("body_data.json", "w") as f:
-    json.dump(body_data, f)
\ No newline at end of file
+import sys
+
+from batch_process import process_videos, to_body_data
+
+if __name__ == "__main__":
+    # Procesar el vídeo grabado en paralelo y guardar los landmarks por frame
+    video = sys.argv[1] if len(sys.argv) > 1 else "test_video.mp4"
+    body_data = to_body_data(process_videos([video], pose_config={})[video])
+    with open("body_data.json", "w") as f:
+        json.dump(body_data, f)
@@ -0,0 +1,237 @@
+"""Reconocimiento de gestos de mano por tabla, vectorizado y con antirrebote.
+
+Para todas las manos del frame se calculan en una pasada NumPy los ángulos de
+las articulaciones de los dedos y, a partir de ellos, un código de bits por
+mano (dedos extendidos, pinza pulgar-índice y pulgar hacia arriba). Ese
+código indexa una tabla de búsqueda construida una sola vez desde GESTURES,
+así que el coste por frame no depende del número de gestos definidos.
+
+GestureEngine sigue cada mano entre frames y solo cambia su gesto cuando el
+nuevo se mantiene varios frames seguidos, emitiendo eventos de inicio y fin.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from landmark_arrays import triplet_angles
+from landmark_protocol import NO_GESTURE
+
+# Articulaciones (a, b, c) cuyo ángulo en b se mide: MCP, PIP/IP y DIP de cada dedo
+FINGER_JOINTS = np.array([
+    (0, 1, 2), (1, 2, 3), (2, 3, 4),          # pulgar
+    (0, 5, 6), (5, 6, 7), (6, 7, 8),          # índice
+    (0, 9, 10), (9, 10, 11), (10, 11, 12),    # medio
+    (0, 13, 14), (13, 14, 15), (14, 15, 16),  # anular
+    (0, 17, 18), (17, 18, 19), (18, 19, 20),  # meñique
+], dtype=np.intp)
+
+WRIST = 0
+THUMB_TIP = 4
+INDEX_MCP = 5
+INDEX_TIP = 8
+MIDDLE_MCP = 9
+
+EXTENDED_ANGLE = 150.0  # grados: articulación casi recta
+PINCH_DISTANCE = 0.35  # distancia pulgar-índice relativa al tamaño de la palma
+
+# Bits del código de cada mano
+FINGER_BITS = 5
+PINCH_BIT = 1 << 5
+THUMB_UP_BIT = 1 << 6
+CODE_SIZE = 1 << 7
+
+# fingers: pulgar..meñique, "1" extendido, "0" cerrado, "x" indiferente;
+# pinch / thumb_up: True, False o None (indiferente). Gana la primera regla.
+Gesture = namedtuple("Gesture", ["name", "fingers", "pinch", "thumb_up"], defaults=(None, None))
+
+GESTURES = [
+    Gesture("ok", "x0111", pinch=True),
+    Gesture("pinch", "xx000", pinch=True),
+    Gesture("fist", "00000"),
+    Gesture("thumbs_up", "10000", thumb_up=True),
+    Gesture("thumbs_down", "10000", thumb_up=False),
+    Gesture("point", "01000"),
+    Gesture("two", "01100"),
+    Gesture("three", "01110"),
+    Gesture("three_thumb", "11100"),
+    Gesture("four", "01111"),
+    Gesture("open_palm", "11111"),
+    Gesture("gun", "11000"),
+    Gesture("rock", "01001"),
+    Gesture("spiderman", "11001"),
+    Gesture("call", "10001"),
+    Gesture("pinky", "00001"),
+    Gesture("middle", "00100"),
+]
+
+GestureEvent = namedtuple("GestureEvent", ["kind", "gesture", "hand_id", "handedness", "timestamp"])
+
+
+def build_lookup(gestures=GESTURES):
+    """Tabla código -> índice de gesto (NO_GESTURE si ninguno encaja)"""
+    if len(gestures) >= NO_GESTURE:
+        raise ValueError(f"Como máximo {NO_GESTURE - 1} gestos")
+    codes = np.arange(CODE_SIZE)
+    lookup = np.full(CODE_SIZE, NO_GESTURE, dtype=np.uint8)
+    for index in range(len(gestures) - 1, -1, -1):
+        gesture = gestures[index]
+        if len(gesture.fingers) != FINGER_BITS:
+            raise ValueError(f"Patrón de dedos inválido en {gesture.name}: {gesture.fingers}")
+        match = np.ones(CODE_SIZE, dtype=bool)
+        for finger, state in enumerate(gesture.fingers):
+            if state != "x":
+                match &= ((codes >> finger) & 1) == (state == "1")
+        if gesture.pinch is not None:
+            match &= ((codes & PINCH_BIT) != 0) == gesture.pinch
+        if gesture.thumb_up is not None:
+            match &= ((codes & THUMB_UP_BIT) != 0) == gesture.thumb_up
+        # Recorrido inverso: las reglas anteriores sobrescriben a las posteriores
+        lookup[match] = index
+    return lookup
+
+
+def joint_angles(hands):
+    """Ángulos (manos, 15) en grados de las articulaciones de FINGER_JOINTS"""
+    return triplet_angles(hands, FINGER_JOINTS)
+
+
+def hand_codes(hands, angles=None):
+    """Código de bits (manos,) con dedos extendidos, pinza y pulgar hacia arriba"""
+    hands = np.asarray(hands, dtype=np.float32)
+    if angles is None:
+        angles = joint_angles(hands)
+    straight = angles.reshape(-1, 5, 3) > EXTENDED_ANGLE
+
+    # Dedo extendido: PIP y DIP rectos (pulgar: MCP e IP)
+    extended = straight[:, :, 1] & straight[:, :, 2]
+    palm = np.linalg.norm(hands[:, MIDDLE_MCP, :2] - hands[:, WRIST, :2], axis=-1) + 1e-9
+    # El pulgar además debe separarse del nudillo del índice
+    thumb_out = np.linalg.norm(hands[:, THUMB_TIP, :2] - hands[:, INDEX_MCP, :2], axis=-1) > 0.5 * palm
+    extended[:, 0] &= thumb_out
+
+    pinch = np.linalg.norm(hands[:, THUMB_TIP, :2] - hands[:, INDEX_TIP, :2], axis=-1) < PINCH_DISTANCE * palm
+    thumb_up = hands[:, THUMB_TIP, 1] < hands[:, INDEX_MCP, 1]
+
+    codes = (extended * (1 << np.arange(FINGER_BITS))).sum(axis=1)
+    codes |= np.where(pinch, PINCH_BIT, 0)
+    codes |= np.where(thumb_up, THUMB_UP_BIT, 0)
+    return codes.astype(np.intp)
+
+
+class GestureEngine:
+    """Gestos por mano con seguimiento entre frames e histéresis.
+
+    Un gesto nuevo se activa tras on_frames frames seguidos y el gesto activo
+    se da por terminado tras off_frames frames seguidos sin gesto. Las manos
+    se emparejan con las del frame anterior por la posición de la muñeca y la
+    lateralidad.
+    """
+
+    def __init__(self, gestures=GESTURES, max_hands=8, on_frames=3, off_frames=5,
+                 max_distance=0.15, max_misses=5):
+        self.gestures = list(gestures)
+        self.names = [g.name for g in self.gestures]
+        self.lookup = build_lookup(self.gestures)
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+
+        # Estado por hueco de mano seguida
+        self.in_use = np.zeros(max_hands, dtype=bool)
+        self.wrist = np.zeros((max_hands, 2), dtype=np.float32)
+        self.handedness = [None] * max_hands
+        self.hand_ids = np.zeros(max_hands, dtype=np.int64)
+        self.candidate = np.full(max_hands, NO_GESTURE, dtype=np.intp)
+        self.count = np.zeros(max_hands, dtype=np.intp)
+        self.active = np.full(max_hands, NO_GESTURE, dtype=np.intp)
+        self.misses = np.zeros(max_hands, dtype=np.intp)
+        self.next_id = 0
+
+    def gesture_name(self, index):
+        return None if index == NO_GESTURE else self.names[index]
+
+    def _assign_slots(self, wrists, handedness):
+        """Hueco de seguimiento para cada mano del frame (emparejamiento voraz)"""
+        slots = np.full(len(wrists), -1, dtype=np.intp)
+        used = np.flatnonzero(self.in_use)
+        if len(used) and len(wrists):
+            distance = np.linalg.norm(wrists[:, None] - self.wrist[None, used], axis=-1)
+            tracked_hands = np.array([self.handedness[slot] for slot in used], dtype=object)
+            distance[np.array(handedness, dtype=object)[:, None] != tracked_hands[None, :]] = np.inf
+            while True:
+                j, i = np.unravel_index(np.argmin(distance), distance.shape)
+                if not np.isfinite(distance[j, i]) or distance[j, i] > self.max_distance:
+                    break
+                slots[j] = used[i]
+                distance[j, :] = np.inf
+                distance[:, i] = np.inf
+
+        for j in np.flatnonzero(slots < 0):
+            free = np.flatnonzero(~self.in_use)
+            if not len(free):
+                break
+            slot = free[0]
+            self.in_use[slot] = True
+            self.hand_ids[slot] = self.next_id
+            self.next_id += 1
+            self.candidate[slot] = NO_GESTURE
+            self.count[slot] = 0
+            self.active[slot] = NO_GESTURE
+            slots[j] = slot
+        return slots
+
+    def update(self, hands, handedness, timestamp=None):
+        """Devuelve (gesto activo por mano, ids de mano, eventos) para el frame.
+
+        Los gestos van como índices de self.names (NO_GESTURE si ninguno).
+        """
+        hands = np.asarray(hands, dtype=np.float32)
+        handedness = list(handedness)
+        events = []
+
+        wrists = hands[:, WRIST, :2] if len(hands) else np.zeros((0, 2), np.float32)
+        slots = self._assign_slots(wrists, handedness)
+        tracked = slots >= 0
+        current = slots[tracked]
+
+        # Manos no vistas en este frame: tras max_misses se liberan
+        seen = np.zeros(len(self.in_use), dtype=bool)
+        seen[current] = True
+        self.misses[seen] = 0
+        self.misses[self.in_use & ~seen] += 1
+        for slot in np.flatnonzero(self.in_use & (self.misses > self.max_misses)):
+            if self.active[slot] != NO_GESTURE:
+                events.append(GestureEvent("end", self.names[self.active[slot]],
+                                           int(self.hand_ids[slot]), self.handedness[slot], timestamp))
+            self.in_use[slot] = False
+            self.active[slot] = NO_GESTURE
+
+        gestures = np.full(len(hands), NO_GESTURE, dtype=np.intp)
+        if len(current):
+            codes = self.lookup[hand_codes(hands[tracked])].astype(np.intp)
+            self.wrist[current] = wrists[tracked]
+            for slot, j in zip(current.tolist(), np.flatnonzero(tracked).tolist()):
+                self.handedness[slot] = handedness[j]
+
+            # Antirrebote vectorizado: cuenta de frames seguidos con el mismo candidato
+            same = codes == self.candidate[current]
+            self.count[current] = np.where(same, self.count[current] + 1, 1)
+            self.candidate[current] = codes
+            required = np.where(codes == NO_GESTURE, self.off_frames, self.on_frames)
+            changed = (self.count[current] >= required) & (codes != self.active[current])
+
+            for slot in current[changed].tolist():
+                hand_id = int(self.hand_ids[slot])
+                if self.active[slot] != NO_GESTURE:
+                    events.append(GestureEvent("end", self.names[self.active[slot]], hand_id,
+                                               self.handedness[slot], timestamp))
+                if self.candidate[slot] != NO_GESTURE:
+                    events.append(GestureEvent("start", self.names[self.candidate[slot]], hand_id,
+                                               self.handedness[slot], timestamp))
+                self.active[slot] = self.candidate[slot]
+            gestures[tracked] = self.active[current]
+
+        hand_ids = np.full(len(hands), -1, dtype=np.int64)
+        hand_ids[tracked] = self.hand_ids[current]
+        return gestures, hand_ids, events
@@ -1,16 +1,35 @@
 import cv2
 import mediapipe as mp
 import socket
-import json
 import time
 
+from gestures import GestureEngine
+from landmark_arrays import LandmarkBuffers
+from landmark_protocol import LandmarkSender, encode_legacy_json
+from landmark_recording import RecordingWriter
+from metrics import MetricsRegistry, RateLimitedLog, configure_logging, start_metrics
+from motion_analytics import hand_analyzer
+from pipeline import StageStats
+from preprocess import FramePreprocessor
+from renderers import render_hands
+from smoothing import hand_smoother
+
 mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
 
 # Configuración de UDP
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 server_address = ('localhost', 9999)
 
+# Protocolo binario (landmark_protocol); True para el JSON antiguo
+LEGACY_JSON = False
+QUANTIZED = False  # landmarks int16 en lugar de float32
+sender = LandmarkSender(server_address, quantized=QUANTIZED, sock=sock)
+
+# Grabación opcional de la sesión (ruta base de .lmrec/.lmidx o None)
+RECORD_PATH = None
+recorder = RecordingWriter(RECORD_PATH) if RECORD_PATH else None
+frame_index = 0
+
 # Configuración de MediaPipe
 hands = mp_hands.Hands(
     max_num_hands=8,
@@ -20,87 +39,100 @@ hands = mp_hands.Hands(
 
 cap = cv2.VideoCapture(0)
 
-def is_two_gesture(hand_landmarks):
-    # Puntos de referencia de los dedos
-    tip_ids = [4, 8, 12, 16, 20]  # Pulgar, índice, medio, anular, meñique
-    
-    # Verificar si el índice y medio están arriba (extendidos)
-    # y los otros dedos están abajo (cerrados)
-    fingers = []
-    
-    # Pulgar (comparación diferente)
-    if hand_landmarks.landmark[tip_ids[0]].x < hand_landmarks.landmark[tip_ids[0]-1].x:
-        fingers.append(1)  # Pulgar extendido
-    else:
-        fingers.append(0)  # Pulgar cerrado
-    
-    # Otros dedos
-    for id in range(1, 5):
-        if hand_landmarks.landmark[tip_ids[id]].y < hand_landmarks.landmark[tip_ids[id]-2].y:
-            fingers.append(1)  # Dedo extendido
-        else:
-            fingers.append(0)  # Dedo cerrado
-    
-    # El gesto de "2" es cuando solo el índice y medio están extendidos
-    if fingers == [0, 1, 1, 0, 0] or fingers == [1, 1, 1, 0, 0]:
-        return True
-    return False
+# Buffer reutilizable de landmarks (manos, 21, 3)
+buffers = LandmarkBuffers(max_hands=8)
+
+# Gestos de todas las manos por tabla (ver gestures.GESTURES) con antirrebote
+gesture_engine = GestureEngine(max_hands=8)
+# "2" con o sin pulgar, igual que el antiguo is_two_gesture
+EXIT_GESTURES = ("two", "three_thumb")
+
+# Ángulos de los dedos, velocidades y rango de movimiento por mano seguida
+analyzer = hand_analyzer(max_hands=8)
+
+# Suavizado One-Euro de todas las manos en una pasada, por id de mano
+# ("light", "medium", "strong" o None para enviar los landmarks sin filtrar)
+SMOOTHING = "light"
+smoother = hand_smoother(max_hands=8, preset=SMOOTHING) if SMOOTHING else None
+
+# Métricas por etapa y errores de envío (curl localhost:9102/metrics);
+# los mensajes del bucle se escriben como mucho una vez por segundo y clave
+METRICS_PORT = 9102
+STATS_FILE = None
+capture_stats = StageStats("captura")
+inference_stats = StageStats("inferencia")
+send_stats = StageStats("envío")
+render_stats = StageStats("render")
+metrics = MetricsRegistry()
+for stats in (capture_stats, inference_stats, send_stats, render_stats):
+    metrics.add_stage(stats)
+detections = metrics.detection_counter(lambda: inference_stats.count)
+configure_logging()
+log = RateLimitedLog(interval=1.0)
+stop_metrics = start_metrics(metrics, METRICS_PORT, STATS_FILE)
+
+# Espejo y RGB en buffers reutilizados; se dibuja sobre el BGR volteado
+preprocess = FramePreprocessor(mirror=True)
+raw = None
 
 while cap.isOpened():
-    success, image = cap.read()
+    start = time.perf_counter()
+    success, raw = cap.read(raw)
     if not success:
         continue
+    capture_time = time.time()
+    capture_stats.add(time.perf_counter() - start)
     
-    # Procesamiento de imagen
-    image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-    image.flags.writeable = False
-    results = hands.process(image)
-    
-    # Preparar datos para enviar
-    hands_data = {"left": [], "right": []}
+    # Procesamiento de imagen: MediaPipe recibe una vista RGB de solo lectura
+    start = time.perf_counter()
+    image, image_rgb = preprocess.process(raw)
+    results = hands.process(image_rgb)
     
-    two_gesture_detected = False
+    # Landmarks de todas las manos como array (manos, 21, 3)
+    hand_points = buffers.load_hands(results)
+    if len(hand_points):
+        detections.inc()
+    if recorder is not None:
+        recorder.write_frame(frame_index, capture_time, hands=hand_points, handedness=buffers.handedness)
+    frame_index += 1
     
-    if results.multi_hand_landmarks:
-        for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
-            hand_type = handedness.classification[0].label.lower()
-            points = []
-            
-            for landmark in hand_landmarks.landmark:
-                points.append({
-                    "x": landmark.x,
-                    "y": landmark.y,
-                    "z": landmark.z
-                })
-            
-            hands_data[hand_type] = points
-            
-            # Verificar gesto de "2"
-            if is_two_gesture(hand_landmarks):
-                two_gesture_detected = True
-    
-    # Si se detecta el gesto en cualquier mano, salir
-    if two_gesture_detected:
+    # Gestos de todas las manos a la vez; el de salida debe mantenerse unos frames
+    gestures, hand_ids, events = gesture_engine.update(hand_points, buffers.handedness, capture_time)
+    if smoother is not None:
+        smoother.filter(hand_ids, hand_points, capture_time, out=hand_points)
+    motion = analyzer.update(hand_ids, hand_points, capture_time, aspect=image.shape[1] / image.shape[0])
+    inference_stats.add(time.perf_counter() - start)
+    for event in events:
+        log.info(f"gesto {event.hand_id}",
+                 f"Gesto {event.kind}: {event.gesture} (mano {event.hand_id}, {event.handedness})")
+    if any(e.kind == "start" and e.gesture in EXIT_GESTURES for e in events):
         break
     
-    # Enviar datos via UDP
+    # Enviar datos via UDP (con el gesto activo de cada mano)
+    start = time.perf_counter()
     try:
-        sock.sendto(json.dumps(hands_data).encode(), server_address)
+        if LEGACY_JSON:
+            sock.sendto(encode_legacy_json(hand_points, buffers.handedness), server_address)
+        else:
+            sender.send(capture_time, hand_points, buffers.handedness, gestures=gestures,
+                        hand_analytics=analyzer.features(motion))
     except Exception as e:
-        print(f"Error enviando datos: {e}")
+        send_stats.errors += 1
+        log.warning("envío", f"Error enviando datos: {e}")
+    send_stats.add(time.perf_counter() - start)
     
     # Visualización (opcional)
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(
-                image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+    start = time.perf_counter()
+    render_hands(image, hand_points)
     
     cv2.imshow('MediaPipe Hands', image)
+    render_stats.add(time.perf_counter() - start)
     if cv2.waitKey(5) & 0xFF == 27:
         break
 
 cap.release()
+stop_metrics()
+if recorder is not None:
+    recorder.close()
 cv2.destroyAllWindows()
 sock.close()
\ No newline at end of file
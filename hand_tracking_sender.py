@@ -1,16 +1,40 @@
 import cv2
 import mediapipe as mp
-import socket
-import json
 import time
 
+from frame_skip import FrameSkipper
+from gestures import GestureEngine
+from landmark_arrays import LandmarkBuffers
+from landmark_hub import LandmarkHub
+from landmark_recording import RecordingWriter
+from metrics import MetricsRegistry, RateLimitedLog, configure_logging, start_metrics
+from motion_analytics import hand_analyzer
+from pipeline import StageStats
+from preprocess import FramePreprocessor
+from renderers import render_hands
+from smoothing import hand_smoother
+
 mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
 
 # Configuración de UDP
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 server_address = ('localhost', 9999)
 
+# Protocolo binario (landmark_protocol); True para el JSON antiguo
+LEGACY_JSON = False
+QUANTIZED = False  # landmarks int16 en lugar de float32
+
+# Hub de publicación en su propio hilo: envía al destino fijo y acepta más
+# suscriptores TCP/UDP en estos puertos (None para desactivar)
+HUB_TCP_PORT = 9998
+HUB_UDP_PORT = None
+hub = LandmarkHub(tcp_port=HUB_TCP_PORT, udp_port=HUB_UDP_PORT).start()
+hub.add_udp_subscriber(server_address, fmt="json" if LEGACY_JSON else "binary", quantized=QUANTIZED)
+
+# Grabación opcional de la sesión (ruta base de .lmrec/.lmidx o None)
+RECORD_PATH = None
+recorder = RecordingWriter(RECORD_PATH) if RECORD_PATH else None
+frame_index = 0
+
 # Configuración de MediaPipe
 hands = mp_hands.Hands(
     max_num_hands=8,
@@ -20,49 +44,102 @@ hands = mp_hands.Hands(
 
 cap = cv2.VideoCapture(0)
 
+# Buffer reutilizable de landmarks (manos, 21, 3)
+buffers = LandmarkBuffers(max_hands=8)
+
+# Gestos por mano (ver gestures.GESTURES); se envían junto a los landmarks
+gesture_engine = GestureEngine(max_hands=8)
+
+# Ángulos de los dedos, velocidades y rango de movimiento por mano seguida
+# (ids de gesture_engine); viajan en el paquete junto a los landmarks
+analyzer = hand_analyzer(max_hands=8)
+
+# Suavizado One-Euro de todas las manos en una pasada, por id de mano
+# ("light", "medium", "strong" o None para enviar los landmarks sin filtrar)
+SMOOTHING = "light"
+smoother = hand_smoother(max_hands=8, preset=SMOOTHING) if SMOOTHING else None
+
+# Inferir cada N frames y predecir los intermedios (1 = inferir siempre);
+# los paquetes predichos llevan FLAG_PREDICTED. Las manos se predicen por
+# fila: si cambia la lateralidad de las filas se reinicia la predicción
+INFER_EVERY = 1
+MOTION_THRESHOLD = None
+skipper = FrameSkipper(
+    lambda image, out: buffers.load_hands(hands.process(image)),
+    every_n=INFER_EVERY,
+    motion_threshold=MOTION_THRESHOLD,
+    identity=lambda: tuple(buffers.handedness)
+)
+
+# Métricas por etapa, del skipper y del hub (curl localhost:9102/metrics);
+# los eventos de gesto se escriben como mucho una vez por segundo y mano
+METRICS_PORT = 9102
+STATS_FILE = None
+capture_stats = StageStats("captura")
+inference_stats = StageStats("inferencia")
+send_stats = StageStats("envío")
+render_stats = StageStats("render")
+metrics = MetricsRegistry()
+for stats in (capture_stats, inference_stats, send_stats, render_stats):
+    metrics.add_stage(stats)
+metrics.add_skipper(skipper)
+metrics.add_hub(hub)
+detections = metrics.detection_counter(lambda: inference_stats.count)
+configure_logging()
+log = RateLimitedLog(interval=1.0)
+stop_metrics = start_metrics(metrics, METRICS_PORT, STATS_FILE)
+
+# Espejo y RGB en buffers reutilizados; se dibuja sobre el BGR volteado
+preprocess = FramePreprocessor(mirror=True)
+raw = None
+
 while cap.isOpened():
-    success, image = cap.read()
+    start = time.perf_counter()
+    success, raw = cap.read(raw)
     if not success:
         continue
+    capture_time = time.time()
+    capture_stats.add(time.perf_counter() - start)
     
-    # Procesamiento de imagen
-    image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-    image.flags.writeable = False
-    results = hands.process(image)
+    # Procesamiento de imagen: MediaPipe recibe una vista RGB de solo lectura
+    start = time.perf_counter()
+    image, image_rgb = preprocess.process(raw)
     
-    # Preparar datos para enviar
-    hands_data = {"left": [], "right": []}
+    # Landmarks de todas las manos como array (manos, 21, 3), inferidos o predichos
+    hand_points, inferred = skipper.step(image_rgb, capture_time)
+    if len(hand_points):
+        detections.inc()
+    if recorder is not None:
+        recorder.write_frame(frame_index, capture_time, hands=hand_points, handedness=buffers.handedness)
+    frame_index += 1
     
-    if results.multi_hand_landmarks:
-        for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
-            hand_type = handedness.classification[0].label.lower()
-            points = []
-            
-            for landmark in hand_landmarks.landmark:
-                points.append({
-                    "x": landmark.x,
-                    "y": landmark.y,
-                    "z": landmark.z
-                })
-            
-            hands_data[hand_type] = points
+    # Gesto activo de cada mano y eventos de inicio/fin
+    gestures, hand_ids, events = gesture_engine.update(hand_points, buffers.handedness, capture_time)
+    if smoother is not None:
+        smoother.filter(hand_ids, hand_points, capture_time, predicted=not inferred, out=hand_points)
+    motion = analyzer.update(hand_ids, hand_points, capture_time, aspect=image.shape[1] / image.shape[0])
+    inference_stats.add(time.perf_counter() - start)
+    for event in events:
+        log.info(f"gesto {event.hand_id}",
+                 f"Gesto {event.kind}: {event.gesture} (mano {event.hand_id}, {event.handedness})")
     
-    # Enviar datos via UDP
-    try:
-        sock.sendto(json.dumps(hands_data).encode(), server_address)
-    except Exception as e:
-        print(f"Error enviando datos: {e}")
+    # Entregar al hub y seguir: el envío a cada suscriptor va en su hilo
+    start = time.perf_counter()
+    hub.publish(capture_time, hand_points, buffers.handedness, predicted=not inferred,
+                gestures=gestures, hand_analytics=analyzer.features(motion))
+    send_stats.add(time.perf_counter() - start)
     
     # Visualización (opcional)
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(
-                image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+    start = time.perf_counter()
+    render_hands(image, hand_points)
     
     cv2.imshow('MediaPipe Hands', image)
+    render_stats.add(time.perf_counter() - start)
     if cv2.waitKey(5) & 0xFF == 27:
         break
 
-cap.release()
\ No newline at end of file
+cap.release()
+stop_metrics()
+hub.close()
+if recorder is not None:
+    recorder.close()
\ No newline at end of file
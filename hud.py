@@ -0,0 +1,101 @@
+"""Compositor de textos del HUD con parches cacheados.
+
+Cada texto se rasteriza una sola vez con cv2.putText en un parche con máscara
+alfa, guardado en una caché LRU por contenido y estilo; en cada frame solo se
+mezcla ese parche en su posición. Un texto que no cambia no se vuelve a
+dibujar, así que el coste por frame depende del área de las etiquetas y no
+del número de llamadas a putText.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def blend_patch(frame, x0, y0, inverse, premultiplied):
+    """Mezcla in situ un parche en punto fijo (x256) con su esquina en (x0, y0).
+
+    inverse es (256 - alpha) (h, w, 1) y premultiplied es color * alpha
+    (h, w, 3), ambos uint16; el parche se recorta contra los bordes del frame.
+    """
+    h, w = frame.shape[:2]
+    ph, pw = inverse.shape[:2]
+    fx0, fy0 = max(x0, 0), max(y0, 0)
+    fx1, fy1 = min(x0 + pw, w), min(y0 + ph, h)
+    if fx0 >= fx1 or fy0 >= fy1:
+        return frame
+    sx0, sy0 = fx0 - x0, fy0 - y0
+    sx1, sy1 = sx0 + fx1 - fx0, sy0 + fy1 - fy0
+
+    region = frame[fy0:fy1, fx0:fx1]
+    work = region.astype(np.uint16)
+    work *= inverse[sy0:sy1, sx0:sx1]
+    work += premultiplied[sy0:sy1, sx0:sx1]
+    work >>= 8
+    region[...] = work
+    return frame
+
+
+class HudCompositor:
+    """Caché LRU de textos rasterizados y su mezcla en el frame"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _render(self, text, font, scale, color, thickness, line_type):
+        (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+        pad = thickness + 1
+        mask = np.zeros((height + baseline + 2 * pad, width + 2 * pad), np.uint8)
+        origin = (pad, pad + height)
+        cv2.putText(mask, text, origin, font, scale, 255, thickness, line_type)
+
+        # Alfa en punto fijo: 256 = opaco (con LINE_AA el borde queda suavizado)
+        alpha = mask.astype(np.uint16)
+        if line_type == cv2.LINE_AA:
+            alpha += alpha > 0
+        else:
+            alpha[mask > 0] = 256
+        alpha = alpha[..., None]
+        inverse = 256 - alpha
+        premultiplied = alpha * np.asarray(color, np.uint16)
+        return inverse, premultiplied, origin
+
+    def patch(self, text, font=cv2.FONT_HERSHEY_SIMPLEX, scale=0.7, color=(255, 255, 255),
+              thickness=2, line_type=cv2.LINE_8):
+        """Devuelve (inverse, premultiplied, origen) del texto, rasterizándolo si hace falta"""
+        key = (text, font, scale, tuple(int(c) for c in color), thickness, line_type)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self._render(text, font, scale, key[3], thickness, line_type)
+        with self._lock:
+            self.misses += 1
+            self.cache[key] = entry
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return entry
+
+    def draw_text(self, frame, text, org, font=cv2.FONT_HERSHEY_SIMPLEX, scale=0.7,
+                  color=(255, 255, 255), thickness=2, line_type=cv2.LINE_8):
+        """Como cv2.putText (org = inicio de la línea base), pero con el parche cacheado"""
+        if not text:
+            return frame
+        inverse, premultiplied, origin = self.patch(text, font, scale, color, thickness, line_type)
+        return blend_patch(frame, org[0] - origin[0], org[1] - origin[1], inverse, premultiplied)
+
+
+# Compositor compartido por todos los scripts
+HUD = HudCompositor()
+
+
+def draw_text(frame, text, org, font=cv2.FONT_HERSHEY_SIMPLEX, scale=0.7,
+              color=(255, 255, 255), thickness=2, line_type=cv2.LINE_8):
+    return HUD.draw_text(frame, text, org, font, scale, color, thickness, line_type)
@@ -0,0 +1,594 @@
+"""Demonio de inferencia con modelos Pose/Hands siempre cargados.
+
+Importar mediapipe y construir el primer Pose o Hands cuesta más de un
+segundo en cada arranque. El demonio mantiene un pool acotado de modelos ya
+inicializados, agrupados por configuración (model_complexity, umbrales,
+max_num_hands...), y los presta en exclusiva a cada cliente mientras dura su
+sesión, así el seguimiento temporal de MediaPipe es el de ese cliente. Al
+terminar la sesión el modelo se reinicia y se calienta en segundo plano antes
+de volver al pool; si el pool está lleno se cierra el modelo libre de otra
+configuración usado hace más tiempo, o el cliente espera a que quede uno.
+
+Los clientes (InferenceClient) no importan mediapipe: se conectan por un
+socket Unix, escriben cada frame BGR en un anillo de memoria compartida
+(frame_ring.FrameRing) y reciben los landmarks en el formato binario de
+landmark_protocol. Mensajes: tipo u8 + longitud u32 + contenido.
+
+    python inference_daemon.py serve --preload pose hands
+    python inference_daemon.py track 0 --hands --udp localhost:9999
+    python inference_daemon.py status
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from frame_ring import FrameRing
+from landmark_arrays import LandmarkBuffers
+from landmark_protocol import decode_packet, encode_packet
+from metrics import MetricsRegistry, RateLimitedLog, configure_logging, start_metrics
+from pipeline import StageStats
+from preprocess import FramePreprocessor
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "tracking_inference.sock")
+
+# Configuración completa de cada tipo de modelo: las claves que falten en la
+# petición toman estos valores, así {} y la configuración por defecto
+# comparten modelos en el pool
+DEFAULT_CONFIGS = {
+    "pose": dict(model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 smooth_landmarks=True),
+    "hands": dict(max_num_hands=2, model_complexity=1, min_detection_confidence=0.5,
+                  min_tracking_confidence=0.5),
+}
+
+MESSAGE_HEADER = struct.Struct("<BI")
+FRAME_REQUEST = struct.Struct("<qd")  # secuencia en el anillo, timestamp de captura
+MSG_OPEN, MSG_READY, MSG_RING, MSG_FRAME, MSG_RESULT, MSG_STATUS, MSG_ERROR = range(1, 8)
+
+
+def send_message(sock, kind, payload=b""):
+    sock.sendall(MESSAGE_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return bytes(data)
+
+
+def recv_message(sock):
+    """Devuelve (tipo, contenido) o None si el otro extremo ha cerrado"""
+    header = _recv_exact(sock, MESSAGE_HEADER.size)
+    if header is None:
+        return None
+    kind, size = MESSAGE_HEADER.unpack(header)
+    payload = _recv_exact(sock, size) if size else b""
+    if payload is None:
+        return None
+    return kind, payload
+
+
+def model_config(kind, config=None):
+    """Configuración completa de un modelo y su clave en el pool"""
+    if kind not in DEFAULT_CONFIGS:
+        raise ValueError(f"Tipo de modelo desconocido: {kind}")
+    config = dict(DEFAULT_CONFIGS[kind], **(config or {}))
+    return config, (kind,) + tuple(sorted(config.items()))
+
+
+def create_model(kind, config):
+    import mediapipe as mp
+
+    if kind == "pose":
+        return mp.solutions.pose.Pose(**config)
+    return mp.solutions.hands.Hands(**config)
+
+
+class ModelPool:
+    """Modelos inicializados agrupados por configuración, con un máximo total.
+
+    acquire() presta un modelo en exclusiva (caliente si había uno libre) y
+    release() lo devuelve tras reiniciar su estado temporal en otro hilo.
+    """
+
+    def __init__(self, max_models=4, factory=create_model, warmup_shape=(64, 64, 3)):
+        self.max_models = max_models
+        self.factory = factory
+        self.blank = np.zeros(warmup_shape, np.uint8)
+        self.idle = OrderedDict()  # clave -> modelos libres, del usado hace más tiempo al último
+        self.recycling = {}  # clave -> modelos reiniciándose tras una sesión
+        self.total = 0
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self._cond = threading.Condition()
+
+    def _create(self, kind, config):
+        model = self.factory(kind, config)
+        # El primer process() carga el grafo: se paga aquí y no en el primer frame del cliente
+        model.process(self.blank)
+        return model
+
+    def acquire(self, kind, config=None, timeout=10.0):
+        """Devuelve (clave, modelo, caliente); espera hasta timeout si el pool está lleno"""
+        config, key = model_config(kind, config)
+        deadline = time.monotonic() + timeout
+        evicted = None
+        with self._cond:
+            while True:
+                models = self.idle.get(key)
+                if models:
+                    model = models.pop()
+                    if not models:
+                        del self.idle[key]
+                    self.reused += 1
+                    return key, model, True
+                if self.recycling.get(key):
+                    # Uno de esta configuración vuelve en unos milisegundos: mejor que crear otro
+                    pass
+                elif self.total < self.max_models:
+                    break
+                elif self.idle:
+                    # Lleno: se cierra el modelo libre de otra configuración usado hace más tiempo
+                    old_key, models = next(iter(self.idle.items()))
+                    evicted = models.pop(0)
+                    if not models:
+                        del self.idle[old_key]
+                    self.evicted += 1
+                    self.total -= 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Pool de modelos lleno ({self.max_models} en uso)")
+                self._cond.wait(remaining)
+            self.total += 1
+            self.created += 1
+
+        if evicted is not None:
+            evicted.close()
+        try:
+            model = self._create(kind, config)
+        except Exception:
+            with self._cond:
+                self.total -= 1
+                self._cond.notify_all()
+            raise
+        return key, model, False
+
+    def release(self, key, model):
+        """Devuelve un modelo; se reinicia y se calienta en segundo plano"""
+        with self._cond:
+            self.recycling[key] = self.recycling.get(key, 0) + 1
+        threading.Thread(target=self._recycle, args=(key, model), daemon=True).start()
+
+    def _recycle(self, key, model):
+        try:
+            # Sin reset el siguiente cliente heredaría el seguimiento y el
+            # suavizado del anterior
+            model.reset()
+            model.process(self.blank)
+        except Exception:
+            model.close()
+            model = None
+        with self._cond:
+            self.recycling[key] -= 1
+            if model is None:
+                self.total -= 1
+            else:
+                self.idle.setdefault(key, []).append(model)
+                self.idle.move_to_end(key)
+            self._cond.notify_all()
+
+    def preload(self, kind, config=None):
+        """Crea un modelo y lo deja libre en el pool"""
+        key, model, _ = self.acquire(kind, config)
+        with self._cond:
+            self.recycling[key] = self.recycling.get(key, 0) + 1
+        self._recycle(key, model)
+
+    def stats(self):
+        with self._cond:
+            idle = sum(len(models) for models in self.idle.values())
+            return {"models": self.total, "idle": idle, "in_use": self.total - idle,
+                    "max_models": self.max_models, "created": self.created, "reused": self.reused,
+                    "evicted": self.evicted}
+
+    def close(self):
+        with self._cond:
+            models = [model for models in self.idle.values() for model in models]
+            self.idle.clear()
+            self.total -= len(models)
+        for model in models:
+            model.close()
+
+
+class _Session:
+    """Estado de un cliente: modelos prestados, anillo de frames y buffers propios"""
+
+    def __init__(self, pool, request, timeout):
+        self.pool = pool
+        self.models = {}
+        self.warm = {}
+        self.ring = None
+        self.quantized = bool(request.get("quantized"))
+        self.mirror = bool(request.get("mirror"))
+        max_hands = 0
+        try:
+            for kind in DEFAULT_CONFIGS:
+                if request.get(kind) is None:
+                    continue
+                config, _ = model_config(kind, request[kind])
+                key, model, warm = pool.acquire(kind, config, timeout)
+                self.models[kind] = (key, model)
+                self.warm[kind] = warm
+                if kind == "hands":
+                    max_hands = config["max_num_hands"]
+        except Exception:
+            self.close()
+            raise
+        if not self.models:
+            raise ValueError("Hay que pedir Pose, Hands o ambos")
+        self.buffers = LandmarkBuffers(max_people=1, max_hands=max(max_hands, 1))
+        # El espejo se aplica aquí, al convertir a RGB: el frame del anillo no se toca
+        self.preprocess = FramePreprocessor(mirror=self.mirror)
+
+    def attach(self, name):
+        if self.ring is not None:
+            self.ring.close()
+        self.ring = FrameRing.attach(name)
+
+    def process(self, seq, timestamp):
+        packet = self.ring.get(seq) if self.ring is not None else None
+        if packet is None:
+            raise RuntimeError(f"El frame {seq} no está en memoria compartida")
+        frame_rgb = self.preprocess.rgb(packet.frame)
+        buffers = self.buffers
+        buffers.begin_frame()
+        if "pose" in self.models:
+            buffers.load_pose(self.models["pose"][1].process(frame_rgb))
+        if "hands" in self.models:
+            buffers.load_hands(self.models["hands"][1].process(frame_rgb))
+        return encode_packet(seq, timestamp, buffers.active_hands(), buffers.handedness,
+                             buffers.active_poses(), range(buffers.num_poses), quantized=self.quantized)
+
+    def close(self):
+        for key, model in self.models.values():
+            self.pool.release(key, model)
+        self.models = {}
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+class _SessionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        daemon = self.server.inference
+        sock = self.request
+        session = None
+        try:
+            while True:
+                message = recv_message(sock)
+                if message is None:
+                    break
+                kind, payload = message
+                try:
+                    if kind == MSG_FRAME and session is not None:
+                        start = time.perf_counter()
+                        result = session.process(*FRAME_REQUEST.unpack(payload))
+                        daemon.inference_stats.add(time.perf_counter() - start)
+                        send_message(sock, MSG_RESULT, result)
+                    elif kind == MSG_OPEN and session is None:
+                        session = daemon.open_session(json.loads(payload))
+                        send_message(sock, MSG_READY, json.dumps({"warm": session.warm}).encode())
+                    elif kind == MSG_RING and session is not None:
+                        session.attach(payload.decode())
+                        send_message(sock, MSG_READY)
+                    elif kind == MSG_STATUS:
+                        send_message(sock, MSG_STATUS, json.dumps(daemon.status()).encode())
+                    else:
+                        raise ValueError(f"Mensaje inesperado: {kind}")
+                except Exception as e:
+                    daemon.inference_stats.errors += 1
+                    daemon.log.warning(f"sesión {kind}", f"Error en una sesión: {e}")
+                    send_message(sock, MSG_ERROR, str(e).encode())
+        except OSError:
+            pass
+        finally:
+            if session is not None:
+                daemon.close_session(session)
+
+
+class InferenceDaemon:
+    """Servidor del pool de modelos en un socket Unix (un hilo por cliente)"""
+
+    def __init__(self, path=DEFAULT_SOCKET, max_models=4, acquire_timeout=10.0):
+        self.path = path
+        self.pool = ModelPool(max_models)
+        self.acquire_timeout = acquire_timeout
+        self.inference_stats = StageStats("inferencia")
+        self.sessions = 0
+        self.sessions_total = 0
+        self.server = None
+        self.log = RateLimitedLog("inference_daemon")
+        self._lock = threading.Lock()
+
+    def open_session(self, request):
+        session = _Session(self.pool, request, self.acquire_timeout)
+        with self._lock:
+            self.sessions += 1
+            self.sessions_total += 1
+        return session
+
+    def close_session(self, session):
+        session.close()
+        with self._lock:
+            self.sessions -= 1
+
+    def status(self):
+        stats = self.inference_stats
+        return dict(self.pool.stats(), sessions=self.sessions, sessions_total=self.sessions_total,
+                    frames=stats.count, errors=stats.errors, mean_ms=stats.mean_ms(),
+                    p95_ms=stats.latency.quantile(0.95))
+
+    def add_metrics(self, registry):
+        registry.add_stage(self.inference_stats)
+        registry.gauge("daemon_sessions", lambda: self.sessions, "Clientes conectados")
+        registry.gauge("daemon_sessions_total", lambda: self.sessions_total, "Sesiones abiertas", "counter")
+        for name in ("models", "idle", "in_use"):
+            registry.gauge(f"daemon_pool_{name}", lambda name=name: self.pool.stats()[name],
+                           "Modelos en el pool")
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)  # Socket de un demonio que ya no existe
+        else:
+            raise RuntimeError(f"Ya hay un demonio escuchando en {self.path}")
+        finally:
+            probe.close()
+
+    def serve_forever(self):
+        self._remove_stale_socket()
+        self.server = socketserver.ThreadingUnixStreamServer(self.path, _SessionHandler)
+        self.server.daemon_threads = True
+        self.server.inference = self
+        os.chmod(self.path, 0o600)  # Solo el usuario que arranca el demonio
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.pool.close()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class InferenceClient:
+    """Cliente ligero: sin mediapipe, frames por memoria compartida y landmarks por socket.
+
+    pose y hands son configuraciones de modelo (dict, {} para la de defecto)
+    o None para no usarlo. process() devuelve un LandmarkPacket con poses
+    (n, 33, 4), hands (n, 21, 3) y handedness. Con mirror el demonio voltea
+    cada frame antes de la inferencia y los landmarks corresponden a la imagen
+    en espejo; el frame del anillo se queda como se capturó.
+    """
+
+    def __init__(self, pose=None, hands=None, path=DEFAULT_SOCKET, slots=2, quantized=False, timeout=30.0,
+                 mirror=False):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError as e:
+            self.sock.close()
+            raise RuntimeError(f"No hay demonio en {path} (python inference_daemon.py serve): {e}")
+        self.slots = slots
+        self.ring = None
+        self._pending = None
+        request = {"pose": pose, "hands": hands, "quantized": quantized, "mirror": mirror}
+        send_message(self.sock, MSG_OPEN, json.dumps(request).encode())
+        self.warm = json.loads(self._expect(MSG_READY))["warm"]
+
+    def _expect(self, kind):
+        message = recv_message(self.sock)
+        if message is None:
+            raise ConnectionError("El demonio ha cerrado la conexión")
+        if message[0] == MSG_ERROR:
+            raise RuntimeError(message[1].decode())
+        if message[0] != kind:
+            raise RuntimeError(f"Respuesta inesperada del demonio: {message[0]}")
+        return message[1]
+
+    def _ensure_ring(self, shape):
+        if self.ring is not None and self.ring.shape == shape:
+            return
+        if self.ring is not None:
+            self.ring.close()
+        self.ring = FrameRing.create(shape, self.slots)
+        send_message(self.sock, MSG_RING, self.ring.name.encode())
+        self._expect(MSG_READY)
+
+    def read(self, cap):
+        """Lee de la captura directamente en memoria compartida; devuelve (ok, frame)"""
+        if self.ring is None:
+            ret, frame = cap.read()
+            if not ret:
+                return False, None
+            # Instante de captura antes de crear el anillo (ida y vuelta al demonio)
+            capture_time = time.time()
+            self._ensure_ring(frame.shape)
+            self._pending = self.ring.write(frame, capture_time)
+        else:
+            self._pending = self.ring.write_capture(cap)
+            if self._pending is None:
+                return False, None
+        return True, self.ring.frames[self._pending % self.ring.slots]
+
+    def process(self, frame, timestamp=None):
+        """Landmarks de un frame BGR; sin copia si el frame viene de read().
+
+        Sin timestamp se usa el instante de captura que read() guardó en el
+        anillo o, para otros frames, el momento de la llamada.
+        """
+        if self._pending is not None and frame is self.ring.frames[self._pending % self.ring.slots]:
+            seq = self._pending
+            if timestamp is None:
+                timestamp = float(self.ring.timestamps[seq % self.ring.slots])
+        else:
+            timestamp = time.time() if timestamp is None else timestamp
+            self._ensure_ring(frame.shape)
+            seq = self.ring.write(frame, timestamp)
+        self._pending = None
+        send_message(self.sock, MSG_FRAME, FRAME_REQUEST.pack(seq, timestamp))
+        return decode_packet(self._expect(MSG_RESULT))
+
+    def status(self):
+        send_message(self.sock, MSG_STATUS)
+        return json.loads(self._expect(MSG_STATUS))
+
+    def close(self):
+        self.sock.close()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+def query_status(path=DEFAULT_SOCKET, timeout=5.0):
+    """Estado del demonio sin abrir sesión (no reserva modelos)"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        send_message(sock, MSG_STATUS)
+        message = recv_message(sock)
+    finally:
+        sock.close()
+    if message is None or message[0] != MSG_STATUS:
+        raise RuntimeError("El demonio no ha respondido")
+    return json.loads(message[1])
+
+
+def _track(args):
+    """Versión ligera de los scripts de seguimiento: cámara, dibujo y UDP opcional"""
+    from landmark_protocol import LandmarkSender
+    from renderers import render_hands, render_normal
+
+    start = time.perf_counter()
+    pose = None if args.no_pose else dict(model_complexity=args.model_complexity)
+    hands = dict(max_num_hands=args.max_hands, model_complexity=min(args.model_complexity, 1)) \
+        if args.hands else None
+    client = InferenceClient(pose, hands, path=args.socket, mirror=args.mirror)
+    print(f"Sesión abierta en {(time.perf_counter() - start) * 1000:.0f} ms (modelos calientes: {client.warm})")
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    cap = cv2.VideoCapture(source)
+    sender = None
+    if args.udp:
+        host, port = args.udp.rsplit(":", 1)
+        sender = LandmarkSender((host or "localhost", int(port)))
+    first = True
+    try:
+        while cap.isOpened():
+            ret, frame = client.read(cap)
+            if not ret:
+                break
+            result = client.process(frame)
+            if first:
+                print(f"Primer resultado a los {(time.perf_counter() - start) * 1000:.0f} ms del arranque")
+                first = False
+            if sender is not None:
+                sender.send(result.timestamp, result.hands, result.handedness, result.poses, result.person_ids)
+            if args.no_window:
+                continue
+            # Se dibuja sobre una copia: el frame puede estar en el anillo compartido.
+            # Con espejo la copia es el propio volteo, igual que lo vio el demonio
+            image = cv2.flip(frame, 1) if args.mirror else frame.copy()
+            render_normal(image, result.poses)
+            render_hands(image, result.hands)
+            cv2.imshow("Tracking (demonio)", image)
+            if cv2.waitKey(1) & 0xFF in (27, ord('q')):
+                break
+    finally:
+        cap.release()
+        client.close()
+        if sender is not None:
+            sender.close()
+        if not args.no_window:
+            cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Demonio de inferencia Pose/Hands con modelos calientes")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Ruta del socket Unix")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Arrancar el demonio")
+    serve.add_argument("--max-models", type=int, default=4, help="Modelos cargados como máximo")
+    serve.add_argument("--preload", nargs="*", choices=list(DEFAULT_CONFIGS), default=["pose"],
+                       help="Modelos que se cargan al arrancar (configuración por defecto)")
+    serve.add_argument("--metrics-port", type=int, default=None, help="Métricas HTTP (Prometheus)")
+
+    track = commands.add_parser("track", help="Cliente ligero con ventana y UDP opcional")
+    track.add_argument("source", nargs="?", default="0", help="Índice de cámara, fichero o URL")
+    track.add_argument("--no-pose", action="store_true", help="No ejecutar Pose")
+    track.add_argument("--hands", action="store_true", help="Ejecutar también Hands")
+    track.add_argument("--max-hands", type=int, default=2)
+    track.add_argument("--model-complexity", type=int, default=1)
+    track.add_argument("--mirror", action="store_true", help="Efecto espejo")
+    track.add_argument("--udp", default=None, metavar="HOST:PUERTO", help="Reenviar landmarks por UDP")
+    track.add_argument("--no-window", action="store_true", help="Sin ventana")
+
+    commands.add_parser("status", help="Estado del pool y de las sesiones")
+    args = parser.parse_args()
+
+    if args.command == "track":
+        _track(args)
+        return
+    if args.command == "status":
+        for name, value in query_status(args.socket).items():
+            print(f"{name:<15} {value}")
+        return
+
+    configure_logging()
+    daemon = InferenceDaemon(args.socket, max_models=args.max_models)
+    for kind in args.preload:
+        start = time.perf_counter()
+        daemon.pool.preload(kind)
+        print(f"Modelo {kind} cargado en {(time.perf_counter() - start) * 1000:.0f} ms")
+    metrics = MetricsRegistry()
+    daemon.add_metrics(metrics)
+    stop_metrics = start_metrics(metrics, args.metrics_port)
+    print(f"Demonio escuchando en {args.socket}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_metrics()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Conversión de resultados de MediaPipe a arrays NumPy contiguos.
+
+Cuerpos: (personas, 33, 4) con x, y, z, visibilidad normalizados.
+Manos:   (manos, 21, 3) con x, y, z normalizados.
+
+Todo el trabajo posterior (reproyección, dibujo, gestos, envío, grabación)
+opera sobre estos arrays en lugar de recorrer los protobuf landmark a landmark.
+No importa mediapipe, así que también lo pueden usar los clientes ligeros.
+"""
+import queue
+
+import cv2
+import numpy as np
+
+from landmark_protocol import HAND_LANDMARKS, POSE_LANDMARKS
+
+# Mismas conexiones que mp.solutions.pose/hands, como arrays (E, 2)
+POSE_CONNECTIONS = np.array([
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (11, 23), (12, 14), (12, 24), (13, 15), (14, 16),
+    (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22), (17, 19),
+    (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29),
+    (27, 31), (28, 30), (28, 32), (29, 31), (30, 32)
+], dtype=np.intp)
+HAND_CONNECTIONS = np.array([
+    (0, 1), (0, 5), (0, 17), (1, 2), (2, 3), (3, 4), (5, 6), (5, 9), (6, 7),
+    (7, 8), (9, 10), (9, 13), (10, 11), (11, 12), (13, 14), (13, 17), (14, 15),
+    (15, 16), (17, 18), (18, 19), (19, 20)
+], dtype=np.intp)
+
+NOSE = 0
+VISIBILITY_THRESHOLD = 0.5  # Igual que mp.solutions.drawing_utils
+WHITE_COLOR = (224, 224, 224)
+RED_COLOR = (0, 0, 255)
+DEFAULT_MAX_HANDS = 2  # max_num_hands por defecto de mp.solutions.hands.Hands
+
+
+class LandmarkBuffers:
+    """Buffers preasignados donde se vuelcan los resultados de cada frame.
+
+    Con slots > 1 hay varios juegos de buffers, de modo que una etapa puede
+    escribir el frame nuevo mientras otra todavía lee el anterior, como ocurre
+    en TrackingPipeline. begin_frame toma un juego de la lista de libres (y
+    espera si no queda ninguno) y quien lo lee por último lo devuelve con
+    release(slot); así un juego nunca se reescribe mientras se dibuja, vaya
+    como vaya el render.
+    """
+
+    def __init__(self, max_people=1, max_hands=2, slots=1):
+        self.pose_slots = np.zeros((slots, max_people, POSE_LANDMARKS, 4), dtype=np.float32)
+        self.hand_slots = np.zeros((slots, max_hands, HAND_LANDMARKS, 3), dtype=np.float32)
+        self.slot = 0
+        self.free_slots = queue.Queue()
+        for slot in range(slots if slots > 1 else 0):
+            self.free_slots.put(slot)
+        self.poses = self.pose_slots[0]
+        self.hands = self.hand_slots[0]
+        self.handedness = []
+        self.num_poses = 0
+        self.num_hands = 0
+
+    def begin_frame(self):
+        """Pasa a un juego de buffers libre, lo marca vacío y devuelve su índice"""
+        if len(self.pose_slots) > 1:
+            self.slot = self.free_slots.get()
+        self.poses = self.pose_slots[self.slot]
+        self.hands = self.hand_slots[self.slot]
+        self.handedness = []
+        self.num_poses = 0
+        self.num_hands = 0
+        return self.slot
+
+    def release(self, slot):
+        """Devuelve a la lista de libres un juego que ya nadie lee"""
+        if len(self.pose_slots) > 1:
+            self.free_slots.put(slot)
+
+    def set_pose(self, index, pose_landmarks):
+        """Vuelca un NormalizedLandmarkList de Pose en la fila index"""
+        pose_to_array(pose_landmarks, self.poses[index])
+        self.num_poses = max(self.num_poses, index + 1)
+
+    def load_pose(self, results):
+        """Vuelca el resultado de mp.solutions.pose (una persona)"""
+        if results.pose_landmarks:
+            self.set_pose(0, results.pose_landmarks)
+        return self.active_poses()
+
+    def load_hands(self, results):
+        """Vuelca el resultado de mp.solutions.hands"""
+        self.num_hands, self.handedness = hands_to_array(results, self.hands)
+        return self.active_hands()
+
+    def active_poses(self):
+        return self.poses[:self.num_poses]
+
+    def active_hands(self):
+        return self.hands[:self.num_hands]
+
+
+def max_hands_for(hands_config):
+    """Manos que deben caber en los buffers para una configuración de Hands.
+
+    None es sin Hands; {} es Hands con sus valores por defecto.
+    """
+    if hands_config is None:
+        return 1
+    return hands_config.get("max_num_hands", DEFAULT_MAX_HANDS)
+
+
+def pose_to_array(pose_landmarks, out=None):
+    """Convierte un NormalizedLandmarkList de Pose en un array (33, 4)"""
+    if out is None:
+        out = np.empty((POSE_LANDMARKS, 4), dtype=np.float32)
+    out[:] = [(l.x, l.y, l.z, l.visibility) for l in pose_landmarks.landmark]
+    return out
+
+
+def hands_to_array(results, out):
+    """Vuelca multi_hand_landmarks en out (max_manos, 21, 3).
+
+    Devuelve el número de manos escritas y su lateralidad ('left'/'right').
+    """
+    if not results.multi_hand_landmarks:
+        return 0, []
+
+    handedness = []
+    for i, (hand_landmarks, hand_info) in enumerate(
+            zip(results.multi_hand_landmarks, results.multi_handedness)):
+        if i >= len(out):
+            break
+        out[i] = [(l.x, l.y, l.z) for l in hand_landmarks.landmark]
+        handedness.append(hand_info.classification[0].label.lower())
+    return len(handedness), handedness
+
+
+def remap_to_frame(points, x0, y0, crop_w, crop_h, frame_w, frame_h):
+    """Pasa coordenadas normalizadas de un recorte a normalizadas del frame completo (in situ)"""
+    points[..., 0] *= crop_w / frame_w
+    points[..., 0] += x0 / frame_w
+    points[..., 1] *= crop_h / frame_h
+    points[..., 1] += y0 / frame_h
+    return points
+
+
+def to_pixels(points, width, height, out=None):
+    """Proyecta coordenadas normalizadas (..., >=2) a píxeles enteros (..., 2)"""
+    if out is None:
+        out = np.empty(points.shape[:-1] + (2,), dtype=np.int32)
+    np.multiply(points[..., 0], width, out=out[..., 0], casting="unsafe")
+    np.multiply(points[..., 1], height, out=out[..., 1], casting="unsafe")
+    return out
+
+
+def visible_mask(points, threshold=VISIBILITY_THRESHOLD):
+    """Landmarks dibujables: dentro de la imagen y, si hay visibilidad, por encima del umbral"""
+    xy = points[..., :2]
+    mask = np.all((xy >= 0.0) & (xy <= 1.0), axis=-1)
+    if points.shape[-1] > 3:
+        mask &= points[..., 3] >= threshold
+    return mask
+
+
+def triplet_angles(points, triplets, scale=None, threshold=None):
+    """Ángulos en grados (..., T) en el vértice b de cada triplete (a, b, c) de landmarks.
+
+    scale multiplica las coordenadas antes de medir (por ejemplo para
+    corregir la relación de aspecto); con threshold y columna de visibilidad,
+    los ángulos con algún landmark poco visible valen NaN.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    xyz = points[..., :3] if scale is None else points[..., :3] * np.asarray(scale, np.float32)
+    a = xyz[..., triplets[:, 0], :]
+    b = xyz[..., triplets[:, 1], :]
+    c = xyz[..., triplets[:, 2], :]
+    v1 = a - b
+    v2 = c - b
+    cos = (v1 * v2).sum(axis=-1)
+    cos /= np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1) + 1e-9
+    angles = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+    if threshold is not None and points.shape[-1] > 3:
+        visible = points[..., 3] >= threshold
+        ok = visible[..., triplets[:, 0]] & visible[..., triplets[:, 1]] & visible[..., triplets[:, 2]]
+        angles[~ok] = np.nan
+    return angles
+
+
+def landmark_bbox(points, width, height, threshold=VISIBILITY_THRESHOLD):
+    """Caja (x0, y0, x1, y1) en píxeles de los landmarks visibles, o None"""
+    if points.shape[-1] > 3:
+        points = points[points[:, 3] > threshold]
+    if len(points) == 0:
+        return None
+    x = points[:, 0] * width
+    y = points[:, 1] * height
+    return np.array([x.min(), y.min(), x.max(), y.max()], dtype=np.float32)
+
+
+def draw_skeleton(frame, points, connections, joint_color=RED_COLOR, bone_color=WHITE_COLOR,
+                  joint_thickness=2, joint_radius=2, bone_thickness=2, draw_joints=True):
+    """Dibuja huesos y articulaciones de un esqueleto (N, >=2) normalizado.
+
+    Replica el aspecto de mp.solutions.drawing_utils.draw_landmarks: todas las
+    conexiones en una sola llamada a cv2.polylines y cada articulación con
+    borde blanco.
+    """
+    h, w = frame.shape[:2]
+    px = to_pixels(points, w, h)
+    mask = visible_mask(points)
+
+    if connections is not None and bone_thickness > 0:
+        bones = connections[mask[connections[:, 0]] & mask[connections[:, 1]]]
+        if len(bones):
+            cv2.polylines(frame, px[bones], False, bone_color, bone_thickness)
+
+    if draw_joints:
+        border_radius = max(joint_radius + 1, int(joint_radius * 1.2))
+        for x, y in px[mask].tolist():
+            cv2.circle(frame, (x, y), border_radius, WHITE_COLOR, joint_thickness)
+            cv2.circle(frame, (x, y), joint_radius, joint_color, -1)
+    return frame
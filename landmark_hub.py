@@ -0,0 +1,527 @@
+"""Hub asyncio que reparte landmarks a muchos suscriptores sin frenar la captura.
+
+El bucle de captura solo entrega los arrays con publish() y sigue; el hub
+corre su propio bucle asyncio en otro hilo y, para cada suscriptor (UDP, TCP
+o WebSocket), mantiene una cola acotada que descarta lo más antiguo, un
+límite de frecuencia y un filtro de temas (left, right, pose). Un cliente
+lento solo pierde paquetes propios.
+
+Suscripción: un JSON como {"topics": ["left"], "max_rate": 30,
+"format": "binary", "quantized": false}
+    TCP        primera línea de la conexión; después llegan paquetes
+               precedidos por su longitud (u32 little endian)
+    UDP        datagrama al puerto del hub; {"unsubscribe": true} para salir
+    WebSocket  primer mensaje; después un mensaje por paquete (requiere websockets)
+
+    python landmark_hub.py --load-test 300 --transport tcp --seconds 10
+"""
+import abc
+import argparse
+import asyncio
+import json
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from landmark_protocol import (HAND_LANDMARKS, POSE_LANDMARKS, decode_packet, encode_legacy_json,
+                               encode_packet)
+
+TOPICS = frozenset(("left", "right", "pose"))
+FORMATS = ("binary", "json")
+LENGTH = struct.Struct("<I")
+
+
+def parse_subscription(data):
+    """Opciones de suscripción a partir del JSON del cliente; ValueError si no es válido"""
+    try:
+        request = json.loads(data or b"{}")
+    except ValueError:
+        raise ValueError("Suscripción no es JSON válido")
+    if not isinstance(request, dict):
+        raise ValueError("Suscripción debe ser un objeto JSON")
+
+    topics = frozenset(request.get("topics") or TOPICS)
+    if not topics <= TOPICS:
+        raise ValueError(f"Temas desconocidos: {sorted(topics - TOPICS)}")
+    fmt = request.get("format", "binary")
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt}")
+    max_rate = request.get("max_rate")
+    if max_rate is not None and float(max_rate) <= 0:
+        raise ValueError("max_rate debe ser positivo")
+    return {
+        "topics": topics,
+        "fmt": fmt,
+        "quantized": bool(request.get("quantized", False)),
+        "max_rate": None if max_rate is None else float(max_rate),
+        "queue_size": max(1, int(request.get("queue_size", 4))),
+    }
+
+
+class Subscriber(abc.ABC):
+    """Cola acotada (descarta lo más antiguo) con límite de frecuencia y filtro de temas.
+
+    Cada transporte implementa send(); close_transport() es opcional.
+    """
+
+    def __init__(self, name, topics=TOPICS, fmt="binary", quantized=False, max_rate=None,
+                 queue_size=4):
+        self.name = name
+        self.topics = frozenset(topics)
+        self.fmt = fmt
+        self.quantized = quantized
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.queue = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.next_time = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.closed = False
+
+    @property
+    def key(self):
+        """Suscriptores con la misma clave reciben exactamente el mismo paquete"""
+        return self.topics, self.fmt, self.quantized
+
+    def offer(self, payload, now):
+        if now < self.next_time:
+            self.rate_limited += 1
+            return
+        self.next_time = now + self.min_interval
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(payload)
+        self.ready.set()
+
+    async def run(self):
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.queue and not self.closed:
+                    await self.send(self.queue.popleft())
+                    self.sent += 1
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            self.errors += 1
+        finally:
+            self.closed = True
+            await self.close_transport()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    @abc.abstractmethod
+    async def send(self, payload):
+        """Envía un paquete ya codificado por el transporte del suscriptor"""
+
+    async def close_transport(self):
+        pass
+
+    def stats(self):
+        return {"name": self.name, "topics": sorted(self.topics), "sent": self.sent,
+                "dropped": self.dropped, "rate_limited": self.rate_limited,
+                "errors": self.errors, "queued": len(self.queue)}
+
+
+class UdpSubscriber(Subscriber):
+    """Envío por datagramas desde el socket UDP del hub (nunca bloquea)"""
+
+    def __init__(self, transport, address, **options):
+        super().__init__(f"udp:{address[0]}:{address[1]}", **options)
+        self.transport = transport
+        self.address = address
+
+    async def send(self, payload):
+        self.transport.sendto(payload, self.address)
+
+
+class TcpSubscriber(Subscriber):
+    """Envío por TCP con cada paquete precedido de su longitud"""
+
+    def __init__(self, writer, **options):
+        peer = writer.get_extra_info("peername") or ("?", 0)
+        super().__init__(f"tcp:{peer[0]}:{peer[1]}", **options)
+        self.writer = writer
+
+    async def send(self, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.writer.write(LENGTH.pack(len(payload)) + payload)
+        await self.writer.drain()
+
+    async def close_transport(self):
+        self.writer.close()
+
+
+class WebSocketSubscriber(Subscriber):
+    """Un mensaje WebSocket por paquete (binario o texto JSON)"""
+
+    def __init__(self, websocket, **options):
+        peer = websocket.remote_address or ("?", 0)
+        super().__init__(f"ws:{peer[0]}:{peer[1]}", **options)
+        self.websocket = websocket
+
+    async def send(self, payload):
+        await self.websocket.send(payload)
+
+    async def close_transport(self):
+        await self.websocket.close()
+
+
+class _UdpControl(asyncio.DatagramProtocol):
+    """Altas y bajas de suscriptores UDP por datagrama"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        try:
+            request = json.loads(data)
+            if isinstance(request, dict) and request.get("unsubscribe"):
+                self.hub._remove_udp(address)
+                return
+            options = parse_subscription(data)
+        except ValueError as e:
+            print(f"Suscripción UDP rechazada de {address}: {e}")
+            return
+        self.hub._remove_udp(address)
+        subscriber = UdpSubscriber(self.transport, address, **options)
+        self.hub._udp_subscribers[address] = subscriber
+        self.hub.loop.create_task(self.hub._serve(subscriber))
+
+    def error_received(self, exc):
+        # Errores de sendto (por ejemplo ICMP de puerto inalcanzable)
+        self.hub.udp_errors += 1
+
+
+class LandmarkHub:
+    """Publicación de landmarks a varios suscriptores desde un hilo con asyncio.
+
+    publish() es seguro desde cualquier hilo y no bloquea: si el hub no ha
+    repartido aún el frame anterior, este se sustituye por el nuevo. Antes de
+    start() o tras close() no hace nada, así el bucle de captura puede seguir
+    publicando mientras se cierra el programa.
+    """
+
+    def __init__(self, host="127.0.0.1", tcp_port=None, udp_port=None, ws_port=None):
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.ws_port = ws_port
+        self.loop = None
+        self.closed = False
+        self.subscribers = []
+        self.seq = 0
+        self.published = 0
+        self.coalesced = 0
+        self.udp_errors = 0
+        self._udp_subscribers = {}
+        self._udp_transport = None
+        self._servers = []
+        self._pending = None
+        self._lock = threading.Lock()
+        self._started = threading.Event()
+        self._thread = None
+        self._error = None
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._start_servers())
+        except Exception as e:
+            self._error = e
+            self.closed = True
+            self._started.set()
+            self.loop.close()
+            return
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self._shutdown())
+            self.loop.close()
+
+    async def _start_servers(self):
+        loop = asyncio.get_running_loop()
+        if self.tcp_port is not None:
+            self._servers.append(await asyncio.start_server(self._handle_tcp, self.host, self.tcp_port))
+        if self.ws_port is not None:
+            import websockets
+            self._servers.append(await websockets.serve(self._handle_ws, self.host, self.ws_port))
+
+        # El socket UDP sirve tanto para altas por datagrama como para enviar
+        local_addr = (self.host, self.udp_port if self.udp_port is not None else 0)
+        self._udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UdpControl(self), local_addr=local_addr)
+
+    async def _shutdown(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
+        for server in self._servers:
+            server.close()
+        await asyncio.sleep(0)
+        tasks = [t for t in asyncio.all_tasks(self.loop) if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+
+    def close(self):
+        with self._lock:
+            # Los publish() posteriores ya no tocan el bucle
+            self.closed = True
+        if self.loop is not None and self._thread is not None and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=2.0)
+
+    # --- Suscriptores ---
+
+    async def _serve(self, subscriber):
+        self.subscribers.append(subscriber)
+        try:
+            await subscriber.run()
+        except asyncio.CancelledError:
+            # Cierre del hub: la conexión se da por terminada
+            pass
+
+    def _remove_udp(self, address):
+        subscriber = self._udp_subscribers.pop(address, None)
+        if subscriber is not None:
+            subscriber.close()
+
+    def add_udp_subscriber(self, address, topics=TOPICS, fmt="binary", quantized=False,
+                           max_rate=None, queue_size=4):
+        """Destino UDP fijo (por ejemplo un consumidor antiguo en localhost:9999)"""
+        if self.closed or self.loop is None:
+            raise RuntimeError("El hub no está en marcha")
+        def register():
+            subscriber = UdpSubscriber(self._udp_transport, address, topics=topics, fmt=fmt,
+                                       quantized=quantized, max_rate=max_rate, queue_size=queue_size)
+            self._remove_udp(address)
+            self._udp_subscribers[address] = subscriber
+            self.loop.create_task(self._serve(subscriber))
+        self.loop.call_soon_threadsafe(register)
+
+    async def _handle_tcp(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            options = parse_subscription(line.strip())
+        except (ValueError, asyncio.TimeoutError, ConnectionError) as e:
+            print(f"Suscripción TCP rechazada: {e}")
+            writer.close()
+            return
+        await self._serve(TcpSubscriber(writer, **options))
+
+    async def _handle_ws(self, websocket, path=None):
+        try:
+            options = parse_subscription(await asyncio.wait_for(websocket.recv(), timeout=5.0))
+        except (ValueError, asyncio.TimeoutError) as e:
+            print(f"Suscripción WebSocket rechazada: {e}")
+            await websocket.close()
+            return
+        await self._serve(WebSocketSubscriber(websocket, **options))
+
+    # --- Publicación ---
+
+    def publish(self, timestamp, hands=None, handedness=(), poses=None, person_ids=(),
+                predicted=False, gestures=None, hand_analytics=None, pose_analytics=None):
+        """Entrega un frame al hub (copia los arrays) y vuelve enseguida"""
+        hands = np.zeros((0, HAND_LANDMARKS, 3), np.float32) if hands is None else np.array(hands, np.float32)
+        poses = np.zeros((0, POSE_LANDMARKS, 4), np.float32) if poses is None else np.array(poses, np.float32)
+        gestures = None if gestures is None else list(gestures)
+        hand_analytics = None if hand_analytics is None else np.array(hand_analytics, np.float32)
+        pose_analytics = None if pose_analytics is None else np.array(pose_analytics, np.float32)
+        frame = (timestamp, hands, list(handedness), poses, list(person_ids), predicted, gestures,
+                 hand_analytics, pose_analytics)
+        with self._lock:
+            if self.closed or self.loop is None:
+                return
+            scheduled = self._pending is not None
+            if scheduled:
+                self.coalesced += 1
+            self._pending = frame
+            self.published += 1
+            if not scheduled:
+                self.loop.call_soon_threadsafe(self._dispatch_pending)
+
+    def _dispatch_pending(self):
+        with self._lock:
+            frame, self._pending = self._pending, None
+        if frame is None:
+            return
+
+        now = self.loop.time()
+        payloads = {}
+        alive = []
+        for subscriber in self.subscribers:
+            if subscriber.closed:
+                continue
+            alive.append(subscriber)
+            key = subscriber.key
+            payload = payloads.get(key)
+            if payload is None:
+                payload = payloads[key] = self._encode(frame, *key)
+            subscriber.offer(payload, now)
+        self.subscribers = alive
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+
+    def _encode(self, frame, topics, fmt, quantized):
+        (timestamp, hands, handedness, poses, person_ids, predicted, gestures,
+         hand_analytics, pose_analytics) = frame
+        if not {"left", "right"} <= topics:
+            keep = [i for i, h in enumerate(handedness) if h in topics]
+            hands = hands[keep]
+            handedness = [handedness[i] for i in keep]
+            if gestures is not None:
+                gestures = [gestures[i] for i in keep]
+            if hand_analytics is not None:
+                hand_analytics = hand_analytics[keep]
+        if "pose" not in topics:
+            poses, person_ids = poses[:0], []
+            if pose_analytics is not None:
+                pose_analytics = pose_analytics[:0]
+        if fmt == "json":
+            return encode_legacy_json(hands, handedness)
+        return encode_packet(self.seq, timestamp, hands, handedness, poses, person_ids,
+                             quantized=quantized, predicted=predicted, gestures=gestures,
+                             hand_analytics=hand_analytics, pose_analytics=pose_analytics)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "udp_errors": self.udp_errors,
+            "subscribers": [s.stats() for s in self.subscribers],
+        }
+
+
+async def _load_client(host, port, transport, request, counters, stop):
+    """Cliente de prueba: se suscribe y cuenta paquetes y latencia"""
+    data = json.dumps(request).encode()
+    if transport == "tcp":
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(data + b"\n")
+        await writer.drain()
+        try:
+            while not stop.is_set():
+                size = LENGTH.unpack(await reader.readexactly(LENGTH.size))[0]
+                packet = decode_packet(await reader.readexactly(size))
+                counters["received"] += 1
+                counters["latency"] += time.time() - packet.timestamp
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    class Protocol(asyncio.DatagramProtocol):
+        def datagram_received(self, payload, address):
+            queue.put_nowait(payload)
+
+    udp, _ = await loop.create_datagram_endpoint(Protocol, remote_addr=(host, port))
+    udp.sendto(data)
+    try:
+        while not stop.is_set():
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            packet = decode_packet(payload)
+            counters["received"] += 1
+            counters["latency"] += time.time() - packet.timestamp
+    finally:
+        udp.sendto(b'{"unsubscribe": true}')
+        udp.close()
+
+
+def load_test(clients=100, transport="tcp", seconds=5.0, rate=60.0, max_rate=None, port=9800):
+    """Publica manos sintéticas a rate Hz hacia clients suscriptores locales"""
+    hub = LandmarkHub(tcp_port=port if transport == "tcp" else None,
+                      udp_port=port if transport == "udp" else None).start()
+    topics = [["left", "right", "pose"], ["left"], ["right"], ["pose"]]
+    counters = [{"received": 0, "latency": 0.0} for _ in range(clients)]
+
+    async def run_clients():
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(_load_client(
+            "127.0.0.1", port, transport,
+            {"topics": topics[i % len(topics)], "max_rate": max_rate}, counters[i], stop))
+            for i in range(clients)]
+        await asyncio.sleep(1.0)  # Dar tiempo a que se registren
+
+        def publisher():
+            rng = np.random.default_rng(0)
+            hands = rng.random((2, HAND_LANDMARKS, 3), dtype=np.float32)
+            poses = rng.random((1, POSE_LANDMARKS, 4), dtype=np.float32)
+            interval = 1.0 / rate
+            next_time = time.perf_counter()
+            end = next_time + seconds
+            while time.perf_counter() < end:
+                hub.publish(time.time(), hands, ["left", "right"], poses, [0])
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        await asyncio.get_running_loop().run_in_executor(None, publisher)
+        await asyncio.sleep(0.5)
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        asyncio.run(run_clients())
+    finally:
+        stats = hub.stats()
+        hub.close()
+
+    received = [c["received"] for c in counters]
+    total = sum(received)
+    latency = sum(c["latency"] for c in counters) / total * 1000.0 if total else 0.0
+    dropped = sum(s["dropped"] for s in stats["subscribers"])
+    print(f"{clients} clientes {transport}: {stats['published']} frames publicados "
+          f"({stats['coalesced']} agrupados), {total} paquetes entregados")
+    print(f"  por cliente: mín {min(received)}, media {total / clients:.1f}, máx {max(received)}")
+    print(f"  latencia media {latency:.2f} ms, {dropped} descartados en colas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del hub de landmarks")
+    parser.add_argument("--load-test", type=int, default=100, metavar="CLIENTES")
+    parser.add_argument("--transport", choices=("tcp", "udp"), default="tcp")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=60.0, help="Frames publicados por segundo")
+    parser.add_argument("--max-rate", type=float, default=None, help="Límite por suscriptor")
+    parser.add_argument("--port", type=int, default=9800)
+    args = parser.parse_args()
+    load_test(args.load_test, args.transport, args.seconds, args.rate, args.max_rate, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Protocolo binario compacto para enviar landmarks por UDP.
+
+Formato de paquete (little endian):
+
+    cabecera   magic 'LM' | versión u8 | flags u8 | secuencia u32 |
+               timestamp de captura f64 | nº de manos u8 | nº de cuerpos u8
+    manos      lateralidad u8 por mano (0 izquierda, 1 derecha, 255 desconocida)
+               + landmarks (manos, 21, 3) x, y, z
+    cuerpos    id u8 por persona + landmarks (cuerpos, 33, 4) x, y, z, visibilidad
+
+Los landmarks van como float32 o, con FLAG_QUANTIZED, como int16 con escala
+fija QUANT_SCALE (rango ±2 con resolución ~6e-5). FLAG_PREDICTED marca los
+paquetes cuyos landmarks se han predicho (frame_skip) en lugar de inferido.
+Con FLAG_GESTURES, tras las manos va un u8 por mano con el gesto activo
+(índice de gestures.GESTURES, 255 si ninguno). Con FLAG_ANALYTICS, al final
+van el nº de valores por mano y por cuerpo (u8 cada uno) y las analíticas
+de movimiento como float32 (manos, Vm) y (cuerpos, Vc) (ver motion_analytics).
+
+La versión 2 añadió los flags de predicción, gestos y analíticas, que
+cambian el tamaño del paquete; cualquier cambio de formato debe subir
+VERSION. El decodificador rechaza versiones distintas y bits de flag que no
+conoce en lugar de fallar más adelante con una longitud inválida.
+"""
+import json
+import socket
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b"LM"
+VERSION = 2
+FLAG_QUANTIZED = 0x01
+FLAG_PREDICTED = 0x02
+FLAG_GESTURES = 0x04
+FLAG_ANALYTICS = 0x08
+KNOWN_FLAGS = FLAG_QUANTIZED | FLAG_PREDICTED | FLAG_GESTURES | FLAG_ANALYTICS
+NO_GESTURE = 255
+
+HEADER = struct.Struct("<2sBBIdBB")
+ANALYTICS_HEADER = struct.Struct("<BB")
+HAND_LANDMARKS = 21
+POSE_LANDMARKS = 33
+QUANT_SCALE = 16384.0
+
+HANDEDNESS_CODES = {"left": 0, "right": 1}
+HANDEDNESS_NAMES = {0: "left", 1: "right"}
+UNKNOWN_HANDEDNESS = 255
+
+LandmarkPacket = namedtuple(
+    "LandmarkPacket",
+    ["seq", "timestamp", "handedness", "hands", "person_ids", "poses", "predicted", "gestures",
+     "hand_analytics", "pose_analytics"],
+    defaults=(False, None, None, None)
+)
+
+
+def _pack_array(array, quantized):
+    if quantized:
+        q = np.clip(np.rint(array * QUANT_SCALE), -32768, 32767)
+        return q.astype("<i2").tobytes()
+    return np.ascontiguousarray(array, dtype="<f4").tobytes()
+
+
+def _unpack_array(data, offset, shape, quantized):
+    count = int(np.prod(shape))
+    dtype = "<i2" if quantized else "<f4"
+    array = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+    if quantized:
+        array = array.astype(np.float32) / QUANT_SCALE
+    return array, offset + count * np.dtype(dtype).itemsize
+
+
+def _analytics_rows(values, rows):
+    if values is None:
+        return np.zeros((rows, 0), np.float32)
+    values = np.asarray(values, np.float32)
+    if values.ndim != 2:
+        values = values.reshape(len(values), -1)
+    if len(values) != rows:
+        raise ValueError("El número de filas de analíticas no coincide con el de landmarks")
+    if values.shape[1] > 255:
+        raise ValueError("Como máximo 255 valores de analíticas por fila")
+    return values
+
+
+def encode_packet(seq, timestamp, hands=None, handedness=(), poses=None, person_ids=(),
+                  quantized=False, predicted=False, gestures=None, hand_analytics=None,
+                  pose_analytics=None):
+    """Codifica un paquete a partir de arrays (manos, 21, 3) y (cuerpos, 33, 4)"""
+    hands = np.zeros((0, HAND_LANDMARKS, 3), np.float32) if hands is None else hands
+    poses = np.zeros((0, POSE_LANDMARKS, 4), np.float32) if poses is None else poses
+    if len(handedness) != len(hands) or len(person_ids) != len(poses):
+        raise ValueError("El número de etiquetas no coincide con el de landmarks")
+    if gestures is not None and len(gestures) != len(hands):
+        raise ValueError("El número de gestos no coincide con el de manos")
+
+    codes = bytes(HANDEDNESS_CODES.get(h, UNKNOWN_HANDEDNESS) if isinstance(h, str) else h
+                  for h in handedness)
+    analytics = b""
+    if hand_analytics is not None or pose_analytics is not None:
+        hand_analytics = _analytics_rows(hand_analytics, len(hands))
+        pose_analytics = _analytics_rows(pose_analytics, len(poses))
+        analytics = b"".join((
+            ANALYTICS_HEADER.pack(hand_analytics.shape[1], pose_analytics.shape[1]),
+            _pack_array(hand_analytics, False),
+            _pack_array(pose_analytics, False),
+        ))
+
+    flags = ((FLAG_QUANTIZED if quantized else 0) | (FLAG_PREDICTED if predicted else 0)
+             | (FLAG_GESTURES if gestures is not None else 0) | (FLAG_ANALYTICS if analytics else 0))
+    return b"".join((
+        HEADER.pack(MAGIC, VERSION, flags, seq & 0xFFFFFFFF, timestamp, len(hands), len(poses)),
+        codes,
+        _pack_array(hands, quantized),
+        b"" if gestures is None else bytes(min(int(g), NO_GESTURE) for g in gestures),
+        bytes(int(i) & 0xFF for i in person_ids),
+        _pack_array(poses, quantized),
+        analytics,
+    ))
+
+
+def decode_packet(data):
+    """Decodifica un paquete; lanza ValueError si no es válido"""
+    if len(data) < HEADER.size:
+        raise ValueError("Paquete demasiado corto")
+    magic, version, flags, seq, timestamp, n_hands, n_poses = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Cabecera desconocida")
+    if version != VERSION:
+        raise ValueError(f"Versión de protocolo no soportada: {version}")
+    if flags & ~KNOWN_FLAGS:
+        raise ValueError(f"Flags desconocidos: {flags & ~KNOWN_FLAGS:#04x}")
+
+    quantized = bool(flags & FLAG_QUANTIZED)
+    itemsize = 2 if quantized else 4
+    has_gestures = bool(flags & FLAG_GESTURES)
+    expected = (HEADER.size + n_hands + n_hands * HAND_LANDMARKS * 3 * itemsize
+                + (n_hands if has_gestures else 0)
+                + n_poses + n_poses * POSE_LANDMARKS * 4 * itemsize)
+    analytics_offset = expected
+    if flags & FLAG_ANALYTICS:
+        if len(data) < expected + ANALYTICS_HEADER.size:
+            raise ValueError("Paquete demasiado corto")
+        hand_values, pose_values = ANALYTICS_HEADER.unpack_from(data, expected)
+        expected += ANALYTICS_HEADER.size + 4 * (n_hands * hand_values + n_poses * pose_values)
+    if len(data) != expected:
+        raise ValueError(f"Longitud inválida: {len(data)} (esperado {expected})")
+
+    offset = HEADER.size
+    handedness = [HANDEDNESS_NAMES.get(c, "unknown") for c in data[offset:offset + n_hands]]
+    offset += n_hands
+    hands, offset = _unpack_array(data, offset, (n_hands, HAND_LANDMARKS, 3), quantized)
+    gestures = None
+    if has_gestures:
+        gestures = list(data[offset:offset + n_hands])
+        offset += n_hands
+    person_ids = list(data[offset:offset + n_poses])
+    offset += n_poses
+    poses, offset = _unpack_array(data, offset, (n_poses, POSE_LANDMARKS, 4), quantized)
+    hand_analytics = pose_analytics = None
+    if flags & FLAG_ANALYTICS:
+        offset = analytics_offset + ANALYTICS_HEADER.size
+        hand_analytics, offset = _unpack_array(data, offset, (n_hands, hand_values), False)
+        pose_analytics, offset = _unpack_array(data, offset, (n_poses, pose_values), False)
+    return LandmarkPacket(seq, timestamp, handedness, hands, person_ids, poses,
+                          bool(flags & FLAG_PREDICTED), gestures, hand_analytics, pose_analytics)
+
+
+def encode_legacy_json(hands, handedness):
+    """Formato JSON antiguo {"left": [...], "right": [...]} para consumidores existentes"""
+    hands_data = {"left": [], "right": []}
+    for hand_type, points in zip(handedness, hands.tolist()):
+        hands_data[hand_type] = [{"x": x, "y": y, "z": z} for x, y, z in points]
+    return json.dumps(hands_data).encode()
+
+
+def seq_newer(seq, last):
+    """True si seq es posterior a last teniendo en cuenta el desbordamiento de u32"""
+    return 0 < ((seq - last) & 0xFFFFFFFF) < 0x80000000
+
+
+class LandmarkSender:
+    """Emisor UDP con número de secuencia propio"""
+
+    def __init__(self, address=("localhost", 9999), quantized=False, sock=None):
+        self.address = address
+        self.quantized = quantized
+        self.sock = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.seq = 0
+
+    def send(self, timestamp, hands=None, handedness=(), poses=None, person_ids=(), predicted=False,
+             gestures=None, hand_analytics=None, pose_analytics=None):
+        packet = encode_packet(self.seq, timestamp, hands, handedness, poses, person_ids,
+                               quantized=self.quantized, predicted=predicted, gestures=gestures,
+                               hand_analytics=hand_analytics, pose_analytics=pose_analytics)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.sock.sendto(packet, self.address)
+        return len(packet)
+
+    def close(self):
+        self.sock.close()
+
+
+class LandmarkReceiver:
+    """Receptor UDP que descarta paquetes fuera de orden o corruptos.
+
+    Solo se consideran fuera de orden los paquetes hasta reorder_window
+    posiciones por detrás del último; un salto atrás mayor se interpreta como
+    un emisor reiniciado y se acepta.
+    """
+
+    def __init__(self, address=("localhost", 9999), drop_out_of_order=True, bufsize=65536,
+                 reorder_window=64):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.drop_out_of_order = drop_out_of_order
+        self.reorder_window = reorder_window
+        self.bufsize = bufsize
+        self.last_seq = None
+        self.received = 0
+        self.out_of_order = 0
+        self.invalid = 0
+
+    def receive(self, timeout=None):
+        """Devuelve el siguiente LandmarkPacket válido o None si vence el timeout"""
+        self.sock.settimeout(timeout)
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(self.bufsize)
+            except socket.timeout:
+                return None
+
+            try:
+                packet = decode_packet(data)
+            except ValueError:
+                self.invalid += 1
+                continue
+
+            if (self.drop_out_of_order and self.last_seq is not None
+                    and not seq_newer(packet.seq, self.last_seq)
+                    and (self.last_seq - packet.seq) & 0xFFFFFFFF <= self.reorder_window):
+                self.out_of_order += 1
+                continue
+
+            self.last_seq = packet.seq
+            self.received += 1
+            return packet
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    # Receptor de prueba: muestra manos recibidas y latencia desde la captura
+    receiver = LandmarkReceiver(("localhost", 9999))
+    print("Escuchando en localhost:9999 (Ctrl+C para salir)")
+    try:
+        while True:
+            packet = receiver.receive(timeout=1.0)
+            if packet is None:
+                continue
+            latency_ms = (time.time() - packet.timestamp) * 1000
+            print(f"#{packet.seq} manos={packet.handedness} cuerpos={len(packet.poses)} "
+                  f"latencia={latency_ms:.1f} ms descartados={receiver.out_of_order}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.close()
@@ -0,0 +1,233 @@
+"""Grabación binaria de landmarks, de solo anexado, con índice por frame.
+
+Dos ficheros por grabación:
+
+    <nombre>.lmrec  cabecera de HEADER_SIZE bytes + registros RECORD_DTYPE
+    <nombre>.lmidx  una entrada INDEX_DTYPE por frame (primer registro y cuántos)
+
+Cada registro es de tamaño fijo: frame, timestamp, tipo (cuerpo/mano), id de
+persona o lateralidad y landmarks float32 (33, 4). Las manos ocupan las
+primeras 21 filas con la visibilidad a NaN. Los registros se escriben antes
+que la entrada de índice que los referencia, así que un lector puede abrir la
+grabación con numpy.memmap mientras se sigue grabando.
+
+En la versión 2 el id ocupa un u32 (antes u8): los ids de persona de
+MultiPersonPoseTracker crecen sin límite y con un byte se confundían pistas
+distintas a partir de la 256.
+"""
+import os
+import struct
+
+import numpy as np
+
+from landmark_protocol import HAND_LANDMARKS, HANDEDNESS_CODES, POSE_LANDMARKS, UNKNOWN_HANDEDNESS
+
+MAGIC = b"LMREC"
+VERSION = 2
+HEADER = struct.Struct("<5sBHI")
+HEADER_SIZE = 64
+
+KIND_POSE = 0
+KIND_HAND = 1
+
+RECORD_DTYPE = np.dtype([
+    ("frame_index", "<i8"),
+    ("timestamp", "<f8"),
+    ("kind", "u1"),
+    ("reserved", "u1", (3,)),
+    ("track_id", "<u4"),  # id de persona (cuerpos) o código de lateralidad (manos)
+    ("landmarks", "<f4", (POSE_LANDMARKS, 4)),
+])
+
+INDEX_DTYPE = np.dtype([
+    ("frame_index", "<i8"),
+    ("timestamp", "<f8"),
+    ("first_record", "<i8"),
+    ("count", "<i4"),
+    ("reserved", "<i4"),
+])
+
+
+def _paths(path):
+    base = path[:-len(".lmrec")] if path.endswith(".lmrec") else path
+    return base + ".lmrec", base + ".lmidx"
+
+
+class RecordingWriter:
+    """Escribe frames de landmarks en disco sin acumularlos en memoria"""
+
+    def __init__(self, path, flush_every=1):
+        self.data_path, self.index_path = _paths(path)
+        self.flush_every = flush_every
+
+        new_file = not os.path.exists(self.data_path) or os.path.getsize(self.data_path) == 0
+        self.data_file = open(self.data_path, "ab")
+        self.index_file = open(self.index_path, "ab")
+        if new_file:
+            header = HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, HEADER_SIZE)
+            self.data_file.write(header.ljust(HEADER_SIZE, b"\0"))
+            self.data_file.flush()
+            self.records = 0
+        else:
+            _check_header(self.data_path)
+            self.records = (os.path.getsize(self.data_path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+
+        # Registros y entrada de índice reutilizables entre frames
+        self._records = np.zeros(0, dtype=RECORD_DTYPE)
+        self._entry = np.zeros(1, dtype=INDEX_DTYPE)
+        self._pending = 0
+
+    def _record_buffer(self, count):
+        if len(self._records) < count:
+            self._records = np.zeros(count, dtype=RECORD_DTYPE)
+        return self._records[:count]
+
+    def write_frame(self, frame_index, timestamp, poses=None, person_ids=None,
+                    hands=None, handedness=()):
+        """Añade un frame con cuerpos (N, 33, 4) y manos (M, 21, 3)"""
+        n_poses = 0 if poses is None else len(poses)
+        n_hands = 0 if hands is None else len(hands)
+        records = self._record_buffer(n_poses + n_hands)
+        records["frame_index"] = frame_index
+        records["timestamp"] = timestamp
+
+        if n_poses:
+            block = records[:n_poses]
+            block["kind"] = KIND_POSE
+            block["track_id"] = range(n_poses) if person_ids is None else person_ids
+            block["landmarks"] = poses
+        if n_hands:
+            block = records[n_poses:]
+            block["kind"] = KIND_HAND
+            block["track_id"] = [HANDEDNESS_CODES.get(h, UNKNOWN_HANDEDNESS) for h in handedness]
+            block["landmarks"] = np.nan
+            block["landmarks"][:, :HAND_LANDMARKS, :3] = hands
+
+        # Primero los datos; la entrada de índice solo cuando ya están en disco
+        self.data_file.write(records.tobytes())
+        entry = self._entry
+        entry["frame_index"] = frame_index
+        entry["timestamp"] = timestamp
+        entry["first_record"] = self.records
+        entry["count"] = len(records)
+        self.records += len(records)
+
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.data_file.flush()
+        self.index_file.write(entry.tobytes())
+        if self._pending >= self.flush_every:
+            self.index_file.flush()
+            self._pending = 0
+
+    def close(self):
+        self.data_file.flush()
+        self.index_file.flush()
+        self.data_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(data_path):
+    with open(data_path, "rb") as f:
+        magic, version, record_size, header_size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{data_path} no es una grabación de landmarks compatible")
+    if record_size != RECORD_DTYPE.itemsize or header_size != HEADER_SIZE:
+        raise ValueError(f"{data_path}: tamaño de registro inesperado")
+
+
+class LandmarkRecording:
+    """Lectura por numpy.memmap (sin copias) de una grabación, incluso en curso.
+
+    refresh() vuelve a mapear los ficheros si han crecido. Buscar un frame es
+    O(1) cuando los índices de frame son consecutivos (caso habitual) y
+    O(log n) si hay huecos; buscar por tiempo es una búsqueda binaria sobre
+    el índice.
+    """
+
+    def __init__(self, path):
+        self.data_path, self.index_path = _paths(path)
+        _check_header(self.data_path)
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self.refresh()
+
+    def refresh(self):
+        """Mapea los registros e índices completos escritos hasta ahora"""
+        n_index = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+        available = (os.path.getsize(self.data_path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        index = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r", shape=(n_index,)) \
+            if n_index else np.zeros(0, dtype=INDEX_DTYPE)
+
+        # Ignorar entradas cuyos registros aún no han llegado al disco
+        if n_index:
+            ends = index["first_record"] + index["count"]
+            n_index = int(np.searchsorted(ends, available, side="right"))
+            index = index[:n_index]
+        self.index = index
+
+        n_records = 0
+        if n_index:
+            last = self.index[-1]
+            n_records = int(last["first_record"] + last["count"])
+        if n_records != len(self.records):
+            self.records = np.memmap(self.data_path, dtype=RECORD_DTYPE, mode="r",
+                                     offset=HEADER_SIZE, shape=(n_records,)) \
+                if n_records else np.zeros(0, dtype=RECORD_DTYPE)
+        return len(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _position(self, frame_index):
+        """Posición en el índice del frame pedido (o del siguiente disponible)"""
+        if not len(self.index):
+            return 0
+        pos = int(frame_index - self.index[0]["frame_index"])
+        if 0 <= pos < len(self.index) and self.index[pos]["frame_index"] == frame_index:
+            return pos
+        return int(np.searchsorted(self.index["frame_index"], frame_index))
+
+    def _records_between(self, start, stop):
+        if start >= stop:
+            return self.records[0:0]
+        first = int(self.index[start]["first_record"])
+        last = self.index[stop - 1]
+        return self.records[first:int(last["first_record"] + last["count"])]
+
+    def frame(self, frame_index):
+        """Registros (vista) de un frame concreto"""
+        pos = self._position(frame_index)
+        if pos >= len(self.index) or self.index[pos]["frame_index"] != frame_index:
+            return self.records[0:0]
+        return self._records_between(pos, pos + 1)
+
+    def frame_slice(self, start_frame, end_frame):
+        """Registros (vista) de los frames [start_frame, end_frame)"""
+        return self._records_between(self._position(start_frame), self._position(end_frame))
+
+    def time_slice(self, start_time, end_time):
+        """Registros (vista) con timestamp en [start_time, end_time)"""
+        times = self.index["timestamp"]
+        start = int(np.searchsorted(times, start_time, side="left"))
+        stop = int(np.searchsorted(times, end_time, side="left"))
+        return self._records_between(start, stop)
+
+    def close(self):
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+
+
+def split_records(records):
+    """Separa registros en (cuerpos (N, 33, 4), ids, manos (M, 21, 3), lateralidad)"""
+    pose_mask = records["kind"] == KIND_POSE
+    poses = records["landmarks"][pose_mask]
+    hand_records = records[~pose_mask]
+    hands = hand_records["landmarks"][:, :HAND_LANDMARKS, :3]
+    return poses, records["track_id"][pose_mask], hands, hand_records["track_id"]
@@ -0,0 +1,298 @@
+"""Métricas de ejecución de los bucles de seguimiento.
+
+Contadores e histogramas de latencia baratos de actualizar desde el bucle
+(una suma y una búsqueda binaria); los valores derivados se calculan con
+funciones que solo se evalúan cuando alguien lee las métricas, por HTTP en
+formato de texto de Prometheus o en un fichero que se reescribe
+periódicamente. Sin lectores el coste es prácticamente nulo.
+
+RateLimitedLog sustituye a los print del bucle principal: cada clave se
+escribe como mucho una vez por intervalo y se cuentan los mensajes omitidos.
+
+    metrics = MetricsRegistry()
+    metrics.add_pipeline(pipeline)
+    serve_metrics(metrics, port=9100)   # curl localhost:9100/metrics
+"""
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites superiores (ms) de los cubos de los histogramas de latencia
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000)
+
+
+class Counter:
+    """Contador monótono (cada contador lo actualiza un solo hilo)"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """Histograma de cubos fijos con suma y cuenta, como los de Prometheus"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Cota superior del cubo que contiene el cuantil q (inf si es el último)"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return float(bound)
+        return math.inf
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+class MetricsRegistry:
+    """Conjunto de métricas con nombre y etiquetas.
+
+    counter() e histogram() devuelven objetos que el bucle actualiza
+    directamente; gauge() registra una función que se evalúa al leer.
+    """
+
+    def __init__(self, prefix="tracking"):
+        self.prefix = prefix
+        self.started = time.time()
+        self._families = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, kind, name, help, labels, metric):
+        full_name = f"{self.prefix}_{name}" if self.prefix else name
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(full_name, {"kind": kind, "help": help, "series": OrderedDict()})
+            if family["kind"] != kind:
+                raise ValueError(f"La métrica {full_name} ya existe como {family['kind']}")
+            return family["series"].setdefault(key, metric)
+
+    def counter(self, name, help="", **labels):
+        return self._register("counter", name, help, labels, Counter())
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS_MS, **labels):
+        return self._register("histogram", name, help, labels, Histogram(buckets))
+
+    def gauge(self, name, fn, help="", kind="gauge", **labels):
+        """Valor calculado por fn() en cada lectura (kind="counter" si es monótono)"""
+        return self._register(kind, name, help, labels, fn)
+
+    def add_histogram(self, name, histogram, help="", **labels):
+        """Registra un histograma que ya existe (por ejemplo el de un StageStats)"""
+        return self._register("histogram", name, help, labels, histogram)
+
+    # --- Fuentes habituales ---
+
+    def add_stage(self, stats):
+        """Frames, descartes, errores, fps y latencia de un pipeline.StageStats"""
+        stage = stats.name
+        self.gauge("stage_frames_total", lambda: stats.count, "Frames procesados", "counter", stage=stage)
+        self.gauge("stage_dropped_total", lambda: stats.dropped, "Frames descartados", "counter", stage=stage)
+        self.gauge("stage_errors_total", lambda: stats.errors, "Errores", "counter", stage=stage)
+        self.gauge("stage_fps", stats.fps, "Rendimiento medido (frames/s)", stage=stage)
+        self.add_histogram("stage_latency_ms", stats.latency, "Tiempo de trabajo por frame (ms)", stage=stage)
+
+    def add_queue(self, name, q):
+        self.gauge("queue_depth", q.qsize, "Elementos en cola", queue=name)
+
+    def add_pipeline(self, pipeline):
+        for stats in pipeline.stats():
+            self.add_stage(stats)
+        self.add_queue("frames", pipeline.frame_queue)
+        self.add_queue("results", pipeline.result_queue)
+
+    def add_skipper(self, skipper):
+        """Frames inferidos y predichos de un frame_skip.FrameSkipper"""
+        stats = skipper.stats
+        self.gauge("inferred_frames_total", lambda: stats.inferred, "Frames con inferencia", "counter")
+        self.gauge("predicted_frames_total", lambda: stats.predicted, "Frames predichos", "counter")
+
+    def add_hub(self, hub):
+        """Publicación, descartes en colas y errores de envío de un LandmarkHub"""
+        subscribers = lambda: list(hub.subscribers)
+        self.gauge("hub_published_total", lambda: hub.published, "Frames publicados", "counter")
+        self.gauge("hub_coalesced_total", lambda: hub.coalesced, "Frames sustituidos antes de enviarse", "counter")
+        self.gauge("hub_send_errors_total", lambda: hub.udp_errors + sum(s.errors for s in subscribers()),
+                   "Errores de envío (UDP y conexiones cortadas)", "counter")
+        self.gauge("hub_sent_total", lambda: sum(s.sent for s in subscribers()), "Paquetes enviados", "counter")
+        self.gauge("hub_dropped_total", lambda: sum(s.dropped for s in subscribers()),
+                   "Paquetes descartados en colas de suscriptores", "counter")
+        self.gauge("hub_subscribers", lambda: sum(not s.closed for s in subscribers()), "Suscriptores activos")
+        self.gauge("queue_depth", lambda: sum(len(s.queue) for s in subscribers()), "Elementos en cola",
+                   queue="hub")
+
+    def detection_counter(self, frames, name="detections", help="Frames con detección"):
+        """Contador de frames con detección y su proporción sobre frames()"""
+        counter = self.counter(f"{name}_total", help)
+        self.gauge(f"{name}_ratio", lambda: counter.value / max(frames(), 1), "Proporción de frames con detección")
+        return counter
+
+    # --- Lectura ---
+
+    def render(self):
+        """Todas las métricas en formato de texto de Prometheus"""
+        lines = []
+        with self._lock:
+            families = [(name, dict(family), list(family["series"].items()))
+                        for name, family in self._families.items()]
+        for name, family, series in families:
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for labels, metric in series:
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (math.inf,), metric.counts):
+                        cumulative += count
+                        le = ("le", _format_value(float(bound)) if bound != math.inf else "+Inf")
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                    continue
+                try:
+                    value = metric.value if isinstance(metric, Counter) else metric()
+                except Exception:
+                    continue
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        lines.append(f"{self.prefix}_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(registry, port=9100, host="127.0.0.1"):
+    """Sirve las métricas por HTTP en un hilo aparte; devuelve el servidor (shutdown() para parar)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StatsFileWriter(threading.Thread):
+    """Reescribe las métricas en un fichero cada interval segundos (de forma atómica)"""
+
+    def __init__(self, registry, path, interval=5.0):
+        super().__init__(daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def write(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.registry.render())
+        os.replace(tmp, self.path)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+        self.write()
+
+
+def start_metrics(registry, port=None, stats_file=None, interval=5.0):
+    """Arranca el servidor HTTP y/o el fichero de métricas; devuelve una función para pararlos"""
+    server = None
+    if port is not None:
+        try:
+            server = serve_metrics(registry, port)
+        except OSError as e:
+            logging.getLogger("tracking").warning(f"Métricas HTTP desactivadas (puerto {port}): {e}")
+    writer = StatsFileWriter(registry, stats_file, interval) if stats_file else None
+    if writer is not None:
+        writer.start()
+
+    def stop():
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if writer is not None:
+            writer.stop()
+    return stop
+
+
+def configure_logging(level=logging.INFO):
+    """Formato de log de los scripts (hora, nivel y mensaje)"""
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(message)s")
+
+
+class RateLimitedLog:
+    """Log con frecuencia máxima por clave; los mensajes omitidos se cuentan"""
+
+    def __init__(self, name="tracking", interval=5.0):
+        self.logger = logging.getLogger(name)
+        self.interval = interval
+        self._last = {}
+
+    def log(self, level, key, message):
+        """Escribe el mensaje si la clave no se ha usado en el último intervalo"""
+        now = time.monotonic()
+        last, suppressed = self._last.get(key, (-math.inf, 0))
+        if now - last < self.interval:
+            self._last[key] = (last, suppressed + 1)
+            return False
+        if suppressed:
+            message = f"{message} (+{suppressed} omitidos)"
+        self.logger.log(level, message)
+        self._last[key] = (now, 0)
+        return True
+
+    def info(self, key, message):
+        return self.log(logging.INFO, key, message)
+
+    def warning(self, key, message):
+        return self.log(logging.WARNING, key, message)
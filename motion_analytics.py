@@ -0,0 +1,294 @@
+"""Analíticas de movimiento en ventana deslizante, vectorizadas sobre varias pistas.
+
+MotionAnalyzer guarda para cada persona o mano seguida (por su id) un anillo
+NumPy de tamaño fijo con los últimos ángulos y, frame a frame, calcula para
+todas las pistas a la vez:
+
+    - ángulos de articulación configurables (codo, rodilla, flexión de dedos...)
+    - velocidad angular y velocidad/aceleración de cada landmark suavizadas
+    - media, desviación, mínimo y máximo (rango de movimiento) en la ventana
+
+Todo se actualiza de forma incremental: sumas acumuladas para media y
+desviación, y máximos/mínimos por bloques (prefijo del bloque actual +
+sufijo del anterior), así que el coste por frame no depende del tamaño de la
+ventana. features() empaqueta los valores por ángulo para enviarlos junto a
+los landmarks (FLAG_ANALYTICS de landmark_protocol).
+
+    analyzer = MotionAnalyzer(POSE_ANGLES, window=60)
+    state = analyzer.update(ids, poses, timestamp, aspect=w / h)
+    state.angles, state.angle_min, state.angle_max
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from gestures import FINGER_JOINTS
+from landmark_arrays import VISIBILITY_THRESHOLD, triplet_angles
+from landmark_protocol import HAND_LANDMARKS, POSE_LANDMARKS
+
+# Ángulos de Pose: nombre y landmarks (a, b, c) con el vértice en b
+POSE_ANGLES = (
+    ("left_elbow", (11, 13, 15)),
+    ("right_elbow", (12, 14, 16)),
+    ("left_shoulder", (13, 11, 23)),
+    ("right_shoulder", (14, 12, 24)),
+    ("left_hip", (11, 23, 25)),
+    ("right_hip", (12, 24, 26)),
+    ("left_knee", (23, 25, 27)),
+    ("right_knee", (24, 26, 28)),
+)
+
+# Flexión de cada articulación de los dedos (mismo orden que gestures.FINGER_JOINTS)
+HAND_ANGLES = tuple(
+    (f"{finger}_{joint}", tuple(int(i) for i in FINGER_JOINTS[3 * f + j]))
+    for f, (finger, joints) in enumerate((
+        ("thumb", ("cmc", "mcp", "ip")),
+        ("index", ("mcp", "pip", "dip")),
+        ("middle", ("mcp", "pip", "dip")),
+        ("ring", ("mcp", "pip", "dip")),
+        ("pinky", ("mcp", "pip", "dip")),
+    ))
+    for j, joint in enumerate(joints)
+)
+
+# Valores por ángulo que viajan en el paquete, en este orden
+FEATURE_FIELDS = ("angle", "velocity", "mean", "min", "max")
+
+MotionState = namedtuple("MotionState", [
+    "ids", "angles", "angular_velocity", "angle_mean", "angle_std", "angle_min", "angle_max",
+    "velocity", "speed", "acceleration",
+])
+
+
+class TrackSlots:
+    """Reparto de huecos de tamaño fijo entre ids de pista (personas o manos).
+
+    Los ids que no aparecen durante más de max_misses frames liberan su
+    hueco; los ids negativos (sin seguimiento) no reciben hueco.
+    """
+
+    def __init__(self, capacity, max_misses=10):
+        self.capacity = capacity
+        self.max_misses = max_misses
+        self.slots = {}
+        self.misses = np.zeros(capacity, dtype=np.int64)
+
+    def assign(self, ids):
+        """Devuelve (hueco por id o -1, huecos recién asignados que hay que reiniciar)"""
+        present = set(ids)
+        for track_id, slot in list(self.slots.items()):
+            if track_id in present:
+                self.misses[slot] = 0
+                continue
+            self.misses[slot] += 1
+            if self.misses[slot] > self.max_misses:
+                del self.slots[track_id]
+
+        used = set(self.slots.values())
+        free = [s for s in range(self.capacity) if s not in used]
+        slots = np.full(len(ids), -1, dtype=np.intp)
+        new = []
+        for row, track_id in enumerate(ids):
+            if track_id < 0:
+                continue
+            slot = self.slots.get(track_id)
+            if slot is None and free:
+                slot = self.slots[track_id] = free.pop(0)
+                self.misses[slot] = 0
+                new.append(slot)
+            if slot is not None:
+                slots[row] = slot
+        return slots, new
+
+
+class MotionAnalyzer:
+    """Ángulos, velocidades y estadísticas en ventana para varias pistas a la vez.
+
+    Cada pista ocupa un hueco de tamaño fijo; las que no aparecen durante más
+    de max_misses frames se liberan. alpha es el factor de suavizado
+    exponencial de las velocidades (1 = sin suavizar).
+    """
+
+    def __init__(self, angles=POSE_ANGLES, num_points=POSE_LANDMARKS, max_tracks=4, window=30,
+                 alpha=0.5, max_misses=10, dims=3, threshold=VISIBILITY_THRESHOLD,
+                 default_dt=1.0 / 30):
+        self.names = [name for name, _ in angles]
+        self.triplets = np.array([triplet for _, triplet in angles], dtype=np.intp).reshape(-1, 3)
+        self.window = window
+        self.alpha = alpha
+        self.dims = dims
+        self.threshold = threshold
+        self.default_dt = default_dt
+        self.tracks = TrackSlots(max_tracks, max_misses)
+
+        tracks, angles_count = max_tracks, len(self.triplets)
+        self.ring = np.full((tracks, window, angles_count), np.nan)
+        self.count = np.zeros(tracks, dtype=np.int64)
+        self.last_time = np.zeros(tracks)
+
+        # Sumas de la ventana (solo valores válidos) para media y desviación
+        self.sum = np.zeros((tracks, angles_count))
+        self.sum_sq = np.zeros((tracks, angles_count))
+        self.valid = np.zeros((tracks, angles_count), dtype=np.int64)
+
+        # Extremos por bloques de tamaño window: prefijo del bloque en curso y
+        # sufijo del bloque anterior
+        self.prefix_max = np.full((tracks, angles_count), np.nan)
+        self.prefix_min = np.full((tracks, angles_count), np.nan)
+        self.suffix_max = np.full((tracks, window, angles_count), np.nan)
+        self.suffix_min = np.full((tracks, window, angles_count), np.nan)
+
+        self.angles = np.full((tracks, angles_count), np.nan)
+        self.angular_velocity = np.zeros((tracks, angles_count))
+        self.position = np.zeros((tracks, num_points, dims))
+        self.velocity = np.zeros((tracks, num_points, dims))
+        self.acceleration = np.zeros((tracks, num_points, dims))
+
+    @property
+    def feature_size(self):
+        return len(self.names) * len(FEATURE_FIELDS)
+
+    def _reset(self, slot):
+        self.ring[slot] = np.nan
+        self.count[slot] = 0
+        self.sum[slot] = 0.0
+        self.sum_sq[slot] = 0.0
+        self.valid[slot] = 0
+        self.prefix_max[slot] = np.nan
+        self.prefix_min[slot] = np.nan
+        self.suffix_max[slot] = np.nan
+        self.suffix_min[slot] = np.nan
+        self.angles[slot] = np.nan
+        self.angular_velocity[slot] = 0.0
+        self.velocity[slot] = 0.0
+        self.acceleration[slot] = 0.0
+
+    def update(self, ids, points, timestamp, aspect=1.0):
+        """Añade un frame (ids, puntos (n, P, >=3)) y devuelve el MotionState por fila"""
+        ids = [int(i) for i in ids]
+        points = np.asarray(points, dtype=np.float32)
+        slots, new = self.tracks.assign(ids)
+        for slot in new:
+            self._reset(slot)
+        rows = np.flatnonzero(slots >= 0)
+        sl = slots[rows]
+        if len(sl):
+            self._update_slots(sl, points[rows], timestamp, aspect)
+        return self._state(ids, slots)
+
+    def _update_slots(self, sl, points, timestamp, aspect):
+        window = self.window
+        first = self.count[sl] == 0
+        dt = np.where(first, self.default_dt, timestamp - self.last_time[sl])
+        dt = np.where(dt > 0, dt, self.default_dt)
+        self.last_time[sl] = timestamp
+
+        # Ángulos con x (y z) escalados a la relación de aspecto del frame
+        scale = (aspect, 1.0, aspect)
+        angles = triplet_angles(points, self.triplets, scale=scale, threshold=self.threshold).astype(np.float64)
+        previous = self.angles[sl]
+        raw = (angles - previous) / dt[:, None]
+        raw = np.where(np.isfinite(raw), raw, 0.0)
+        self.angular_velocity[sl] = np.where(
+            first[:, None], 0.0, self.angular_velocity[sl] + self.alpha * (raw - self.angular_velocity[sl]))
+        self.angles[sl] = angles
+
+        # Velocidad y aceleración suavizadas de cada landmark (en alto de frame / s)
+        position = points[..., :self.dims] * np.asarray(scale[:self.dims], np.float32)
+        velocity = (position - self.position[sl]) / dt[:, None, None]
+        velocity = self.velocity[sl] + self.alpha * (velocity - self.velocity[sl])
+        velocity[first] = 0.0
+        acceleration = (velocity - self.velocity[sl]) / dt[:, None, None]
+        acceleration = self.acceleration[sl] + self.alpha * (acceleration - self.acceleration[sl])
+        acceleration[first] = 0.0
+        self.position[sl] = position
+        self.velocity[sl] = velocity
+        self.acceleration[sl] = acceleration
+
+        # Anillo: el valor que sale de la ventana se resta de las sumas
+        pos = self.count[sl] % window
+        evicted = self.ring[sl, pos]
+        old = np.isfinite(evicted)
+        self.sum[sl] -= np.where(old, evicted, 0.0)
+        self.sum_sq[sl] -= np.where(old, evicted * evicted, 0.0)
+        self.valid[sl] -= old
+        new = np.isfinite(angles)
+        self.sum[sl] += np.where(new, angles, 0.0)
+        self.sum_sq[sl] += np.where(new, angles * angles, 0.0)
+        self.valid[sl] += new
+        self.ring[sl, pos] = angles
+
+        start = (pos == 0)[:, None]
+        self.prefix_max[sl] = np.where(start, angles, np.fmax(self.prefix_max[sl], angles))
+        self.prefix_min[sl] = np.where(start, angles, np.fmin(self.prefix_min[sl], angles))
+        self.count[sl] += 1
+
+        # Bloque completo: sufijos para los extremos de la siguiente ventana y
+        # sumas recalculadas para que no acumulen error (coste amortizado O(1))
+        done = sl[pos == window - 1]
+        if len(done):
+            block = self.ring[done]
+            self.suffix_max[done] = np.fmax.accumulate(block[:, ::-1], axis=1)[:, ::-1]
+            self.suffix_min[done] = np.fmin.accumulate(block[:, ::-1], axis=1)[:, ::-1]
+            finite = np.isfinite(block)
+            values = np.where(finite, block, 0.0)
+            self.sum[done] = values.sum(axis=1)
+            self.sum_sq[done] = (values * values).sum(axis=1)
+            self.valid[done] = finite.sum(axis=1)
+
+    def _window_extrema(self, sl):
+        """Máximo y mínimo de los últimos window valores de cada hueco"""
+        pos = (self.count[sl] - 1) % self.window
+        following = np.minimum(pos + 1, self.window - 1)
+        tail = (pos < self.window - 1)[:, None]
+        tail_max = np.where(tail, self.suffix_max[sl, following], np.nan)
+        tail_min = np.where(tail, self.suffix_min[sl, following], np.nan)
+        return np.fmax(self.prefix_max[sl], tail_max), np.fmin(self.prefix_min[sl], tail_min)
+
+    def _state(self, ids, slots):
+        n, angles_count = len(ids), len(self.names)
+        points, dims = self.position.shape[1:]
+        state = MotionState(
+            ids=ids,
+            angles=np.full((n, angles_count), np.nan),
+            angular_velocity=np.zeros((n, angles_count)),
+            angle_mean=np.full((n, angles_count), np.nan),
+            angle_std=np.full((n, angles_count), np.nan),
+            angle_min=np.full((n, angles_count), np.nan),
+            angle_max=np.full((n, angles_count), np.nan),
+            velocity=np.zeros((n, points, dims)),
+            speed=np.zeros((n, points)),
+            acceleration=np.zeros((n, points, dims)),
+        )
+        rows = np.flatnonzero(slots >= 0)
+        if not len(rows):
+            return state
+        sl = slots[rows]
+        valid = self.valid[sl]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum[sl] / valid
+            variance = np.maximum(self.sum_sq[sl] / valid - mean * mean, 0.0)
+        state.angles[rows] = self.angles[sl]
+        state.angular_velocity[rows] = self.angular_velocity[sl]
+        state.angle_mean[rows] = np.where(valid > 0, mean, np.nan)
+        state.angle_std[rows] = np.where(valid > 0, np.sqrt(variance), np.nan)
+        state.angle_max[rows], state.angle_min[rows] = self._window_extrema(sl)
+        state.velocity[rows] = self.velocity[sl]
+        state.speed[rows] = np.linalg.norm(self.velocity[sl], axis=-1)
+        state.acceleration[rows] = self.acceleration[sl]
+        return state
+
+    def features(self, state):
+        """Valores por fila (n, ángulos * FEATURE_FIELDS) para el paquete de landmarks"""
+        values = np.stack([state.angles, state.angular_velocity, state.angle_mean,
+                           state.angle_min, state.angle_max], axis=-1)
+        return values.reshape(len(state.ids), -1).astype(np.float32)
+
+
+def pose_analyzer(max_people=4, window=60, **options):
+    return MotionAnalyzer(POSE_ANGLES, POSE_LANDMARKS, max_tracks=max_people, window=window, **options)
+
+
+def hand_analyzer(max_hands=8, window=30, **options):
+    # Las manos no traen visibilidad: todos los ángulos son válidos
+    return MotionAnalyzer(HAND_ANGLES, HAND_LANDMARKS, max_tracks=max_hands, window=window, **options)
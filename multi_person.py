@@ -0,0 +1,241 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from landmark_arrays import landmark_bbox, pose_to_array, remap_to_frame
+from metrics import RateLimitedLog
+
+# Configuración por defecto de cada instancia de Pose (una por persona)
+DEFAULT_POSE_CONFIG = dict(
+    static_image_mode=False,
+    model_complexity=1,
+    min_detection_confidence=0.7,
+    min_tracking_confidence=0.7,
+    smooth_landmarks=True
+)
+
+
+def box_iou(box, boxes):
+    """IoU entre una caja (x0, y0, x1, y1) y un array de cajas Nx4"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    x0 = np.maximum(box[0], boxes[:, 0])
+    y0 = np.maximum(box[1], boxes[:, 1])
+    x1 = np.minimum(box[2], boxes[:, 2])
+    y1 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+
+def match_boxes(track_boxes, detections, min_iou=0.3):
+    """Asociación voraz por IoU entre cajas de tracks y detecciones.
+
+    Devuelve la lista de pares (track, detección) y los índices de
+    detecciones que no se han asignado a ningún track.
+    """
+    if len(track_boxes) == 0 or len(detections) == 0:
+        return [], list(range(len(detections)))
+
+    iou = np.stack([box_iou(box, detections) for box in track_boxes])
+    matches = []
+    while True:
+        t, d = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[t, d] < min_iou:
+            break
+        matches.append((int(t), int(d)))
+        iou[t, :] = -1
+        iou[:, d] = -1
+
+    matched = {d for _, d in matches}
+    unmatched = [d for d in range(len(detections)) if d not in matched]
+    return matches, unmatched
+
+
+class HogPersonDetector:
+    """Detector de personas ligero basado en el HOG que trae OpenCV"""
+
+    def __init__(self, scale_width=480, hit_threshold=0.0, nms_threshold=0.4):
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        self.scale_width = scale_width
+        self.hit_threshold = hit_threshold
+        self.nms_threshold = nms_threshold
+
+    def detect(self, frame):
+        """Devuelve cajas Nx4 (x0, y0, x1, y1) en píxeles del frame completo"""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.scale_width / float(w))
+        small = frame if scale == 1.0 else cv2.resize(frame, (int(w * scale), int(h * scale)))
+
+        rects, weights = self.hog.detectMultiScale(
+            small, hitThreshold=self.hit_threshold, winStride=(8, 8), padding=(8, 8), scale=1.05
+        )
+        if len(rects) == 0:
+            return np.zeros((0, 4), dtype=np.float32)
+
+        weights = np.asarray(weights, dtype=np.float32).ravel()
+        keep = cv2.dnn.NMSBoxes([list(map(int, r)) for r in rects], weights.tolist(),
+                                self.hit_threshold, self.nms_threshold)
+        keep = np.asarray(keep).ravel()
+        rects = np.asarray(rects, dtype=np.float32)[keep] / scale
+        rects[:, 2:] += rects[:, :2]
+        return rects
+
+
+class PersonTrack:
+    """Persona seguida: caja actual, su propia instancia de Pose y últimos landmarks"""
+
+    def __init__(self, track_id, box, pose):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.pose = pose
+        self.landmarks = None  # (33, 4) en coordenadas normalizadas del frame
+        self.misses = 0
+        self.age = 0
+
+
+class MultiPersonPoseTracker:
+    """Seguimiento de N personas con una instancia de Pose por persona.
+
+    Un detector de personas propone cajas cada detect_interval frames; entre
+    detecciones la caja de cada persona se obtiene de sus landmarks del frame
+    anterior. Las cajas se asocian a los
+    tracks existentes por IoU para mantener los IDs estables, y cada persona
+    procesa solo su recorte en un pool de hilos. Así el coste crece con el
+    número de personas y no con el ancho del frame, y cada Pose conserva su
+    estado temporal mientras su persona siga en escena.
+    """
+
+    def __init__(self, max_people=4, detector=None, detect_interval=10, min_iou=0.3,
+                 max_misses=5, margin=0.2, pose_config=None, workers=None, max_side=480):
+        self.max_people = max_people
+        self.detector = detector if detector is not None else HogPersonDetector()
+        self.detect_interval = detect_interval
+        self.min_iou = min_iou
+        self.max_misses = max_misses
+        self.margin = margin
+        self.max_side = max_side
+        self.pose_config = dict(DEFAULT_POSE_CONFIG, **(pose_config or {}))
+
+        self.tracks = []
+        self.free_poses = []
+        self.next_id = 0
+        self.frame_index = 0
+        self.log = RateLimitedLog()
+        self.executor = ThreadPoolExecutor(max_workers=workers or max_people)
+
+    def _acquire_pose(self):
+        """Reutiliza una instancia libre (reiniciando su estado) o crea una nueva"""
+        if self.free_poses:
+            pose = self.free_poses.pop()
+            pose.reset()
+            return pose
+        return mp.solutions.pose.Pose(**self.pose_config)
+
+    def _release(self, track):
+        self.free_poses.append(track.pose)
+        track.pose = None
+
+    def _crop_box(self, box, w, h):
+        bw, bh = box[2] - box[0], box[3] - box[1]
+        x0 = int(max(0, box[0] - bw * self.margin))
+        y0 = int(max(0, box[1] - bh * self.margin))
+        x1 = int(min(w, box[2] + bw * self.margin))
+        y1 = int(min(h, box[3] + bh * self.margin))
+        return x0, y0, x1, y1
+
+    def _update_detections(self, frame):
+        detections = self.detector.detect(frame)
+        matches, unmatched = match_boxes([t.box for t in self.tracks], detections, self.min_iou)
+        for t, d in matches:
+            self.tracks[t].box = detections[d]
+        for d in unmatched:
+            if len(self.tracks) >= self.max_people:
+                break
+            self.tracks.append(PersonTrack(self.next_id, detections[d], self._acquire_pose()))
+            self.next_id += 1
+
+    def _process_track(self, track, frame_rgb):
+        h, w = frame_rgb.shape[:2]
+        x0, y0, x1, y1 = self._crop_box(track.box, w, h)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+
+        # Recorte reducido a la resolución de inferencia; las coordenadas
+        # normalizadas no cambian al escalar
+        crop = frame_rgb[y0:y1, x0:x1]
+        scale = self.max_side / float(max(x1 - x0, y1 - y0))
+        if scale < 1.0:
+            crop = cv2.resize(crop, (int((x1 - x0) * scale), int((y1 - y0) * scale)),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        results = track.pose.process(crop)
+        if not results.pose_landmarks:
+            return None
+
+        # Ajustar coordenadas del recorte al frame completo (normalizadas)
+        landmarks = pose_to_array(results.pose_landmarks)
+        remap_to_frame(landmarks, x0, y0, x1 - x0, y1 - y0, w, h)
+        box = landmark_bbox(landmarks, w, h)
+        if box is not None:
+            track.box = box
+        return landmarks
+
+    def _drop_duplicates(self):
+        """Si dos tracks convergen sobre la misma persona se queda el más antiguo"""
+        keep = []
+        for track in sorted(self.tracks, key=lambda t: t.track_id):
+            if keep and track.landmarks is not None:
+                iou = box_iou(track.box, [k.box for k in keep])
+                if iou.max() > 0.7:
+                    self._release(track)
+                    continue
+            keep.append(track)
+        self.tracks = keep
+
+    def update(self, frame, frame_rgb=None):
+        """Procesa un frame BGR y devuelve la lista de tracks activos"""
+        if frame_rgb is None:
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # El detector es lo más caro: solo se ejecuta cada detect_interval
+        # frames, también cuando no hay nadie en escena
+        if self.frame_index % self.detect_interval == 0:
+            self._update_detections(frame)
+        self.frame_index += 1
+
+        futures = [self.executor.submit(self._process_track, t, frame_rgb) for t in self.tracks]
+        alive = []
+        for track, future in zip(self.tracks, futures):
+            try:
+                track.landmarks = future.result()
+            except Exception as e:
+                self.log.warning(f"persona {track.track_id}", f"Error al procesar persona {track.track_id}: {e}")
+                track.landmarks = None
+
+            track.age += 1
+            if track.landmarks is None:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    self._release(track)
+                    continue
+            else:
+                track.misses = 0
+            alive.append(track)
+
+        self.tracks = alive
+        self._drop_duplicates()
+        return [t for t in self.tracks if t.landmarks is not None]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for track in self.tracks:
+            self._release(track)
+        self.tracks = []
+        for pose in self.free_poses:
+            pose.close()
+        self.free_poses = []
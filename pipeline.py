@@ -0,0 +1,323 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from metrics import Histogram, RateLimitedLog
+
+# Paquete que viaja entre etapas: índice de frame, instante de captura y la imagen
+FramePacket = namedtuple("FramePacket", ["index", "timestamp", "frame"])
+
+
+def open_capture(source=0, fallback=None, width=None, height=None):
+    """Abre una cámara o un vídeo, probando la alternativa si falla"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened() and fallback is not None:
+        print("Fallo al abrir cámara. Probando con vídeo...")
+        cap = cv2.VideoCapture(fallback)
+    if not cap.isOpened():
+        raise RuntimeError("No se pudo abrir ningún dispositivo")
+
+    if width is not None:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height is not None:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return cap
+
+
+def is_video_file(source):
+    """True si la fuente es un fichero de vídeo (no una cámara ni un stream)"""
+    return isinstance(source, str) and os.path.isfile(source)
+
+
+def is_video_capture(cap):
+    """True si la captura lee de un fichero: las cámaras no informan del nº de frames"""
+    return cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+
+
+def put_latest(q, item, on_drop=None):
+    """Mete un elemento en una cola acotada descartando el más antiguo si está llena.
+
+    Devuelve cuántos elementos se han descartado; on_drop recibe cada uno.
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                old = q.get_nowait()
+                dropped += 1
+                if on_drop is not None:
+                    on_drop(old)
+            except queue.Empty:
+                pass
+
+
+class StageStats:
+    """Contadores de una etapa: elementos procesados, descartes, errores y tiempo ocupado"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.latency = Histogram()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, elapsed, dropped=0):
+        with self._lock:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now - elapsed
+            self.finished = now
+            self.count += 1
+            self.dropped += dropped
+            self.busy_time += elapsed
+            self.latency.observe(1000.0 * elapsed)
+
+    def fps(self):
+        """Rendimiento medido de la etapa (elementos por segundo de reloj)"""
+        if self.started is None or self.finished == self.started:
+            return 0.0
+        return self.count / (self.finished - self.started)
+
+    def mean_ms(self):
+        """Tiempo medio de trabajo por elemento en milisegundos"""
+        if self.count == 0:
+            return 0.0
+        return 1000.0 * self.busy_time / self.count
+
+    def summary(self):
+        return (f"{self.name:<10} {self.count:>6} frames  {self.fps():6.1f} fps  "
+                f"{self.mean_ms():7.2f} ms/frame  p95 {self.latency.quantile(0.95):5.0f} ms  "
+                f"{self.dropped:>5} descartados")
+
+
+class CaptureThread(threading.Thread):
+    """Hilo que lee frames continuamente y deja solo el más reciente en la cola.
+
+    Con free_frames (una cola de frames ya usados) cada lectura reutiliza uno
+    de esos buffers en lugar de reservar un frame nuevo.
+    """
+
+    def __init__(self, cap, out_queue, stop_event, drop_frames=True, realtime=False,
+                 free_frames=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.drop_frames = drop_frames
+        self.free_frames = free_frames
+        self.stats = StageStats("captura")
+
+        # Con vídeo grabado se puede respetar la cadencia original
+        self.frame_interval = 0.0
+        if realtime:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            if fps and fps > 0:
+                self.frame_interval = 1.0 / fps
+
+    def run(self):
+        index = 0
+        next_time = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                ret, frame = self.cap.read(self._free_frame())
+                if not ret:
+                    break
+
+                packet = FramePacket(index, time.time(), frame)
+                index += 1
+
+                dropped = 0
+                if self.drop_frames:
+                    dropped = put_latest(self.out_queue, packet, self.recycle)
+                else:
+                    while not self.stop_event.is_set():
+                        try:
+                            self.out_queue.put(packet, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                self.stats.add(time.perf_counter() - start, dropped)
+
+                if self.frame_interval:
+                    next_time += self.frame_interval
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            # Marca de fin de flujo para las etapas siguientes
+            self._put_end()
+
+    def _free_frame(self):
+        if self.free_frames is None:
+            return None
+        try:
+            return self.free_frames.get_nowait()
+        except queue.Empty:
+            return None
+
+    def recycle(self, packet):
+        """Devuelve el frame de un FramePacket ya consumido o descartado para reutilizarlo"""
+        if self.free_frames is not None and packet is not None:
+            self.free_frames.put(packet.frame)
+
+    def _put_end(self):
+        while True:
+            try:
+                self.out_queue.put(None, timeout=0.1)
+                return
+            except queue.Full:
+                if self.stop_event.is_set():
+                    put_latest(self.out_queue, None)
+                    return
+
+
+class TrackingPipeline:
+    """Pipeline captura -> inferencia -> render unido por colas acotadas.
+
+    La captura y la inferencia corren en hilos propios; el render se ejecuta en
+    el hilo que llama a run() porque cv2.imshow debe usarse desde el hilo
+    principal. Con drop_frames=True cada cola guarda solo el último elemento,
+    así la inferencia siempre trabaja sobre el frame más nuevo.
+
+    infer(frame) devuelve los resultados del modelo y render(frame, results)
+    devuelve la imagen a mostrar. Con reuse_frames los frames de captura se
+    reciclan tras el render (o al descartarse), así que infer y render no
+    deben guardarlos más allá de su llamada. Del mismo modo, release(results)
+    se llama cuando unos resultados ya se han dibujado o se han descartado,
+    para devolver a su lista de libres los buffers rotatorios que usen
+    (LandmarkBuffers, FramePreprocessor con slots > 1).
+
+    Con realtime=None los ficheros de vídeo se leen a su cadencia original;
+    si no, la captura los decodificaría tan rápido como pudiera y casi todos
+    los frames se descartarían antes de llegar a la inferencia.
+    """
+
+    def __init__(self, cap, infer, render, window=None, queue_size=1,
+                 drop_frames=True, realtime=None, max_frames=None, reuse_frames=False,
+                 release=None):
+        self.cap = cap
+        self.infer = infer
+        self.render = render
+        self.release = release
+        self.window = window
+        self.drop_frames = drop_frames
+        self.max_frames = max_frames
+
+        if realtime is None:
+            realtime = drop_frames and is_video_capture(cap)
+
+        self.stop_event = threading.Event()
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+        self.capture = CaptureThread(cap, self.frame_queue, self.stop_event,
+                                     drop_frames=drop_frames, realtime=realtime,
+                                     free_frames=queue.Queue() if reuse_frames else None)
+        self.inference_stats = StageStats("inferencia")
+        self.render_stats = StageStats("render")
+        self.log = RateLimitedLog()
+
+    def _inference_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    packet = self.frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if packet is None:
+                    break
+
+                start = time.perf_counter()
+                try:
+                    results = self.infer(packet.frame)
+                except Exception as e:
+                    self.inference_stats.errors += 1
+                    self.log.warning("inferencia", f"Error en inferencia: {e}")
+                    self.capture.recycle(packet)
+                    continue
+
+                item = (packet, results)
+                dropped = 0
+                if self.drop_frames:
+                    dropped = put_latest(self.result_queue, item, self._discard)
+                else:
+                    self._put_blocking(self.result_queue, item)
+                self.inference_stats.add(time.perf_counter() - start, dropped)
+        finally:
+            self._put_blocking(self.result_queue, None)
+
+    def _discard(self, item):
+        """Recicla el frame y devuelve los buffers de un resultado que no se va a dibujar"""
+        if item is None:
+            return
+        packet, results = item
+        self.capture.recycle(packet)
+        if self.release is not None:
+            self.release(results)
+
+    def _put_blocking(self, q, item):
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        put_latest(q, item)
+
+    def run(self):
+        """Arranca las etapas y renderiza hasta fin de vídeo o 'q'/ESC"""
+        inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+        self.capture.start()
+        inference_thread.start()
+
+        try:
+            while True:
+                try:
+                    item = self.result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if not inference_thread.is_alive():
+                        break
+                    continue
+                if item is None:
+                    break
+
+                packet, results = item
+                start = time.perf_counter()
+                try:
+                    frame = self.render(packet.frame, results)
+                    if self.window is not None and frame is not None:
+                        cv2.imshow(self.window, frame)
+                except Exception as e:
+                    self.render_stats.errors += 1
+                    self.log.warning("render", f"Error en frame: {e}")
+                self._discard(item)
+                self.render_stats.add(time.perf_counter() - start)
+
+                if self.window is not None:
+                    key = cv2.waitKey(1) & 0xFF
+                    if key == 27 or key == ord('q'):
+                        break
+                if self.max_frames is not None and self.render_stats.count >= self.max_frames:
+                    break
+        finally:
+            self.stop_event.set()
+            self.capture.join(timeout=1.0)
+            inference_thread.join(timeout=1.0)
+
+    def stats(self):
+        return [self.capture.stats, self.inference_stats, self.render_stats]
+
+    def print_stats(self):
+        for stage in self.stats():
+            print(stage.summary())
@@ -0,0 +1,80 @@
+"""Preproceso de frames sin reservas de memoria por frame.
+
+FramePreprocessor es dueño de los buffers BGR (espejo opcional) y RGB y los
+rellena con salidas dst= de OpenCV: volteo en el buffer BGR y conversión a
+RGB en el buffer RGB, sin copias intermedias. MediaPipe recibe una vista de
+solo lectura del RGB y el dibujo se hace sobre el BGR, así que no hace falta
+volver a convertir para mostrar el frame.
+
+    prep = FramePreprocessor(mirror=True)
+    ok, raw = cap.read(raw)           # también reutiliza el buffer de captura
+    bgr, rgb = prep.process(raw)
+    results = hands.process(rgb)
+    render_hands(bgr, ...)
+"""
+import queue
+
+import cv2
+import numpy as np
+
+
+class FramePreprocessor:
+    """Buffers BGR/RGB reutilizados entre frames.
+
+    Con slots > 1 hay varios juegos de buffers, de modo que una etapa puede
+    seguir dibujando el frame anterior mientras otra prepara el siguiente.
+    Igual que en LandmarkBuffers, process toma un juego libre (self.slot) y
+    hay que devolverlo con release(slot) cuando se termina de dibujar. Los
+    buffers se reservan de nuevo solo si cambia la resolución.
+    """
+
+    def __init__(self, mirror=False, slots=1):
+        self.mirror = mirror
+        self.slots = slots
+        self.slot = 0
+        self.free_slots = queue.Queue()
+        for slot in range(slots if slots > 1 else 0):
+            self.free_slots.put(slot)
+        self.shape = None
+        self.bgr_slots = []
+        self.rgb_slots = []
+        self.rgb_views = []
+
+    def _allocate(self, shape):
+        self.shape = shape
+        self.bgr_slots = [np.empty(shape, np.uint8) for _ in range(self.slots)] if self.mirror else []
+        self.rgb_slots = [np.empty(shape, np.uint8) for _ in range(self.slots)]
+        self.rgb_views = []
+        for rgb in self.rgb_slots:
+            view = rgb.view()
+            view.flags.writeable = False
+            self.rgb_views.append(view)
+
+    def process(self, frame):
+        """Devuelve (bgr, rgb): BGR para dibujar (volteado si mirror) y RGB de solo lectura.
+
+        Sin mirror el BGR es el propio frame de entrada.
+        """
+        if self.slots > 1:
+            self.slot = self.free_slots.get()
+        try:
+            # Con otra resolución los juegos que aún se dibujan conservan sus arrays
+            if frame.shape != self.shape:
+                self._allocate(frame.shape)
+            bgr = frame
+            if self.mirror:
+                bgr = cv2.flip(frame, 1, dst=self.bgr_slots[self.slot])
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self.rgb_slots[self.slot])
+        except Exception:
+            self.release(self.slot)
+            raise
+        return bgr, self.rgb_views[self.slot]
+
+    def release(self, slot):
+        """Devuelve a la lista de libres un juego que ya se ha dibujado"""
+        if self.slots > 1:
+            self.free_slots.put(slot)
+
+    def rgb(self, frame):
+        """Solo la vista RGB de solo lectura del frame"""
+        return self.process(frame)[1]
@@ -0,0 +1,117 @@
+"""Funciones de dibujo compartidas por los scripts de tracking y el replay.
+
+Trabajan sobre los arrays de landmark_arrays y no dependen de MediaPipe, así
+que se pueden ejecutar con landmarks grabados sin cargar ningún modelo.
+"""
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from hud import blend_patch, draw_text
+from landmark_arrays import HAND_CONNECTIONS, POSE_CONNECTIONS, draw_skeleton, to_pixels, visible_mask
+
+# Paleta de colores estilo videojuego
+HUESO_COLOR = (0, 255, 255)  # Amarillo neón para huesos
+ARTICULACION_COLOR = (255, 0, 255)  # Magenta neón para articulaciones
+GROSOR_HUESOS = 5  # Grosor de las líneas de conexión
+TAMANO_ARTICULACIONES = 8  # Tamaño de los círculos de las articulaciones
+
+
+def render_normal(frame, poses):
+    """Esqueleto estándar con articulaciones verdes"""
+    for landmarks in poses:
+        draw_skeleton(frame, landmarks, POSE_CONNECTIONS, joint_color=(0, 255, 0))
+    return frame
+
+
+# Estilos predefinidos para render_stylish
+GlowStyle = namedtuple("GlowStyle", [
+    "bone_color", "joint_color", "bone_thickness", "joint_radius",
+    "draw_joints", "glow_color", "glow_radius", "glow_strength",
+])
+
+STYLES = {
+    "neon": GlowStyle(HUESO_COLOR, ARTICULACION_COLOR, GROSOR_HUESOS, TAMANO_ARTICULACIONES,
+                      True, (255, 255, 255), TAMANO_ARTICULACIONES + 5, 0.3),
+    "skeleton": GlowStyle(HUESO_COLOR, ARTICULACION_COLOR, GROSOR_HUESOS, 0,
+                          False, None, 0, 0.0),
+    "minimal": GlowStyle((255, 255, 255), HUESO_COLOR, 2, 3,
+                         True, None, 0, 0.0),
+}
+
+# Sprites de brillo ya calculados por (color, radio, intensidad)
+_GLOW_SPRITES = {}
+
+
+def glow_sprite(color, radius, strength):
+    """Devuelve (1 - alpha, color * alpha) en punto fijo (x256) para un brillo circular.
+
+    Se calcula una sola vez por combinación: un disco con el borde suavizado
+    cuya opacidad máxima es strength.
+    """
+    key = (tuple(color), radius, strength)
+    sprite = _GLOW_SPRITES.get(key)
+    if sprite is None:
+        pad = max(2, radius // 4)
+        size = 2 * (radius + pad) + 1
+        center = radius + pad
+        disc = np.zeros((size, size), np.float32)
+        cv2.circle(disc, (center, center), radius, 1.0, -1, cv2.LINE_AA)
+        disc = cv2.GaussianBlur(disc, (0, 0), pad / 2.0)
+        alpha = (disc * strength * 256.0).round()
+        inverse = (256.0 - alpha).astype(np.uint16)[..., None]
+        premultiplied = (alpha[..., None] * np.asarray(color, np.float32)).round().astype(np.uint16)
+        sprite = _GLOW_SPRITES[key] = (inverse, premultiplied, center)
+    return sprite
+
+
+def blend_glow(frame, points, sprite):
+    """Mezcla el sprite en parches pequeños alrededor de cada punto (in situ)"""
+    inverse, premultiplied, center = sprite
+    for x, y in points:
+        blend_patch(frame, x - center, y - center, inverse, premultiplied)
+    return frame
+
+
+def render_stylish(frame, poses, style="neon"):
+    """Esqueleto neón con brillo en las articulaciones y rótulo de modo.
+
+    El brillo se mezcla solo en parches alrededor de las articulaciones, así
+    el coste depende del número de articulaciones y no de la resolución.
+    """
+    preset = STYLES[style]
+    h, w = frame.shape[:2]
+    sprite = None
+    if preset.glow_color is not None:
+        sprite = glow_sprite(preset.glow_color, preset.glow_radius, preset.glow_strength)
+
+    for landmarks in poses:
+        # Dibujar conexiones óseas (huesos) y articulaciones
+        draw_skeleton(
+            frame,
+            landmarks,
+            POSE_CONNECTIONS,
+            joint_color=preset.joint_color,
+            joint_thickness=preset.joint_radius,
+            joint_radius=preset.joint_radius,
+            bone_color=preset.bone_color,
+            bone_thickness=preset.bone_thickness,
+            draw_joints=preset.draw_joints
+        )
+
+        # Efecto adicional: brillo en articulaciones
+        if sprite is not None:
+            blend_glow(frame, to_pixels(landmarks, w, h)[visible_mask(landmarks)].tolist(), sprite)
+
+    # Mostrar FPS (opcional)
+    draw_text(frame, "Modo: VIDEOJUEGO | Q: Salir", (10, 30),
+              cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return frame
+
+
+def render_hands(frame, hands):
+    """Manos con el estilo por defecto de MediaPipe"""
+    for points in hands:
+        draw_skeleton(frame, points, HAND_CONNECTIONS)
+    return frame
@@ -0,0 +1,207 @@
+"""Reproducción de grabaciones de landmarks sin ejecutar MediaPipe.
+
+Lee una grabación de landmark_recording y la pasa por los mismos caminos de
+dibujo (renderers) y de envío UDP (landmark_protocol) que los scripts en vivo.
+Sirve para generar carga determinista y barata contra los consumidores UDP o
+para medir el coste del dibujo sin cámara, por ejemplo en CI.
+
+    python replay.py sesion --speed 2 --render stylish --udp localhost:9999
+    python replay.py sesion --speed 0 --render normal --headless   # lo más rápido posible
+"""
+import argparse
+import time
+from collections import namedtuple
+from functools import partial
+
+import cv2
+import numpy as np
+
+from landmark_protocol import HANDEDNESS_NAMES, LandmarkSender, encode_legacy_json
+from landmark_recording import LandmarkRecording, split_records
+from pipeline import StageStats
+from renderers import render_hands, render_normal, render_stylish
+
+RENDERERS = {
+    "normal": render_normal,
+    "stylish": render_stylish,
+    "skeleton": partial(render_stylish, style="skeleton"),
+    "minimal": partial(render_stylish, style="minimal"),
+}
+
+ReplayFrame = namedtuple(
+    "ReplayFrame", ["frame_index", "timestamp", "poses", "person_ids", "hands", "handedness"]
+)
+
+
+def make_background(width, height, mode="black", seed=0):
+    """Fondo sintético reutilizable: black, gradient o noise"""
+    if mode == "black":
+        return np.zeros((height, width, 3), dtype=np.uint8)
+    if mode == "gradient":
+        row = np.linspace(0, 255, width, dtype=np.uint8)
+        background = np.empty((height, width, 3), dtype=np.uint8)
+        background[:] = row[None, :, None]
+        return background
+    if mode == "noise":
+        rng = np.random.default_rng(seed)
+        return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    raise ValueError(f"Fondo desconocido: {mode}")
+
+
+class ReplaySource:
+    """Itera los frames de una grabación respetando la velocidad pedida.
+
+    speed=1 reproduce en tiempo real, speed=N a N veces la velocidad original
+    y speed=0 (o None) tan rápido como sea posible.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, start_time=None, end_time=None):
+        self.recording = LandmarkRecording(path)
+        self.speed = speed
+        self.loop = loop
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def _frame_range(self):
+        index = self.recording.index
+        start, stop = 0, len(index)
+        if self.start_time is not None:
+            start = int(np.searchsorted(index["timestamp"], self.start_time))
+        if self.end_time is not None:
+            stop = int(np.searchsorted(index["timestamp"], self.end_time))
+        return start, stop
+
+    def __iter__(self):
+        while True:
+            self.recording.refresh()
+            start, stop = self._frame_range()
+            index = self.recording.index
+            if start >= stop:
+                return
+
+            t0 = float(index[start]["timestamp"])
+            wall0 = time.perf_counter()
+            for pos in range(start, stop):
+                entry = index[pos]
+                if self.speed:
+                    due = wall0 + (float(entry["timestamp"]) - t0) / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                first = int(entry["first_record"])
+                records = self.recording.records[first:first + int(entry["count"])]
+                poses, person_ids, hands, handedness = split_records(records)
+                yield ReplayFrame(int(entry["frame_index"]), float(entry["timestamp"]),
+                                  poses, person_ids, hands,
+                                  [HANDEDNESS_NAMES.get(c, "unknown") for c in handedness.tolist()])
+
+            if not self.loop:
+                return
+
+
+class ReplayRunner:
+    """Pasa cada frame reproducido por dibujo y/o envío UDP y mide cada etapa"""
+
+    def __init__(self, source, render=None, sender=None, legacy_json=False,
+                 background=None, window=None):
+        self.source = source
+        self.render = render
+        self.sender = sender
+        self.legacy_json = legacy_json
+        self.background = background
+        self.window = window
+        self.canvas = None if background is None else np.empty_like(background)
+        self.draw_stats = StageStats("dibujo")
+        self.send_stats = StageStats("envío")
+        self.frame_stats = StageStats("frames")
+
+    def run(self, max_frames=None):
+        for frame in self.source:
+            start = time.perf_counter()
+
+            if self.render is not None and self.canvas is not None:
+                t = time.perf_counter()
+                np.copyto(self.canvas, self.background)
+                image = self.render(self.canvas, frame.poses)
+                if len(frame.hands):
+                    image = render_hands(image, frame.hands)
+                self.draw_stats.add(time.perf_counter() - t)
+
+                if self.window is not None:
+                    cv2.imshow(self.window, image)
+                    if cv2.waitKey(1) & 0xFF in (27, ord('q')):
+                        break
+
+            if self.sender is not None:
+                t = time.perf_counter()
+                try:
+                    if self.legacy_json:
+                        self.sender.sock.sendto(encode_legacy_json(frame.hands, frame.handedness),
+                                                self.sender.address)
+                    else:
+                        self.sender.send(time.time(), frame.hands, frame.handedness,
+                                         frame.poses, frame.person_ids)
+                except Exception as e:
+                    print(f"Error enviando datos: {e}")
+                self.send_stats.add(time.perf_counter() - t)
+
+            self.frame_stats.add(time.perf_counter() - start)
+            if max_frames is not None and self.frame_stats.count >= max_frames:
+                break
+
+    def print_stats(self):
+        for stage in (self.frame_stats, self.draw_stats, self.send_stats):
+            if stage.count:
+                print(stage.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce landmarks grabados sin MediaPipe")
+    parser.add_argument("recording", help="Ruta de la grabación (.lmrec o ruta base)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 = tiempo real, N = N veces más rápido, 0 = lo más rápido posible")
+    parser.add_argument("--loop", action="store_true")
+    parser.add_argument("--render", choices=sorted(RENDERERS), default=None)
+    parser.add_argument("--background", choices=("black", "gradient", "noise"), default="black")
+    parser.add_argument("--size", default="1280x720", help="Tamaño del fondo sintético")
+    parser.add_argument("--headless", action="store_true", help="Dibujar sin mostrar ventana")
+    parser.add_argument("--udp", default=None, help="Destino host:puerto")
+    parser.add_argument("--legacy-json", action="store_true")
+    parser.add_argument("--quantized", action="store_true")
+    parser.add_argument("--max-frames", type=int, default=None)
+    args = parser.parse_args()
+
+    background = None
+    if args.render:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        background = make_background(width, height, args.background)
+
+    sender = None
+    if args.udp:
+        host, port = args.udp.rsplit(":", 1)
+        sender = LandmarkSender((host, int(port)), quantized=args.quantized)
+
+    source = ReplaySource(args.recording, speed=args.speed, loop=args.loop)
+    runner = ReplayRunner(
+        source,
+        render=RENDERERS[args.render] if args.render else None,
+        sender=sender,
+        legacy_json=args.legacy_json,
+        background=background,
+        window=None if args.headless or not args.render else "Replay",
+    )
+    try:
+        runner.run(max_frames=args.max_frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sender is not None:
+            sender.close()
+        if runner.window is not None:
+            cv2.destroyAllWindows()
+        runner.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Banco de filtros One-Euro para landmarks, vectorizado sobre todas las pistas.
+
+Un único conjunto de arrays (pistas, puntos, dims) filtra en cada frame todos
+los landmarks de todas las personas o manos seguidas con unas pocas
+operaciones NumPy. El suavizado es independiente de la instancia de
+MediaPipe, así que sigue funcionando cuando los modelos se comparten o se
+cambian (MultiPersonPoseTracker, AdaptivePoseEstimator) y permite usar
+model_complexity=0 con smooth_landmarks=False sin que el esqueleto tiemble.
+
+Filtro One-Euro (Casiez et al.): la frecuencia de corte crece con la
+velocidad, así que en reposo se suaviza mucho y en movimientos rápidos casi
+no hay retardo. min_cutoff y beta se pueden ajustar por articulación.
+
+    smoother = pose_smoother()
+    smoother.filter(ids, poses, timestamp, out=poses)
+"""
+import math
+
+import numpy as np
+
+from landmark_arrays import VISIBILITY_THRESHOLD
+from landmark_protocol import HAND_LANDMARKS, POSE_LANDMARKS
+from motion_analytics import TrackSlots
+
+# Articulaciones de Pose que se mueven rápido (muñecas, manos, tobillos y pies):
+# corte mínimo más alto para que no se queden atrás
+POSE_FAST_JOINTS = (15, 16, 17, 18, 19, 20, 21, 22, 27, 28, 29, 30, 31, 32)
+
+# Ajustes (min_cutoff Hz, beta) para benchmark y scripts
+PRESETS = {
+    "light": (1.5, 50.0),
+    "medium": (0.8, 20.0),
+    "strong": (0.3, 5.0),
+}
+
+
+def smoothing_alpha(cutoff, dt):
+    """Factor de suavizado exponencial para una frecuencia de corte y un paso dt"""
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroBank:
+    """Filtros One-Euro para (pistas, puntos, dims) actualizados de una vez.
+
+    min_cutoff y beta son escalares o arrays por punto. Los frames perdidos
+    se tratan con el dt real entre muestras y, tras reset_after segundos sin
+    ver una pista, se reinicia su filtro. En los frames predichos
+    (frame_skip) se filtra la posición pero no se actualiza la derivada, que
+    saldría de la propia extrapolación. Los puntos con visibilidad por debajo
+    de threshold conservan su último valor filtrado.
+    """
+
+    def __init__(self, num_points, max_tracks=4, dims=3, min_cutoff=0.8, beta=20.0, d_cutoff=1.0,
+                 max_misses=10, reset_after=0.5, threshold=VISIBILITY_THRESHOLD, default_dt=1.0 / 30):
+        self.dims = dims
+        self.min_cutoff = np.broadcast_to(np.asarray(min_cutoff, np.float64), (num_points,)).copy()
+        self.beta = np.broadcast_to(np.asarray(beta, np.float64), (num_points,)).copy()
+        self.d_cutoff = d_cutoff
+        self.reset_after = reset_after
+        self.threshold = threshold
+        self.default_dt = default_dt
+        self.tracks = TrackSlots(max_tracks, max_misses)
+
+        self.value = np.zeros((max_tracks, num_points, dims))
+        self.derivative = np.zeros((max_tracks, num_points, dims))
+        self.last_time = np.zeros(max_tracks)
+        self.started = np.zeros(max_tracks, dtype=bool)
+
+    def reset(self, slot=None):
+        if slot is None:
+            self.started[:] = False
+        else:
+            self.started[slot] = False
+
+    def filter(self, ids, points, timestamp, predicted=False, out=None):
+        """Filtra los puntos (n, P, >=dims) de las pistas ids; devuelve out (copia si None).
+
+        Las columnas a partir de dims (visibilidad) se copian sin filtrar.
+        """
+        points = np.asarray(points, dtype=np.float32)
+        if out is None:
+            out = points.copy()
+        elif out is not points:
+            np.copyto(out, points)
+        slots, new = self.tracks.assign([int(i) for i in ids])
+        for slot in new:
+            self.started[slot] = False
+        rows = np.flatnonzero(slots >= 0)
+        if not len(rows):
+            return out
+        sl = slots[rows]
+        x = points[rows, :, :self.dims].astype(np.float64)
+
+        dt = timestamp - self.last_time[sl]
+        fresh = ~self.started[sl] | (dt > self.reset_after)
+        dt = np.where(dt > 0, dt, self.default_dt)[:, None, None]
+        self.last_time[sl] = timestamp
+
+        value = self.value[sl]
+        derivative = self.derivative[sl]
+        if not predicted:
+            alpha_d = smoothing_alpha(self.d_cutoff, dt)
+            derivative = derivative + alpha_d * ((x - value) / dt - derivative)
+
+        # Corte por punto según la velocidad filtrada: más velocidad, menos retardo
+        speed = np.linalg.norm(derivative, axis=-1, keepdims=True)
+        cutoff = self.min_cutoff[None, :, None] + self.beta[None, :, None] * speed
+        alpha = smoothing_alpha(cutoff, dt)
+        filtered = value + alpha * (x - value)
+
+        # Puntos poco visibles: se mantiene el último valor filtrado
+        if points.shape[-1] > self.dims and self.threshold is not None:
+            hidden = (points[rows, :, self.dims] < self.threshold)[..., None]
+            filtered = np.where(hidden & ~fresh[:, None, None], value, filtered)
+            derivative = np.where(hidden, self.derivative[sl], derivative)
+
+        # Pista nueva o vuelta tras mucho tiempo: se parte de la medida
+        filtered[fresh] = x[fresh]
+        derivative[fresh] = 0.0
+        self.value[sl] = filtered
+        self.derivative[sl] = derivative
+        self.started[sl] = True
+        out[rows, :, :self.dims] = filtered
+        return out
+
+
+def pose_smoother(max_people=4, preset="medium", **options):
+    """Banco para cuerpos (personas, 33, 4) con corte más alto en extremidades"""
+    min_cutoff, beta = PRESETS[preset]
+    cutoffs = np.full(POSE_LANDMARKS, min_cutoff)
+    cutoffs[list(POSE_FAST_JOINTS)] *= 2.0
+    options.setdefault("min_cutoff", cutoffs)
+    options.setdefault("beta", beta)
+    return OneEuroBank(POSE_LANDMARKS, max_tracks=max_people, **options)
+
+
+def hand_smoother(max_hands=8, preset="light", **options):
+    """Banco para manos (manos, 21, 3); las manos se mueven rápido: ajuste ligero"""
+    min_cutoff, beta = PRESETS[preset]
+    options.setdefault("min_cutoff", min_cutoff)
+    options.setdefault("beta", beta)
+    return OneEuroBank(HAND_LANDMARKS, max_tracks=max_hands, **options)
+
+
+def jitter_and_lag(raw, smoothed, frame_interval, max_shift=15):
+    """Temblor y retardo de una serie de landmarks (frames, puntos, dims).
+
+    El temblor es la media del módulo de la segunda diferencia (aceleración
+    de frame a frame); el retardo es el desplazamiento temporal que mejor
+    alinea la serie suavizada con la original, en milisegundos.
+    """
+    raw = np.asarray(raw, np.float64)
+    smoothed = np.asarray(smoothed, np.float64)
+    if len(raw) < 3 or not np.isfinite(raw).any():
+        return None, None
+    # Los frames sin detección van como NaN y no cuentan
+    jitter = np.nanmean(np.linalg.norm(np.diff(smoothed, n=2, axis=0), axis=-1))
+    if not np.isfinite(jitter):
+        return None, None
+    errors = []
+    for shift in range(min(max_shift, len(raw) - 2) + 1):
+        diff = smoothed[shift:] - raw[:len(raw) - shift]
+        error = np.linalg.norm(diff, axis=-1)
+        errors.append(np.nanmean(error) if np.isfinite(error).any() else np.inf)
+    return float(jitter), float(np.argmin(errors) * frame_interval * 1000.0)
@@ -0,0 +1,420 @@
+"""Reconocimiento de voz solapado: captura continua, segmentación y pool de reconocedores.
+
+La captura escribe sin pausa en un buffer circular de audio; un detector de
+actividad de voz por energía corta frases y cada frase se reconoce en un pool
+de hilos, de modo que la captura nunca espera al reconocimiento. Los textos
+se entregan en el orden en que se dijeron, con sus instantes y su latencia.
+
+El motor de reconocimiento es intercambiable (Google, Sphinx sin conexión o
+un stub para pruebas) y la entrada puede ser el micrófono o un fichero WAV.
+
+    python speech_pipeline.py frase.wav --backend stub --workers 3
+    python speech_pipeline.py --backend google          # micrófono
+"""
+import argparse
+import queue
+import threading
+import time
+import wave
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+SpeechSegment = namedtuple("SpeechSegment", ["seq", "start_sample", "end_sample"])
+Transcript = namedtuple("Transcript", ["seq", "text", "start_time", "end_time", "latency"])
+
+
+class AudioRingBuffer:
+    """Buffer circular de muestras int16 direccionado por índice absoluto de muestra"""
+
+    def __init__(self, seconds=30.0, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.data = np.zeros(int(seconds * sample_rate), dtype=np.int16)
+        self.written = 0
+        self._lock = threading.Lock()
+
+    def write(self, samples):
+        size = len(self.data)
+        samples = samples[-size:]
+        with self._lock:
+            start = self.written % size
+            first = min(len(samples), size - start)
+            self.data[start:start + first] = samples[:first]
+            self.data[:len(samples) - first] = samples[first:]
+            self.written += len(samples)
+
+    def read(self, start, end):
+        """Copia de las muestras [start, end); ValueError si ya se han sobrescrito"""
+        size = len(self.data)
+        with self._lock:
+            if start < self.written - size or end > self.written:
+                raise ValueError("Muestras fuera del buffer")
+            index = np.arange(start, end) % size
+            return self.data[index]
+
+
+class MicrophoneSource:
+    """Micrófono vía speech_recognition (PyAudio), en bloques int16 mono"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk=1024):
+        import speech_recognition as sr
+
+        self.sample_rate = sample_rate
+        self.chunk = chunk
+        self.microphone = sr.Microphone(sample_rate=sample_rate, chunk_size=chunk)
+        self.stream = None
+
+    def open(self):
+        self.stream = self.microphone.__enter__().stream
+        return self
+
+    def read(self):
+        return np.frombuffer(self.stream.read(self.chunk), dtype=np.int16)
+
+    def close(self):
+        if self.stream is not None:
+            self.microphone.__exit__(None, None, None)
+            self.stream = None
+
+
+class WavFileSource:
+    """Fichero WAV PCM 16 bits como si fuera un micrófono (en tiempo real o de golpe)"""
+
+    def __init__(self, path, chunk=1024, realtime=True):
+        self.path = path
+        self.chunk = chunk
+        self.realtime = realtime
+        self.wav = None
+        self.sample_rate = None
+
+    def open(self):
+        self.wav = wave.open(self.path, "rb")
+        if self.wav.getsampwidth() != 2:
+            raise ValueError("Solo se admiten WAV PCM de 16 bits")
+        self.sample_rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+        self._next_time = time.perf_counter()
+        return self
+
+    def read(self):
+        data = self.wav.readframes(self.chunk)
+        if not data:
+            return None
+        samples = np.frombuffer(data, dtype=np.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1).astype(np.int16)
+        if self.realtime:
+            self._next_time += len(samples) / self.sample_rate
+            delay = self._next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return samples
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+
+class EnergySegmenter:
+    """Detector de actividad de voz por energía en ventanas de frame_ms.
+
+    El umbral se calibra con el ruido de los primeros calibration_ms (como
+    adjust_for_ambient_noise) y sigue al ruido de fondo durante los silencios.
+    Una frase termina tras max_silence_ms de silencio o al llegar a
+    max_segment_ms; las de menos de min_speech_ms se descartan.
+    """
+
+    def __init__(self, sample_rate, frame_ms=30, factor=3.0, min_energy=300.0,
+                 calibration_ms=500, min_speech_ms=100, max_silence_ms=500,
+                 max_segment_ms=4000, pad_ms=150):
+        self.frame = int(sample_rate * frame_ms / 1000)
+
+        def ms(value):
+            return int(value / frame_ms)
+
+        self.factor = factor
+        self.min_energy = min_energy
+        self.calibration_frames = ms(calibration_ms)
+        self.min_speech_frames = max(1, ms(min_speech_ms))
+        self.max_silence_frames = max(1, ms(max_silence_ms))
+        self.max_segment_frames = max(1, ms(max_segment_ms))
+        self.pad = int(sample_rate * pad_ms / 1000)
+
+        self.noise = None
+        self.position = 0  # índice absoluto de la siguiente muestra
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.speech_start = None
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.frames_seen = 0
+        self.seq = 0
+
+    def _close(self, end):
+        segment = None
+        if self.speech_frames >= self.min_speech_frames:
+            segment = SpeechSegment(self.seq, max(0, self.speech_start - self.pad), end)
+            self.seq += 1
+        self.speech_start = None
+        self.speech_frames = self.silence_frames = 0
+        return segment
+
+    def feed(self, samples):
+        """Procesa un bloque de audio y devuelve las frases que se han cerrado"""
+        data = np.concatenate((self.pending, samples)) if len(self.pending) else samples
+        count = len(data) // self.frame
+        self.pending = data[count * self.frame:]
+        if count == 0:
+            return []
+
+        # Energía RMS de todas las ventanas del bloque de una vez
+        frames = data[:count * self.frame].reshape(count, self.frame).astype(np.float32)
+        energy = np.sqrt((frames * frames).mean(axis=1))
+
+        segments = []
+        for value in energy.tolist():
+            start = self.position
+            self.position += self.frame
+            self.frames_seen += 1
+            if self.frames_seen <= self.calibration_frames:
+                self.noise = value if self.noise is None else 0.9 * self.noise + 0.1 * value
+                continue
+            threshold = max(self.min_energy, self.factor * (self.noise or 0.0))
+
+            if value > threshold:
+                if self.speech_start is None:
+                    self.speech_start = start
+                self.speech_frames += 1
+                self.silence_frames = 0
+            elif self.speech_start is not None:
+                self.silence_frames += 1
+            else:
+                self.noise = value if self.noise is None else 0.95 * self.noise + 0.05 * value
+
+            if self.speech_start is not None:
+                length = (self.position - self.speech_start) // self.frame
+                if self.silence_frames >= self.max_silence_frames:
+                    segment = self._close(self.position - self.silence_frames * self.frame + self.pad)
+                elif length >= self.max_segment_frames:
+                    segment = self._close(self.position)
+                else:
+                    continue
+                if segment is not None:
+                    segments.append(segment)
+        return segments
+
+    def flush(self):
+        """Cierra la frase en curso al terminar la entrada"""
+        if self.speech_start is None:
+            return []
+        segment = self._close(self.position)
+        return [segment] if segment is not None else []
+
+
+class GoogleBackend:
+    """recognize_google de speech_recognition (requiere conexión)"""
+
+    def __init__(self, language="es-ES"):
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, samples, sample_rate):
+        audio = self.sr.AudioData(samples.tobytes(), sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class SphinxBackend(GoogleBackend):
+    """recognize_sphinx, sin conexión (requiere pocketsphinx)"""
+
+    def recognize(self, samples, sample_rate):
+        audio = self.sr.AudioData(samples.tobytes(), sample_rate, 2)
+        try:
+            return self.recognizer.recognize_sphinx(audio, language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class StubBackend:
+    """Motor de prueba: devuelve textos fijos (o la duración) tras un retardo simulado"""
+
+    def __init__(self, texts=None, delay=0.0):
+        self.texts = list(texts) if texts else None
+        self.delay = delay
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def recognize(self, samples, sample_rate):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            index = self._count
+            self._count += 1
+        if self.texts:
+            return self.texts[index % len(self.texts)]
+        return f"frase de {len(samples) / sample_rate:.1f} s"
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "sphinx": SphinxBackend,
+    "stub": StubBackend,
+}
+
+
+class SpeechPipeline:
+    """Captura -> segmentación -> reconocimiento en paralelo -> resultados en orden.
+
+    Los resultados (Transcript) se leen de self.results o llegan a on_result
+    desde el hilo de entrega. La latencia se mide desde que se cierra la frase
+    hasta que su texto está disponible.
+    """
+
+    def __init__(self, source, backend, workers=3, on_result=None, ring_seconds=30.0,
+                 segmenter_options=None):
+        self.source = source
+        self.backend = backend
+        self.workers = workers
+        self.on_result = on_result
+        self.ring_seconds = ring_seconds
+        self.segmenter_options = segmenter_options or {}
+        self.results = queue.Queue()
+        self.running = False
+        self.errors = 0
+        self._pending = deque()
+        self._pending_ready = threading.Condition()
+        self._executor = None
+        self._threads = []
+        self._capture_done = threading.Event()
+
+    def start(self):
+        self.source.open()
+        self.ring = AudioRingBuffer(self.ring_seconds, self.source.sample_rate)
+        self.segmenter = EnergySegmenter(self.source.sample_rate, **self.segmenter_options)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.start_time = time.time()
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._deliver_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _sample_time(self, sample):
+        return self.start_time + sample / self.source.sample_rate
+
+    def _recognize(self, segment):
+        samples = self.ring.read(segment.start_sample, segment.end_sample)
+        return self.backend.recognize(samples, self.source.sample_rate)
+
+    def _submit(self, segments):
+        for segment in segments:
+            # Recortar al audio disponible (el margen final puede no haber llegado)
+            segment = segment._replace(end_sample=min(segment.end_sample, self.ring.written))
+            future = self._executor.submit(self._recognize, segment)
+            with self._pending_ready:
+                self._pending.append((segment, future, time.time()))
+                self._pending_ready.notify()
+
+    def _capture_loop(self):
+        try:
+            while self.running:
+                samples = self.source.read()
+                if samples is None:
+                    break
+                self.ring.write(samples)
+                self._submit(self.segmenter.feed(samples))
+            self._submit(self.segmenter.flush())
+        except Exception as e:
+            print(f"Error de audio: {e}")
+        finally:
+            self.source.close()
+            self._capture_done.set()
+            with self._pending_ready:
+                self._pending_ready.notify()
+
+    def _deliver_loop(self):
+        """Entrega los textos en orden de frase aunque terminen desordenados"""
+        while True:
+            with self._pending_ready:
+                while not self._pending and not self._capture_done.is_set():
+                    self._pending_ready.wait(0.1)
+                if not self._pending:
+                    break
+                segment, future, closed_at = self._pending.popleft()
+            try:
+                text = future.result()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error de reconocimiento: {e}")
+                continue
+            if not text:
+                continue
+            transcript = Transcript(segment.seq, text, self._sample_time(segment.start_sample),
+                                    self._sample_time(segment.end_sample), time.time() - closed_at)
+            self.results.put(transcript)
+            if self.on_result is not None:
+                self.on_result(transcript)
+        self.results.put(None)
+
+    def wait(self, timeout=None):
+        """Espera a que termine la entrada (WAV) y a que se entreguen todos los textos"""
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stop(self):
+        self.running = False
+        self.wait(timeout=2.0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconocimiento de voz continuo por frases")
+    parser.add_argument("wav", nargs="?", default=None, help="Fichero WAV (por defecto, micrófono)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="google")
+    parser.add_argument("--language", default="es-ES")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--fast", action="store_true", help="Leer el WAV sin esperar al tiempo real")
+    parser.add_argument("--stub-delay", type=float, default=0.5, help="Retardo simulado del stub (s)")
+    args = parser.parse_args()
+
+    if args.backend == "stub":
+        backend = StubBackend(delay=args.stub_delay)
+    else:
+        backend = BACKENDS[args.backend](language=args.language)
+    source = WavFileSource(args.wav, realtime=not args.fast) if args.wav else MicrophoneSource()
+
+    pipeline = SpeechPipeline(source, backend, workers=args.workers).start()
+    print("Escuchando (Ctrl+C para salir)")
+    latencies = []
+    try:
+        while True:
+            transcript = pipeline.results.get()
+            if transcript is None:
+                break
+            latencies.append(transcript.latency)
+            offset = transcript.start_time - pipeline.start_time
+            print(f"[{offset:6.2f} s] #{transcript.seq} {transcript.text} "
+                  f"(latencia {transcript.latency * 1000:.0f} ms)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+    if latencies:
+        print(f"{len(latencies)} frases, latencia media {np.mean(latencies) * 1000:.0f} ms, "
+              f"máx {np.max(latencies) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
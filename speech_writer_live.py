@@ -1,12 +1,13 @@
 import cv2
 import numpy as np
-import speech_recognition as sr
-import threading
 import time
 import queue
 
+import hud
+from speech_pipeline import GoogleBackend, MicrophoneSource, SpeechPipeline, WavFileSource
+
 class RealTimeVoiceCamera:
-    def __init__(self):
+    def __init__(self, audio_path=None, backend=None, workers=3):
         self.running = True
         self.text_queue = queue.Queue()
         self.current_text = ""
@@ -14,41 +15,34 @@ class RealTimeVoiceCamera:
         self.font_scale = 1.3
         self.last_update_time = time.time()
         
+        # FPS medido del bucle (media móvil), no el solicitado a la cámara
+        self.measured_fps = 0.0
+        self.last_frame_time = None
+        
         # Configuración optimizada de la cámara
         self.cap = cv2.VideoCapture(0)
         self.cap.set(cv2.CAP_PROP_FPS, 30)  # Máximo FPS posible
         
-        # Configuración optimizada del reconocimiento de voz
-        self.recognizer = sr.Recognizer()
-        self.recognizer.pause_threshold = 0.5  # Menos pausa requerida
-        self.recognizer.phrase_threshold = 0.1  # Detecta frases más cortas
-        self.microphone = sr.Microphone()
+        # Reconocimiento de voz: captura continua, frases cortas (pausa de
+        # 0.5 s) y varias frases reconociéndose a la vez; con audio_path se
+        # usa un WAV en lugar del micrófono
+        source = WavFileSource(audio_path) if audio_path else MicrophoneSource()
+        self.speech = SpeechPipeline(
+            source,
+            backend or GoogleBackend(language="es-ES"),
+            workers=workers,
+            on_result=self.handle_transcript,
+            segmenter_options=dict(max_silence_ms=500, min_speech_ms=100)
+        )
         
-    def audio_capture(self):
-        """Hilo para captura continua de audio con buffer"""
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            print("Sistema de escucha activado (di 'parar' para terminar)")
-            
-            while self.running:
-                try:
-                    # Grabación más corta y sensible
-                    audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=2)
-                    text = self.recognizer.recognize_google(audio, language="es-ES").lower()
-                    
-                    if "parar" in text:
-                        self.running = False
-                    elif text:
-                        self.text_queue.put(text)
-                        print(f"Detectado: {text}")  # Feedback inmediato
-                        
-                except sr.WaitTimeoutError:
-                    continue  # Silencios normales, no imprimir errores
-                except sr.UnknownValueError:
-                    continue  # No imprimir errores de audio no reconocido
-                except Exception as e:
-                    print(f"Error de audio: {str(e)}")
-                    time.sleep(0.1)
+    def handle_transcript(self, transcript):
+        """Recibe cada frase reconocida, en orden (hilo de entrega del pipeline)"""
+        text = transcript.text.lower()
+        if "parar" in text:
+            self.running = False
+        elif text:
+            self.text_queue.put(text)
+            print(f"Detectado: {text} ({transcript.latency * 1000:.0f} ms)")  # Feedback inmediato
 
     def update_text(self):
         """Actualiza el texto actual desde la cola (sin bloqueo)"""
@@ -63,10 +57,18 @@ class RealTimeVoiceCamera:
         if time.time() - self.last_update_time > 5:
             self.current_text = ""
 
+    def update_fps(self):
+        """Actualiza la tasa real de frames del bucle principal"""
+        now = time.perf_counter()
+        if self.last_frame_time is not None:
+            instant = 1.0 / max(now - self.last_frame_time, 1e-6)
+            self.measured_fps = instant if self.measured_fps == 0 else 0.9 * self.measured_fps + 0.1 * instant
+        self.last_frame_time = now
+
     def run(self):
-        # Iniciar hilo de audio
-        audio_thread = threading.Thread(target=self.audio_capture, daemon=True)
-        audio_thread.start()
+        # Iniciar captura y reconocimiento de audio
+        self.speech.start()
+        print("Sistema de escucha activado (di 'parar' para terminar)")
         
         try:
             while self.running:
@@ -78,17 +80,18 @@ class RealTimeVoiceCamera:
                 
                 # Actualización del texto (no bloqueante)
                 self.update_text()
+                self.update_fps()
                 
                 # Mostrar texto si existe
                 if self.current_text:
-                    cv2.putText(frame, self.current_text, (30, 60), 
-                               cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
-                               self.text_color, 3, cv2.LINE_AA)
+                    hud.draw_text(frame, self.current_text, (30, 60), 
+                                  cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
+                                  self.text_color, 3, cv2.LINE_AA)
                 
                 # Mostrar FPS (opcional)
-                cv2.putText(frame, f"FPS: {int(self.cap.get(cv2.CAP_PROP_FPS))}", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-                           (255, 255, 255), 2)
+                hud.draw_text(frame, f"FPS: {int(self.measured_fps)}", 
+                              (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                              (255, 255, 255), 2)
                 
                 cv2.imshow('Voz en Tiempo Real', frame)
                 
@@ -105,10 +108,12 @@ class RealTimeVoiceCamera:
             pass
         finally:
             self.running = False
+            self.speech.stop()
             self.cap.release()
             cv2.destroyAllWindows()
             print("Sistema terminado")
 
 if __name__ == "__main__":
-    app = RealTimeVoiceCamera()
+    import sys
+    app = RealTimeVoiceCamera(sys.argv[1] if len(sys.argv) > 1 else None)
     app.run()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del repositorio están en la raíz, sin paquete instalable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
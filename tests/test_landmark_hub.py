@@ -0,0 +1,153 @@
+import json
+import socket
+import time
+
+import numpy as np
+
+from landmark_hub import LENGTH, LandmarkHub, Subscriber, parse_subscription
+from landmark_protocol import HAND_LANDMARKS, POSE_LANDMARKS, decode_packet
+
+import pytest
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("conexión cerrada")
+        data += chunk
+    return data
+
+
+def _subscribe(port, request):
+    sock = socket.create_connection(("127.0.0.1", port), timeout=2.0)
+    sock.sendall(json.dumps(request).encode() + b"\n")
+    return sock
+
+
+def _read_packets(sock, count):
+    packets = []
+    for _ in range(count):
+        size = LENGTH.unpack(_recv_exact(sock, LENGTH.size))[0]
+        packets.append(decode_packet(_recv_exact(sock, size)))
+    return packets
+
+
+def _wait_subscribers(hub, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(hub.subscribers) < count:
+        assert time.monotonic() < deadline, "los suscriptores no se han registrado"
+        time.sleep(0.01)
+
+
+def _publish(hub, frames):
+    rng = np.random.default_rng(0)
+    hands = rng.random((2, HAND_LANDMARKS, 3), dtype=np.float32)
+    poses = rng.random((1, POSE_LANDMARKS, 4), dtype=np.float32)
+    for _ in range(frames):
+        hub.publish(time.time(), hands, ["left", "right"], poses, [0], gestures=[1, 2])
+        # Espaciado para que el hub reparta cada frame en lugar de agruparlos
+        time.sleep(0.005)
+    return hands, poses
+
+
+def test_fan_out_to_many_tcp_clients_with_topics():
+    port = _free_port()
+    hub = LandmarkHub(tcp_port=port).start()
+    topics = [["left", "right", "pose"], ["left"], ["right"], ["pose"]]
+    clients = [_subscribe(port, {"topics": topics[i % 4], "queue_size": 64}) for i in range(40)]
+    try:
+        _wait_subscribers(hub, len(clients))
+        hands, poses = _publish(hub, 10)
+        for i, sock in enumerate(clients):
+            packets = _read_packets(sock, 10)
+            assert [p.seq for p in packets] == sorted(p.seq for p in packets)
+            last = packets[-1]
+            if topics[i % 4] == ["left"]:
+                assert last.handedness == ["left"] and last.gestures == [1]
+                np.testing.assert_array_equal(last.hands, hands[:1])
+                assert len(last.poses) == 0
+            elif topics[i % 4] == ["pose"]:
+                assert len(last.hands) == 0
+                np.testing.assert_array_equal(last.poses, poses)
+            elif topics[i % 4] == ["right"]:
+                assert last.handedness == ["right"] and last.gestures == [2]
+            else:
+                assert last.handedness == ["left", "right"] and last.person_ids == [0]
+        assert hub.published == 10
+    finally:
+        for sock in clients:
+            sock.close()
+        hub.close()
+
+
+def test_rate_limited_subscriber_gets_fewer_packets():
+    port = _free_port()
+    hub = LandmarkHub(tcp_port=port).start()
+    fast = _subscribe(port, {"queue_size": 64})
+    slow = _subscribe(port, {"max_rate": 5, "queue_size": 64})
+    try:
+        _wait_subscribers(hub, 2)
+        _publish(hub, 40)
+        assert len(_read_packets(fast, 40)) == 40
+        slow.settimeout(0.5)
+        received = 0
+        try:
+            while True:
+                _read_packets(slow, 1)
+                received += 1
+        except (socket.timeout, ConnectionError):
+            pass
+        assert 0 < received < 10
+    finally:
+        fast.close()
+        slow.close()
+        hub.close()
+
+
+def test_udp_subscriber_receives_packets():
+    hub = LandmarkHub().start()
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2.0)
+    try:
+        hub.add_udp_subscriber(receiver.getsockname(), topics=frozenset(["pose"]))
+        _wait_subscribers(hub, 1)
+        _, poses = _publish(hub, 3)
+        packet = decode_packet(receiver.recv(65536))
+        assert len(packet.hands) == 0
+        np.testing.assert_array_equal(packet.poses, poses)
+    finally:
+        receiver.close()
+        hub.close()
+
+
+def test_parse_subscription_rejects_invalid_requests():
+    assert parse_subscription(b"")["topics"] == frozenset(["left", "right", "pose"])
+    for data in (b"no json", b"[]", b'{"topics": ["feet"]}', b'{"format": "xml"}', b'{"max_rate": 0}'):
+        with pytest.raises(ValueError):
+            parse_subscription(data)
+
+
+def test_publish_after_close_is_a_no_op():
+    hub = LandmarkHub().start()
+    hub.close()
+    _publish(hub, 2)
+    assert hub.published == 0
+    with pytest.raises(RuntimeError):
+        hub.add_udp_subscriber(("127.0.0.1", 9))
+
+
+def test_subscriber_without_send_cannot_be_created():
+    class Incomplete(Subscriber):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incompleto")
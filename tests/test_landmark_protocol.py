@@ -0,0 +1,113 @@
+import socket
+
+import numpy as np
+import pytest
+
+from landmark_protocol import (HAND_LANDMARKS, HEADER, POSE_LANDMARKS, QUANT_SCALE, VERSION,
+                               LandmarkReceiver, decode_packet, encode_packet)
+
+
+def _sample(hands=2, poses=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.random((hands, HAND_LANDMARKS, 3), dtype=np.float32),
+            rng.random((poses, POSE_LANDMARKS, 4), dtype=np.float32))
+
+
+def test_roundtrip_float32():
+    hands, poses = _sample()
+    packet = decode_packet(encode_packet(7, 123.5, hands, ["left", "right"], poses, [3]))
+    assert packet.seq == 7
+    assert packet.timestamp == 123.5
+    assert packet.handedness == ["left", "right"]
+    assert packet.person_ids == [3]
+    np.testing.assert_array_equal(packet.hands, hands)
+    np.testing.assert_array_equal(packet.poses, poses)
+    assert not packet.predicted
+    assert packet.gestures is None
+    assert packet.hand_analytics is None and packet.pose_analytics is None
+
+
+def test_roundtrip_quantized():
+    hands, poses = _sample()
+    data = encode_packet(1, 0.0, hands, ["left", "unknown"], poses, [0], quantized=True)
+    packet = decode_packet(data)
+    # Resolución de la cuantización int16
+    np.testing.assert_allclose(packet.hands, hands, atol=1.0 / QUANT_SCALE)
+    np.testing.assert_allclose(packet.poses, poses, atol=1.0 / QUANT_SCALE)
+    assert packet.handedness == ["left", "unknown"]
+    assert len(data) < len(encode_packet(1, 0.0, hands, ["left", "unknown"], poses, [0]))
+
+
+def test_empty_packet():
+    packet = decode_packet(encode_packet(0, 1.0))
+    assert packet.hands.shape == (0, HAND_LANDMARKS, 3)
+    assert packet.poses.shape == (0, POSE_LANDMARKS, 4)
+
+
+def test_predicted_gestures_and_analytics():
+    hands, poses = _sample()
+    hand_analytics = np.arange(2 * 5, dtype=np.float32).reshape(2, 5)
+    pose_analytics = np.arange(1 * 3, dtype=np.float32).reshape(1, 3)
+    packet = decode_packet(encode_packet(
+        2, 0.0, hands, ["right", "left"], poses, [0], predicted=True, gestures=[4, 300],
+        hand_analytics=hand_analytics, pose_analytics=pose_analytics))
+    assert packet.predicted
+    # Los gestos fuera de rango se envían como NO_GESTURE (255)
+    assert packet.gestures == [4, 255]
+    np.testing.assert_array_equal(packet.hand_analytics, hand_analytics)
+    np.testing.assert_array_equal(packet.pose_analytics, pose_analytics)
+    np.testing.assert_array_equal(packet.hands, hands)
+
+
+def test_analytics_for_one_side_only():
+    hands, poses = _sample()
+    packet = decode_packet(encode_packet(0, 0.0, hands, ["left", "right"], poses, [0],
+                                         pose_analytics=np.ones((1, 4), np.float32)))
+    assert packet.hand_analytics.shape == (2, 0)
+    assert packet.pose_analytics.shape == (1, 4)
+
+
+def test_invalid_packets():
+    hands, poses = _sample()
+    data = encode_packet(0, 0.0, hands, ["left", "right"], poses, [0])
+    with pytest.raises(ValueError):
+        decode_packet(data[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        decode_packet(data[:-1])
+    with pytest.raises(ValueError):
+        decode_packet(b"XX" + data[2:])
+    with pytest.raises(ValueError):
+        encode_packet(0, 0.0, hands, ["left"])
+
+
+def test_rejects_other_versions_and_unknown_flags():
+    hands, poses = _sample()
+    data = bytearray(encode_packet(0, 0.0, hands, ["left", "right"], poses, [0]))
+    old = bytes(data[:2]) + bytes([VERSION - 1]) + bytes(data[3:])
+    with pytest.raises(ValueError, match="Versión"):
+        decode_packet(old)
+    data[3] |= 0x80
+    with pytest.raises(ValueError, match="Flags desconocidos"):
+        decode_packet(bytes(data))
+
+
+def test_receiver_drops_out_of_order_and_invalid():
+    receiver = LandmarkReceiver(("127.0.0.1", 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = receiver.sock.getsockname()
+    try:
+        for seq in (5, 3, 6):
+            sender.sendto(encode_packet(seq, 0.0), address)
+        sender.sendto(b"basura", address)
+        # Un salto atrás mayor que reorder_window es un emisor reiniciado
+        sender.sendto(encode_packet(100, 0.0), address)
+        sender.sendto(encode_packet(0, 0.0), address)
+
+        received = [receiver.receive(timeout=1.0).seq for _ in range(4)]
+        assert received == [5, 6, 100, 0]
+        assert receiver.receive(timeout=0.1) is None
+        assert receiver.out_of_order == 1
+        assert receiver.invalid == 1
+    finally:
+        sender.close()
+        receiver.close()
@@ -0,0 +1,113 @@
+import threading
+import time
+import wave
+
+import numpy as np
+
+from speech_pipeline import (SAMPLE_RATE, EnergySegmenter, SpeechPipeline, StubBackend,
+                             WavFileSource)
+
+# Frases simuladas con tonos: (silencio previo, duración del tono) en segundos
+PHRASES = [(1.0, 0.4), (0.8, 0.8), (0.8, 1.2)]
+
+
+def _phrases_audio(phrases=PHRASES, tail=0.8):
+    rng = np.random.default_rng(0)
+    parts = []
+    for silence, tone in phrases:
+        parts.append(rng.normal(0, 50, int(silence * SAMPLE_RATE)))
+        t = np.arange(int(tone * SAMPLE_RATE)) / SAMPLE_RATE
+        parts.append(8000 * np.sin(2 * np.pi * 440 * t))
+    parts.append(rng.normal(0, 50, int(tail * SAMPLE_RATE)))
+    return np.concatenate(parts).astype(np.int16)
+
+
+def _write_wav(path, samples):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+
+def _collect(pipeline, timeout=10.0):
+    results = []
+    deadline = time.monotonic() + timeout
+    while True:
+        transcript = pipeline.results.get(timeout=max(0.0, deadline - time.monotonic()))
+        if transcript is None:
+            return results
+        results.append(transcript)
+
+
+class FirstSlowBackend(StubBackend):
+    """Stub cuya primera frase tarda más que las demás, para desordenar el pool"""
+
+    def __init__(self):
+        super().__init__()
+        self.first = threading.Event()
+
+    def recognize(self, samples, sample_rate):
+        if not self.first.is_set():
+            self.first.set()
+            time.sleep(0.3)
+        return f"{len(samples) / sample_rate:.1f}"
+
+
+def test_segmenter_splits_phrases():
+    samples = _phrases_audio()
+    segmenter = EnergySegmenter(SAMPLE_RATE)
+    segments = []
+    for start in range(0, len(samples), 1024):
+        segments += segmenter.feed(samples[start:start + 1024])
+    segments += segmenter.flush()
+
+    assert [s.seq for s in segments] == [0, 1, 2]
+    position = 0
+    for segment, (silence, tone) in zip(segments, PHRASES):
+        position += silence * SAMPLE_RATE
+        # El inicio incluye el margen de 150 ms y el final cubre el tono entero
+        assert abs(segment.start_sample - (position - 0.15 * SAMPLE_RATE)) < 0.05 * SAMPLE_RATE
+        position += tone * SAMPLE_RATE
+        assert segment.end_sample >= position
+
+
+def test_segmenter_discards_short_clicks():
+    samples = _phrases_audio([(1.0, 0.03)])
+    segmenter = EnergySegmenter(SAMPLE_RATE)
+    assert segmenter.feed(samples) + segmenter.flush() == []
+
+
+def test_pipeline_transcribes_wav_with_stub(tmp_path):
+    path = _write_wav(tmp_path / "frases.wav", _phrases_audio())
+    pipeline = SpeechPipeline(WavFileSource(path, realtime=False),
+                              StubBackend(texts=["uno", "dos", "tres"]), workers=1).start()
+    try:
+        results = _collect(pipeline)
+    finally:
+        pipeline.stop()
+
+    assert [r.seq for r in results] == [0, 1, 2]
+    assert [r.text for r in results] == ["uno", "dos", "tres"]
+    assert all(r.start_time < r.end_time for r in results)
+    assert all(a.end_time <= b.start_time for a, b in zip(results, results[1:]))
+    assert all(r.latency >= 0 for r in results)
+    assert pipeline.errors == 0
+
+
+def test_pipeline_delivers_in_order_with_parallel_workers(tmp_path):
+    path = _write_wav(tmp_path / "frases.wav", _phrases_audio())
+    received = []
+    pipeline = SpeechPipeline(WavFileSource(path, realtime=False), FirstSlowBackend(),
+                              workers=3, on_result=received.append).start()
+    try:
+        results = _collect(pipeline)
+    finally:
+        pipeline.stop()
+
+    assert [r.seq for r in results] == [0, 1, 2]
+    assert received == results
+    # Las frases llegan en el orden del audio aunque la primera termine la última
+    durations = [float(r.text) for r in results]
+    assert durations == sorted(durations)
@@ -0,0 +1,391 @@
+"""Servidor de tracking para muchas fuentes de vídeo en un pool de procesos.
+
+Cada fuente (índice de cámara, fichero o stream local) se asigna a un proceso
+trabajador que mantiene sus propios modelos Pose/Hands cargados durante toda
+la sesión. El reparto entre procesos equilibra el coste estimado de cada
+fuente y cada trabajador atiende a sus fuentes por turnos, siempre con el
+frame más reciente. Los resultados llegan al proceso principal, que los
+vuelca a un destino común (UDP y/o grabación) e informa de los fps y frames
+descartados de cada fuente.
+
+    python tracking_server.py 0 1 pasillo.mp4 --workers 3 --udp localhost:9999
+    python tracking_server.py a.mp4 b.mp4 --hands --record salida --all-frames
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from landmark_arrays import LandmarkBuffers, max_hands_for
+from landmark_protocol import LandmarkSender
+from landmark_recording import RecordingWriter
+from pipeline import CaptureThread, is_video_file, open_capture
+from preprocess import FramePreprocessor
+
+# Coste de referencia: un stream de 640x480 a 30 fps pesa 1
+REFERENCE_COST = 640 * 480 * 30.0
+
+StreamSpec = namedtuple("StreamSpec", ["stream_id", "source", "cost"])
+
+
+def parse_source(text):
+    """Índice de cámara si es un número, ruta o URL en otro caso"""
+    return int(text) if text.isdigit() else text
+
+
+def estimate_cost(source):
+    """Coste relativo de una fuente; las cámaras no se abren para no bloquearlas"""
+    if not is_video_file(source):
+        return 1.0
+    cap = cv2.VideoCapture(source)
+    try:
+        width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+    if width <= 0 or height <= 0:
+        return 1.0
+    return width * height * fps / REFERENCE_COST
+
+
+def assign_streams(streams, workers):
+    """Reparte las fuentes entre procesos: la más cara al trabajador menos cargado"""
+    workers = max(1, min(workers, len(streams)))
+    loads = [0.0] * workers
+    groups = [[] for _ in range(workers)]
+    for stream in sorted(streams, key=lambda s: s.cost, reverse=True):
+        worker = loads.index(min(loads))
+        groups[worker].append(stream)
+        loads[worker] += stream.cost
+    return groups
+
+
+class _WorkerStream:
+    """Estado de una fuente dentro de su proceso: captura, modelos y contadores"""
+
+    def __init__(self, spec, pose_config, hands_config, drop_frames, stop_event):
+        import mediapipe as mp
+
+        self.spec = spec
+        self.cap = open_capture(spec.source)
+        self.queue = queue.Queue(maxsize=1)
+        # Los ficheros se leen a su cadencia original para simular una fuente en vivo
+        realtime = drop_frames and is_video_file(spec.source)
+        # Los frames ya procesados vuelven a la captura para reutilizarse
+        self.capture = CaptureThread(self.cap, self.queue, stop_event,
+                                     drop_frames=drop_frames, realtime=realtime,
+                                     free_frames=queue.Queue())
+        self.preprocess = FramePreprocessor()
+        # Modelos propios por fuente: Pose/Hands guardan estado de seguimiento entre frames
+        self.pose = mp.solutions.pose.Pose(**pose_config) if pose_config is not None else None
+        self.hands = mp.solutions.hands.Hands(**hands_config) if hands_config is not None else None
+        self.buffers = LandmarkBuffers(max_people=1, max_hands=max_hands_for(hands_config))
+        self.processed = 0
+        self.busy_time = 0.0
+        self.finished = False
+
+    def process(self, frame):
+        frame_rgb = self.preprocess.rgb(frame)
+        self.buffers.begin_frame()
+        if self.pose is not None:
+            self.buffers.load_pose(self.pose.process(frame_rgb))
+        if self.hands is not None:
+            self.buffers.load_hands(self.hands.process(frame_rgb))
+        # Copias: la cola entre procesos serializa en otro hilo
+        return (self.buffers.active_poses().copy(), self.buffers.active_hands().copy(),
+                list(self.buffers.handedness))
+
+    def counters(self):
+        return {
+            "captured": self.capture.stats.count,
+            "dropped": self.capture.stats.dropped,
+            "processed": self.processed,
+            "busy_time": self.busy_time,
+        }
+
+    def close(self):
+        self.capture.join(timeout=1.0)
+        self.cap.release()
+        for model in (self.pose, self.hands):
+            if model is not None:
+                model.close()
+
+
+def _worker_main(worker_id, specs, pose_config, hands_config, drop_frames,
+                 results, stop_event, report_interval):
+    """Bucle de un proceso trabajador: un frame por fuente y turno"""
+    thread_stop = threading.Event()
+    streams = []
+    try:
+        for spec in specs:
+            try:
+                streams.append(_WorkerStream(spec, pose_config, hands_config, drop_frames, thread_stop))
+            except RuntimeError as e:
+                results.put(("error", spec.stream_id, str(e)))
+        results.put(("ready", worker_id, [s.spec.stream_id for s in streams]))
+        for stream in streams:
+            stream.capture.start()
+
+        last_report = time.perf_counter()
+        while not stop_event.is_set() and not all(s.finished for s in streams):
+            idle = True
+            for stream in streams:
+                if stream.finished:
+                    continue
+                try:
+                    packet = stream.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                idle = False
+                if packet is None:
+                    stream.finished = True
+                    results.put(("end", stream.spec.stream_id, stream.counters()))
+                    continue
+
+                start = time.perf_counter()
+                poses, hands, handedness = stream.process(packet.frame)
+                stream.capture.recycle(packet)
+                stream.busy_time += time.perf_counter() - start
+                stream.processed += 1
+                results.put(("result", stream.spec.stream_id, packet.index, packet.timestamp,
+                             poses, hands, handedness))
+
+            now = time.perf_counter()
+            if now - last_report >= report_interval:
+                for stream in streams:
+                    results.put(("stats", stream.spec.stream_id, stream.counters()))
+                last_report = now
+            if idle:
+                time.sleep(0.001)
+    finally:
+        thread_stop.set()
+        for stream in streams:
+            if not stream.finished:
+                results.put(("end", stream.spec.stream_id, stream.counters()))
+            stream.close()
+        results.put(("done", worker_id, None))
+
+
+class UdpSink:
+    """Envía cada fuente por UDP; la fuente i va al puerto base + i"""
+
+    def __init__(self, host, port, quantized=False):
+        self.host = host
+        self.port = port
+        self.quantized = quantized
+        self.senders = {}
+
+    def write(self, stream_id, frame_index, timestamp, poses, hands, handedness):
+        sender = self.senders.get(stream_id)
+        if sender is None:
+            sender = LandmarkSender((self.host, self.port + stream_id), quantized=self.quantized)
+            self.senders[stream_id] = sender
+        try:
+            sender.send(timestamp, hands, handedness, poses, range(len(poses)))
+        except OSError as e:
+            print(f"Error enviando datos de la fuente {stream_id}: {e}")
+
+    def close(self):
+        for sender in self.senders.values():
+            sender.close()
+
+
+class RecordingSink:
+    """Una grabación .lmrec/.lmidx por fuente dentro de una carpeta"""
+
+    def __init__(self, directory, flush_every=30):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_every = flush_every
+        self.writers = {}
+
+    def write(self, stream_id, frame_index, timestamp, poses, hands, handedness):
+        writer = self.writers.get(stream_id)
+        if writer is None:
+            path = os.path.join(self.directory, f"stream{stream_id}")
+            writer = RecordingWriter(path, flush_every=self.flush_every)
+            self.writers[stream_id] = writer
+        writer.write_frame(frame_index, timestamp, poses=poses, hands=hands, handedness=handedness)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+class StreamStatus:
+    """Últimos contadores recibidos de una fuente y fps del último intervalo"""
+
+    def __init__(self, spec, worker_id):
+        self.spec = spec
+        self.worker_id = worker_id
+        self.counters = {"captured": 0, "dropped": 0, "processed": 0, "busy_time": 0.0}
+        self.fps = 0.0
+        self.ended = False
+        self._last = (time.perf_counter(), 0)
+
+    def update(self, counters):
+        now = time.perf_counter()
+        last_time, last_processed = self._last
+        if now > last_time:
+            self.fps = (counters["processed"] - last_processed) / (now - last_time)
+        self._last = (now, counters["processed"])
+        self.counters = counters
+
+    def summary(self):
+        c = self.counters
+        mean_ms = 1000.0 * c["busy_time"] / c["processed"] if c["processed"] else 0.0
+        state = " (fin)" if self.ended else ""
+        return (f"[{self.spec.stream_id}] {str(self.spec.source):<20} proceso {self.worker_id}  "
+                f"{self.fps:6.1f} fps  {mean_ms:7.2f} ms/frame  {c['processed']:>6} procesados  "
+                f"{c['dropped']:>5} descartados{state}")
+
+
+class TrackingServer:
+    """Reparte las fuentes en procesos y centraliza resultados y estadísticas"""
+
+    def __init__(self, sources, pose_config=None, hands_config=None, workers=None,
+                 sinks=(), drop_frames=True, report_interval=2.0):
+        if pose_config is None and hands_config is None:
+            raise ValueError("Hay que activar Pose, Hands o ambos")
+        self.specs = [StreamSpec(i, source, estimate_cost(source)) for i, source in enumerate(sources)]
+        self.pose_config = pose_config
+        self.hands_config = hands_config
+        self.workers = workers or os.cpu_count() or 1
+        self.sinks = list(sinks)
+        self.drop_frames = drop_frames
+        self.report_interval = report_interval
+        self.status = {}
+        self.results_written = 0
+
+    def _print_report(self, elapsed):
+        total_fps = sum(s.fps for s in self.status.values() if not s.ended)
+        print(f"--- {elapsed:6.1f} s, {total_fps:.1f} fps en total ---")
+        for stream_id in sorted(self.status):
+            print(self.status[stream_id].summary())
+
+    def run(self):
+        groups = assign_streams(self.specs, self.workers)
+        results = multiprocessing.Queue()
+        stop_event = multiprocessing.Event()
+        processes = []
+        for worker_id, group in enumerate(groups):
+            for spec in group:
+                self.status[spec.stream_id] = StreamStatus(spec, worker_id)
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(worker_id, group, self.pose_config, self.hands_config, self.drop_frames,
+                      results, stop_event, self.report_interval),
+                daemon=True,
+            )
+            process.start()
+            processes.append(process)
+
+        start = time.perf_counter()
+        last_report = start
+        pending = len(processes)
+        try:
+            while pending:
+                try:
+                    message = results.get(timeout=0.5)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes):
+                        break
+                    message = None
+
+                if message is not None:
+                    kind, key = message[0], message[1]
+                    if kind == "result":
+                        for sink in self.sinks:
+                            sink.write(key, *message[2:])
+                        self.results_written += 1
+                    elif kind == "stats":
+                        self.status[key].update(message[2])
+                    elif kind == "end":
+                        self.status[key].update(message[2])
+                        self.status[key].ended = True
+                    elif kind == "error":
+                        print(f"Fuente {key}: {message[2]}")
+                        self.status.pop(key, None)
+                    elif kind == "done":
+                        pending -= 1
+
+                now = time.perf_counter()
+                if now - last_report >= self.report_interval:
+                    self._print_report(now - start)
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_event.set()
+            # Vaciar la cola para que los trabajadores puedan terminar de escribir
+            deadline = time.perf_counter() + 5.0
+            while pending and time.perf_counter() < deadline:
+                try:
+                    message = results.get(timeout=0.1)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes):
+                        break
+                    continue
+                if message[0] == "done":
+                    pending -= 1
+                elif message[0] == "end" and message[1] in self.status:
+                    self.status[message[1]].update(message[2])
+                    self.status[message[1]].ended = True
+            for process in processes:
+                process.join(timeout=1.0)
+                if process.is_alive():
+                    process.terminate()
+            for sink in self.sinks:
+                sink.close()
+
+        elapsed = time.perf_counter() - start
+        processed = sum(s.counters["processed"] for s in self.status.values())
+        print(f"Total: {processed} frames de {len(self.status)} fuentes en {elapsed:.1f} s "
+              f"({processed / max(elapsed, 1e-9):.1f} fps, {len(processes)} procesos)")
+        for stream_id in sorted(self.status):
+            print(self.status[stream_id].summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracking de varias fuentes de vídeo en paralelo")
+    parser.add_argument("sources", nargs="+", help="Índices de cámara, ficheros o URLs de stream")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, núcleos)")
+    parser.add_argument("--no-pose", action="store_true", help="No ejecutar Pose")
+    parser.add_argument("--hands", action="store_true", help="Ejecutar también Hands")
+    parser.add_argument("--max-hands", type=int, default=2)
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--udp", default=None, help="Destino host:puerto (la fuente i usa puerto + i)")
+    parser.add_argument("--quantized", action="store_true")
+    parser.add_argument("--record", default=None, help="Carpeta donde grabar una sesión por fuente")
+    parser.add_argument("--all-frames", action="store_true",
+                        help="Procesar todos los frames en lugar de solo el más reciente")
+    parser.add_argument("--report-interval", type=float, default=2.0)
+    args = parser.parse_args()
+
+    sinks = []
+    if args.udp:
+        host, port = args.udp.rsplit(":", 1)
+        sinks.append(UdpSink(host, int(port), quantized=args.quantized))
+    if args.record:
+        sinks.append(RecordingSink(args.record))
+
+    server = TrackingServer(
+        [parse_source(s) for s in args.sources],
+        pose_config=None if args.no_pose else dict(model_complexity=args.model_complexity),
+        hands_config=dict(max_num_hands=args.max_hands) if args.hands else None,
+        workers=args.workers,
+        sinks=sinks,
+        drop_frames=not args.all_frames,
+        report_interval=args.report_interval,
+    )
+    server.run()
+
+
+if __name__ == "__main__":
+    main()